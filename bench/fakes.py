@@ -0,0 +1,308 @@
+# bench/fakes.py - DOUBLURES LOCALES ET DÉTERMINISTES DE YFINANCE, FMP, MARKETAUX ET GEMINI
+import asyncio
+import json
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from symbols import load_snapshot
+
+# Compteur d'appels amont partagé par toutes les doublures : "yfinance.history", "fmp.search", ...
+calls = Counter()
+_calls_lock = threading.Lock()
+
+
+def count(name: str):
+    with _calls_lock:
+        calls[name] += 1
+
+
+def _rng(symbol: str, salt: str = "") -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(f"{symbol}:{salt}".encode()))
+
+
+def is_unknown(symbol: str) -> bool:
+    """Les symboles commençant par ZZ n'existent pas (sonde de validation vide)."""
+    return symbol.upper().startswith("ZZ")
+
+
+# --- YFINANCE ---
+_PERIOD = re.compile(r"^(\d+)(d|wk|mo|y)$")
+_PERIOD_DAYS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+
+def _period_start(period: str, end: date) -> date:
+    if period in ("max", "ytd"):
+        return date(end.year, 1, 1) if period == "ytd" else end - timedelta(days=20 * 366)
+    match = _PERIOD.match(period)
+    if not match:
+        raise ValueError(f"Période inconnue : {period}")
+    return end - timedelta(days=int(match.group(1)) * _PERIOD_DAYS[match.group(2)])
+
+
+def price_frame(symbol: str, start: date, end: date) -> pd.DataFrame:
+    """Marche aléatoire journalière fixée par le symbole : les mêmes jours ont toujours les mêmes prix."""
+    days = pd.bdate_range(date(2000, 1, 3), end)
+    rng = _rng(symbol, "prices")
+    close = 20 + 80 * rng.random() * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(days))))
+    frame = pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.003, len(days))),
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 50_000_000, len(days)).astype(float),
+    }, index=days.tz_localize("America/New_York"))
+    return frame[frame.index.date >= start]
+
+
+class FakeTicker:
+    """Remplace yf.Ticker ; chaque accès compte comme un appel amont et attend `latency` secondes."""
+
+    latency = 0.05
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol.upper()
+
+    def _call(self, name: str):
+        count(f"yfinance.{name}")
+        time.sleep(self.latency)
+
+    def history(self, period: str = "1mo", start=None, **kwargs):
+        self._call("history")
+        if is_unknown(self.symbol):
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+        end = date.today()
+        begin = date.fromisoformat(str(start)[:10]) if start is not None else _period_start(period, end)
+        frame = price_frame(self.symbol, begin, end)
+        return frame.tail(1) if period == "1d" and start is None else frame
+
+    @property
+    def info(self):
+        self._call("info")
+        if is_unknown(self.symbol):
+            return {}
+        rng = _rng(self.symbol, "info")
+        price = float(price_frame(self.symbol, date.today() - timedelta(days=7), date.today())["Close"].iloc[-1])
+        revenue = float(rng.uniform(1e9, 4e11))
+        return {
+            "symbol": self.symbol,
+            "longName": f"{self.symbol} Holdings Inc.",
+            "sector": ["Technology", "Healthcare", "Financial Services", "Energy", "Consumer Cyclical"][rng.integers(5)],
+            "industry": "Diversified",
+            "country": "United States" if "." not in self.symbol else "France",
+            "currentPrice": price,
+            "previousClose": price,
+            "marketCap": float(rng.uniform(1e10, 3e12)),
+            "trailingPE": float(rng.uniform(8, 60)),
+            "forwardPE": float(rng.uniform(8, 50)),
+            "dividendYield": float(rng.uniform(0, 0.05)),
+            "dividendRate": float(rng.uniform(0, 4)),
+            "payoutRatio": float(rng.uniform(0, 0.8)),
+            "beta": float(rng.uniform(0.5, 1.8)),
+            "returnOnEquity": float(rng.uniform(-0.1, 0.6)),
+            "profitMargins": float(rng.uniform(-0.05, 0.4)),
+            "totalRevenue": revenue,
+            "netIncomeToCommon": revenue * float(rng.uniform(0.02, 0.3)),
+            "currentRatio": float(rng.uniform(0.5, 3)),
+            "quickRatio": float(rng.uniform(0.3, 2.5)),
+            "debtToEquity": float(rng.uniform(0, 250)),
+        }
+
+    @property
+    def cashflow(self):
+        self._call("cashflow")
+        years = pd.to_datetime([f"{date.today().year - i}-12-31" for i in range(1, 5)])
+        rng = _rng(self.symbol, "cashflow")
+        return pd.DataFrame(
+            [rng.uniform(1e9, 1e11, 4), -rng.uniform(1e8, 2e10, 4)],
+            index=["Total Cash From Operating Activities", "Capital Expenditures"], columns=years,
+        )
+
+    @property
+    def financials(self):
+        self._call("financials")
+        years = pd.to_datetime([f"{date.today().year - i}-12-31" for i in range(1, 5)])
+        return pd.DataFrame([_rng(self.symbol, "financials").uniform(1e9, 4e11, 4)], index=["Total Revenue"], columns=years)
+
+    @property
+    def dividends(self):
+        self._call("dividends")
+        days = pd.date_range(end=pd.Timestamp.today().normalize(), periods=24, freq="QS")
+        return pd.Series(_rng(self.symbol, "dividends").uniform(0.1, 1.0, len(days)), index=days, name="Dividends")
+
+
+def fake_download(tickers, period: str = "1y", start=None, **kwargs) -> pd.DataFrame:
+    """Remplace yf.download : un seul appel amont pour tous les symboles."""
+    count("yfinance.download")
+    time.sleep(FakeTicker.latency)
+    symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+    end = date.today()
+    begin = date.fromisoformat(str(start)[:10]) if start is not None else _period_start(period, end)
+    frames = {s.upper(): price_frame(s, begin, end) for s in symbols if not is_unknown(s)}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+
+fake_yfinance = SimpleNamespace(Ticker=FakeTicker, download=fake_download)
+
+
+# --- FMP ET MARKETAUX : SERVEUR HTTP LOCAL ---
+def _fmp_payload(path: str, query: dict):
+    symbols = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "JPM", "V", "XOM"]
+    if path.endswith("/search"):
+        q = query.get("query", [""])[0].upper()
+        return [{"symbol": s, "name": f"{s} Holdings Inc.", "currency": "USD", "stockExchange": "NASDAQ",
+                 "exchangeShortName": "NASDAQ"} for s in symbols if s.startswith(q)]
+    if path.endswith("/stock/list"):
+        # L'instantané local plus un grand nombre de sociétés fictives, à l'échelle de la vraie liste
+        listed = [{"symbol": row["symbol"], "name": row["name"], "exchange": row["exchange"],
+                   "exchangeShortName": row["exchange"], "type": "stock"} for row in load_snapshot()]
+        return listed + [{"symbol": f"S{i:05d}", "name": f"Synthetic Company {i}", "exchange": "NYSE",
+                          "exchangeShortName": "NYSE", "price": 10.0 + i % 100, "type": "stock"} for i in range(20000)]
+    if "/stock_market/" in path:
+        sign = 1 if path.endswith("gainers") else -1
+        return [{"symbol": s, "name": f"{s} Holdings Inc.", "change": sign * (i + 1), "price": 100.0 + i,
+                 "changesPercentage": sign * (i + 1) * 0.7} for i, s in enumerate(symbols)]
+    if path.endswith("/economic_calendar"):
+        return [{"event": f"Indicateur {i}", "date": f"{date.today().isoformat()} 14:30:00", "country": "US",
+                 "actual": None, "previous": 1.0 + i, "estimate": 1.1 + i, "impact": "Medium"} for i in range(40)]
+    if path.endswith("/stock-screener"):
+        return [{"symbol": s, "companyName": f"{s} Holdings Inc.", "marketCap": 1e11} for s in symbols]
+    return None
+
+
+def _marketaux_payload(path: str, query: dict):
+    if path.endswith("/news/all"):
+        return {"data": [{"uuid": str(i), "title": f"Article {i}", "description": "Résumé", "url": "#",
+                          "source": "bench", "published_at": f"{date.today().isoformat()}T08:00:00Z"} for i in range(15)]}
+    return None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        host = self.headers.get("X-Upstream-Host", "")
+        provider = "marketaux" if "marketaux" in host else "fmp"
+        payload = (_marketaux_payload if provider == "marketaux" else _fmp_payload)(parts.path, query)
+        count(f"{provider}.{parts.path.rsplit('/', 1)[-1]}")
+        time.sleep(self.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(200 if payload is not None else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubUpstreamServer:
+    """Serveur HTTP local qui répond aux URL FMP et Marketaux (voir `RedirectTransport`)."""
+
+    def __init__(self, latency: float = 0.05):
+        handler = type("Handler", (_StubHandler,), {"latency": latency})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="bench-stub-upstream", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """Envoie toutes les requêtes httpx vers le serveur local en conservant l'hôte d'origine en en-tête."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self._inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.headers["X-Upstream-Host"] = request.url.host
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+# --- GEMINI ---
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(FakeGenerativeModel.chunk_latency)
+            yield _FakeResponse(chunk)
+
+
+class FakeChat:
+    def __init__(self, history):
+        self.history = [dict(h) for h in history]
+
+    def _answer(self, message: str) -> str:
+        count("gemini.chat")
+        time.sleep(FakeGenerativeModel.latency)
+        answer = f"Réponse simulée à « {message[:40]} » : " + "explication pédagogique. " * 8
+        self.history += [{"role": "user", "parts": [message]}, {"role": "model", "parts": [answer]}]
+        return answer
+
+    def send_message(self, message: str, **kwargs):
+        return _FakeResponse(self._answer(message))
+
+    async def send_message_async(self, message: str, stream: bool = False, **kwargs):
+        answer = await asyncio.to_thread(self._answer, message)
+        if not stream:
+            return _FakeResponse(answer)
+        words = answer.split(" ")
+        return _FakeStream([" ".join(words[i:i + 6]) + " " for i in range(0, len(words), 6)])
+
+
+class FakeGenerativeModel:
+    """Remplace genai.GenerativeModel avec une latence configurable."""
+
+    latency = 0.3
+    chunk_latency = 0.02
+
+    def __init__(self, name: str = "bench"):
+        self.name = name
+
+    def generate_content(self, prompt: str, **kwargs):
+        count("gemini.generate")
+        time.sleep(self.latency)
+        symbols = re.findall(r"^\s*- ([A-Z0-9.\-^=]+) \(", prompt, flags=re.M)
+        if (kwargs.get("generation_config") or {}).get("response_mime_type") == "application/json":
+            return _FakeResponse(json.dumps({s: f"Analyse simulée de {s}." for s in symbols}))
+        return _FakeResponse("Analyse simulée : point fort, point de vigilance, conclusion neutre.")
+
+    def start_chat(self, history=None):
+        return FakeChat(history or [])
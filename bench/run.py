@@ -0,0 +1,211 @@
+# bench/run.py - BANC D'ESSAI HORS LIGNE DE L'API (LATENCES, DÉBIT, APPELS AMONT PAR REQUÊTE)
+#
+# Usage (depuis la racine du dépôt) :
+#   python -m bench.run                                  # tous les scénarios, rapport dans bench_output.txt
+#   python -m bench.run --scenarios index --users 16
+#   python -m bench.run --save-baseline bench/baseline.json
+#   python -m bench.run --baseline bench/baseline.json   # code de sortie 1 en cas de régression
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from bench import fakes
+from bench.scenarios import SCENARIOS, route_label
+
+
+def load_app(args):
+    """Importe main.py avec des clés factices puis remplace chaque dépendance externe par sa doublure."""
+    os.environ.update({
+        "FMP_API_KEY": "bench",
+        "MARKETAUX_API_KEY": "bench",
+        "GOOGLE_API_KEY": "",
+        "PRICE_STORE_DIR": tempfile.mkdtemp(prefix="finanalyse-bench-"),
+        "WARMUP_ON_STARTUP": "0",
+        # Les faux services n'ont pas de quota : le banc mesure le code, pas la limitation
+        **{f"QUOTA_{name}": "off" for name in ("FMP", "MARKETAUX", "GEMINI", "YFINANCE")},
+    })
+    fakes.FakeTicker.latency = args.yfinance_latency
+    fakes.FakeGenerativeModel.latency = args.gemini_latency
+    import main
+
+    main.yf = fakes.fake_yfinance
+    main.model = fakes.FakeGenerativeModel()
+    return main
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Le serveur n'a pas démarré.")
+        time.sleep(0.05)
+    return server, thread
+
+
+def run_user(base_url: str, scenario, iterations: int, seed: int, samples: list, lock: threading.Lock):
+    rng = random.Random(seed)
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for _ in range(iterations):
+            for method, path, body in scenario(rng):
+                start = time.perf_counter()
+                try:
+                    if method == "POST":
+                        with client.stream("POST", path, json=body) as response:
+                            response.read()  # Le flux SSE est lu jusqu'au bout
+                    else:
+                        response = client.get(path)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 0
+                with lock:
+                    samples.append((route_label(path), time.perf_counter() - start, status))
+
+
+def run_scenario(base_url: str, name: str, args) -> dict:
+    samples, lock = [], threading.Lock()
+    calls_before = Counter(fakes.calls)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_user, base_url, SCENARIOS[name], args.iterations, args.seed + i, samples, lock)
+                   for i in range(args.users)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    upstream = Counter(fakes.calls)
+    upstream.subtract(calls_before)
+
+    latencies = np.array([latency for _, latency, _ in samples]) * 1000
+    by_route = defaultdict(list)
+    for route, latency, status in samples:
+        by_route[route].append((latency * 1000, status))
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, status in samples if status == 0 or status >= 500),
+        "rps": len(samples) / elapsed,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "upstreamPerRequest": sum(upstream.values()) / max(1, len(samples)),
+        "upstream": {k: v for k, v in sorted(upstream.items()) if v},
+        "routes": {
+            route: {"count": len(values), "p50": float(np.percentile([v for v, _ in values], 50)),
+                    "p95": float(np.percentile([v for v, _ in values], 95)),
+                    "statuses": dict(Counter(status for _, status in values))}
+            for route, values in sorted(by_route.items())
+        },
+    }
+
+
+def format_report(results: dict, args) -> str:
+    lines = [
+        f"Banc d'essai FinAnalyse - {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"utilisateurs={args.users} itérations={args.iterations} latences amont : yfinance={args.yfinance_latency}s "
+        f"http={args.http_latency}s gemini={args.gemini_latency}s",
+        "",
+        f"{'scénario':<12}{'requêtes':>10}{'erreurs':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'amont/req':>11}",
+    ]
+    for name, r in results.items():
+        lines.append(f"{name:<12}{r['requests']:>10}{r['errors']:>9}{r['rps']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}"
+                     f"{r['p99']:>9.1f}{r['upstreamPerRequest']:>11.2f}")
+    for name, r in results.items():
+        lines += ["", f"[{name}] appels amont : " + ", ".join(f"{k}={v}" for k, v in r["upstream"].items())]
+        for route, stats in r["routes"].items():
+            lines.append(f"  {route:<40}{stats['count']:>6}  p50={stats['p50']:>8.1f} ms  p95={stats['p95']:>8.1f} ms  {stats['statuses']}")
+    return "\n".join(lines)
+
+
+METRICS = (("p50", 1), ("p95", 1), ("p99", 1), ("rps", -1), ("upstreamPerRequest", 1))
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Liste des régressions : latence ou appels amont en hausse, débit en baisse, au-delà de la tolérance."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, direction in METRICS:
+            before, after = base[metric], r[metric]
+            if before <= 0:
+                continue
+            change = (after - before) / before
+            if change * direction > tolerance:
+                regressions.append(f"{name}.{metric} : {before:.2f} -> {after:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne de l'API FinAnalyse.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Scénarios séparés par des virgules.")
+    parser.add_argument("--users", type=int, default=8, help="Utilisateurs simultanés par scénario.")
+    parser.add_argument("--iterations", type=int, default=5, help="Passages de chaque utilisateur dans le scénario.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--yfinance-latency", type=float, default=0.05)
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-latency", type=float, default=0.3)
+    parser.add_argument("--baseline", help="Fichier JSON de référence à comparer.")
+    parser.add_argument("--save-baseline", help="Enregistre les résultats comme nouvelle référence.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Écart relatif toléré avant régression.")
+    parser.add_argument("--output", default="bench_output.txt", help="Fichier du rapport texte.")
+    args = parser.parse_args(argv)
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénarios inconnus : {', '.join(unknown)}")
+
+    app_module = load_app(args)
+    with fakes.StubUpstreamServer(latency=args.http_latency) as stub:
+        app_module.http_client.transport = fakes.RedirectTransport(stub.port)
+        port = free_port()
+        server, thread = start_server(app_module.app, port)
+        try:
+            # Le screener répond 503 tant que son index n'est pas construit
+            deadline = time.monotonic() + 60
+            while not app_module.fundamentals_index.ready and time.monotonic() < deadline:
+                time.sleep(0.1)
+            results = {name: run_scenario(f"http://127.0.0.1:{port}", name, args) for name in names}
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    report = format_report(results, args)
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report += "\n\nComparaison avec " + args.baseline + " : " + ("\n  " + "\n  ".join(regressions) if regressions else "aucune régression.")
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({name: {metric: r[metric] for metric, _ in METRICS} for name, r in results.items()}, f, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
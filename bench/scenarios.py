@@ -0,0 +1,61 @@
+# bench/scenarios.py - SÉQUENCES DE REQUÊTES REJOUANT LES PAGES DU FRONTEND
+import random
+
+# Symboles de l'instantané local (valides) et quelques symboles inconnus (404 attendu)
+WATCHLIST = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "JPM", "V", "XOM", "MC.PA", "OR.PA"]
+UNKNOWN = ["ZZFOO", "ZZBAR"]
+SEARCHES = ["apple", "micro", "tesla", "oreal", "total", "nvidia", "amaz"]
+
+
+def analysis_page(rng: random.Random) -> list:
+    """analysis.js : bundle compact, attente du commentaire IA, comparaison, screener, corrélation."""
+    ticker = rng.choice(WATCHLIST + UNKNOWN[:1])
+    other = rng.choice([t for t in WATCHLIST if t != ticker])
+    return [
+        ("GET", f"/api/analysis/{ticker}?format=compact", None),
+        ("GET", f"/api/entreprise/{ticker}/comment", None),
+        ("GET", f"/api/entreprise/{ticker}/comment", None),
+        ("GET", f"/api/analysis/{other}?sections=entreprise,advancedMetrics", None),
+        ("GET", "/api/screener?sector=Technology&pe_max=40", None),
+        ("GET", f"/api/correlation?tickers={','.join(rng.sample(WATCHLIST, 4))}&window=60&format=compact", None),
+    ]
+
+
+def index_page(rng: random.Random) -> list:
+    """index.html / main.js : movers, actualités, recherche frappe par frappe, explorateur par pays."""
+    word = rng.choice(SEARCHES)
+    keystrokes = [("GET", f"/api/search?query={word[:n]}", None) for n in range(1, len(word) + 1)]
+    return [
+        ("GET", "/api/gainers", None),
+        ("GET", "/api/losers", None),
+        ("GET", "/api/news", None),
+        ("GET", "/api/economic-calendar", None),
+        *keystrokes,
+        ("GET", f"/api/companies-by-country/{rng.choice(['US', 'FR', 'DE'])}", None),
+    ]
+
+
+def chat_page(rng: random.Random) -> list:
+    """chat.js : quelques messages d'une même session, en streaming puis en requête simple."""
+    session = f"bench-{rng.randrange(10 ** 6)}"
+    questions = ["Qu'est-ce qu'un PER ?", "Et le ROE ?", "Comment lire une marge nette ?"]
+    requests = [("POST", "/api/chat/stream", {"session_id": session, "message": q}) for q in questions[:2]]
+    requests.append(("POST", "/api/chat", {"session_id": session, "message": questions[2]}))
+    return requests
+
+
+def watchlist_page(rng: random.Random) -> list:
+    """Liste de suivi : toutes les lignes en une requête groupée (dont un symbole inconnu), puis un rafraîchissement."""
+    tickers = ",".join(rng.sample(WATCHLIST, 8) + UNKNOWN[1:])
+    return [("GET", f"/api/entreprise?tickers={tickers}", None), ("GET", f"/api/entreprise?tickers={tickers}", None)]
+
+
+SCENARIOS = {"analysis": analysis_page, "index": index_page, "chat": chat_page, "watchlist": watchlist_page}
+
+
+def route_label(path: str) -> str:
+    """Regroupe les chemins par route (sans symbole ni paramètres) pour le rapport."""
+    parts = path.split("?")[0].split("/")
+    if len(parts) > 3 and parts[2] in ("analysis", "entreprise", "historique", "companies-by-country"):
+        parts[3] = "{}"
+    return "/".join(parts)
@@ -0,0 +1,311 @@
+# cache.py - CACHE EN MÉMOIRE POUR LES DONNÉES DE MARCHÉ
+import asyncio
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+# Durée de vie (en secondes) par type de donnée : les cotations bougent vite,
+# les états financiers ne changent qu'une fois par trimestre.
+DEFAULT_TTLS = {
+    "quote": 30,
+    "live": 10,
+    "info": 300,
+    "history": 900,
+    "intraday": 60,
+    "dividends": 6 * 3600,
+    "cashflow": 6 * 3600,
+    "financials": 6 * 3600,
+}
+
+
+def estimate_size(value) -> int:
+    """Estime l'empreinte mémoire (en octets) d'une valeur mise en cache."""
+    # pandas n'est pas importé ici : une valeur pandas implique qu'il est déjà chargé
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(value, pd.DataFrame) else int(usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """Cache LRU thread-safe avec une durée de vie par type et un plafond mémoire.
+
+    Avec `shared` (voir shared_store.py), le cache en mémoire sert de L1 devant un
+    stockage commun à tous les workers : une absence locale est d'abord cherchée
+    dans le L2, chaque écriture y est recopiée avec la même expiration, et un bail
+    évite que plusieurs workers appellent l'amont pour la même clé.
+    """
+
+    def __init__(self, ttls: dict = None, max_bytes: int = 64 * 1024 * 1024, flight=None,
+                 shared=None, namespace: str = "cache", lease_ttl: float = 30, sync_interval: float = 1.0):
+        self.flight = flight
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.namespace = namespace
+        self.lease_ttl = lease_ttl
+        self.sync_interval = sync_interval
+        self._entries = OrderedDict()  # (symbole, type) -> (expiration, taille, valeur)
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self._synced_at = 0.0
+        self._invalidation_id = shared.last_invalidation() if shared is not None else 0
+
+    def _key(self, symbol: str, kind: str):
+        return (symbol.upper(), kind)
+
+    def _shared_key(self, key) -> str:
+        return f"{self.namespace}:{key[0]}:{key[1]}"
+
+    def get(self, symbol: str, kind: str):
+        """Retourne (trouvé, valeur) ; une entrée expirée compte comme un échec."""
+        key = self._key(symbol, kind)
+        self._sync_invalidations()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                self._remove(key)
+        found, value = self._get_shared(key)
+        if not found:
+            with self._lock:
+                self.misses += 1
+        return found, value
+
+    def _get_shared(self, key, wait: bool = False):
+        """Copie l'entrée du L2 dans le L1 (même expiration absolue) ; retourne (trouvé, valeur)."""
+        if self.shared is None:
+            return False, None
+        if wait:
+            found, blob, expires_at = self.shared.wait(self._shared_key(key), self.lease_ttl)
+        else:
+            found, blob, expires_at = self.shared.get(self._shared_key(key))
+        if not found:
+            return False, None
+        try:
+            value = pickle.loads(blob)
+        except Exception as e:
+            print(f"Erreur lors de la lecture du cache partagé: {e}")
+            return False, None
+        self._set_local(key, value, expires_at - time.time())
+        with self._lock:
+            self.hits += 1
+            self.shared_hits += 1
+        return True, value
+
+    def set(self, symbol: str, kind: str, value, ttl: float = None):
+        """Mémorise une valeur ; le TTL dépend du préfixe du type ("history:1y" -> "history")."""
+        key = self._key(symbol, kind)
+        ttl = self.ttls.get(kind.split(":", 1)[0], 60) if ttl is None else ttl
+        self._set_local(key, value, ttl)
+        if self.shared is not None:
+            try:
+                blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                print(f"Valeur non partageable entre workers ({kind}): {e}")
+                return
+            self.shared.set(self._shared_key(key), blob, ttl)
+
+    def _set_local(self, key, value, ttl: float):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # Trop volumineux pour être mis en cache
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_fetch(self, symbol: str, kind: str, fetch):
+        """Retourne la valeur en cache, ou appelle `fetch()` et mémorise son résultat.
+
+        Avec un `SingleFlight`, les échecs simultanés sur la même clé ne déclenchent
+        qu'un seul `fetch()`.
+        """
+        found, value = self.get(symbol, kind)
+        if found:
+            return value
+
+        def load():
+            if self.shared is None:
+                value = fetch()
+                self.set(symbol, kind, value)
+                return value
+            key = self._key(symbol, kind)
+            lease = self._shared_key(key)
+            # Un seul worker appelle l'amont ; les autres attendent son résultat dans le L2
+            while not self.shared.acquire(lease, self.lease_ttl):
+                found, value = self._get_shared(key, wait=True)
+                if found:
+                    return value
+            try:
+                found, value = self._get_shared(key)  # Rempli par un autre worker entre-temps
+                if found:
+                    return value
+                value = fetch()
+                self.set(symbol, kind, value)
+                return value
+            finally:
+                self.shared.release(lease)
+
+        if self.flight is None:
+            return load()
+        return self.flight.do(("cache",) + self._key(symbol, kind), load)
+
+    def invalidate(self, symbol: str, kind: str = None):
+        self._invalidate_local(symbol.upper(), kind)
+        if self.shared is not None:
+            # Les autres workers appliquent l'invalidation à leur L1 au plus tard après `sync_interval`
+            self.shared.delete_prefix(self._shared_key((symbol.upper(), kind or "")))
+
+    def _invalidate_local(self, symbol: str, kind: str = None):
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == symbol and (kind is None or k[1] == kind)]
+            for key in keys:
+                self._remove(key)
+
+    def _sync_invalidations(self):
+        if self.shared is None or time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        self._invalidation_id, prefixes = self.shared.invalidations_since(self._invalidation_id)
+        head = self.namespace + ":"
+        for prefix in prefixes:
+            if prefix.startswith(head):
+                symbol, _, kind = prefix[len(head):].partition(":")
+                self._invalidate_local(symbol, kind or None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes_used -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes_used,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "sharedHits": self.shared_hits,
+                "hitRatio": self.hits / total if total else 0.0,
+            }
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.ticket = None
+
+
+class SingleFlight:
+    """Regroupe les appels concurrents identiques : un seul appel amont, un résultat partagé.
+
+    `priorities` (facultatif, p. ex. `quota.FlightPriority()`) donne à chaque appel partagé
+    un ticket de priorité que les appelants regroupés peuvent promouvoir.
+    """
+
+    def __init__(self, priorities=None):
+        self.priorities = priorities
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fetch):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                call.ticket = self.priorities.ticket() if self.priorities else None
+            else:
+                self.coalesced += 1
+                if self.priorities:
+                    self.priorities.join(call.ticket)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self.priorities.scope(call.ticket) if self.priorities else nullcontext():
+                call.result = fetch()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, fetch):
+        """Variante asyncio : `fetch` est une fonction retournant une coroutine.
+
+        L'appel amont tourne dans sa propre tâche : si l'appelant qui l'a lancé est annulé
+        (client déconnecté), les autres appelants regroupés reçoivent quand même le résultat.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._async_calls.get(key)
+            if call is None:
+                ticket = self.priorities.ticket() if self.priorities else None
+                # La tâche copie le contexte courant : l'appel amont voit le ticket partagé
+                with self.priorities.scope(ticket) if self.priorities else nullcontext():
+                    task = asyncio.ensure_future(fetch())
+                call = self._async_calls[key] = (task, ticket)
+                task.add_done_callback(lambda done: self._forget_async(key, done))
+            else:
+                self.coalesced += 1
+                if self.priorities:
+                    self.priorities.join(call[1])
+        return await asyncio.shield(call[0])
+
+    def _forget_async(self, key, task):
+        with self._lock:
+            if self._async_calls.get(key, (None,))[0] is task:
+                del self._async_calls[key]
+        if not task.cancelled():
+            # Évite l'avertissement "exception never retrieved" quand plus personne n'attendait
+            task.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "inFlight": len(self._calls) + len(self._async_calls),
+            }
@@ -0,0 +1,189 @@
+# comments.py - COMMENTAIRES D'ANALYSE IA MIS EN CACHE ET GÉNÉRÉS EN ARRIÈRE-PLAN
+import json
+import math
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+
+
+def metrics_fingerprint(data: dict) -> str:
+    """Empreinte des métriques utilisées dans le prompt.
+
+    Le prix est regroupé par tranches de ~5% pour qu'une petite variation de cours
+    ne provoque pas une nouvelle génération ; les autres métriques sont arrondies
+    comme dans le prompt.
+    """
+    price = data.get("price") or 0
+    price_bucket = round(math.log(price) / math.log(1.05)) if price > 0 else 0
+    return ":".join(str(v) for v in (
+        price_bucket,
+        round((data.get("revenue") or 0) / 1e9, 1),
+        round((data.get("netIncome") or 0) / 1e9, 1),
+        round(data.get("peRatio") or 0, 1),
+        round((data.get("roe") or 0) * 100, 1),
+        round((data.get("netMargin") or 0) * 100, 1),
+    ))
+
+
+def parse_batch_comments(text: str) -> dict:
+    """Extrait {symbole: commentaire} d'une réponse JSON du modèle (objet ou liste d'objets)."""
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    parsed = json.loads(cleaned)
+    if isinstance(parsed, list):
+        parsed = {item.get("symbol"): item.get("comment") for item in parsed if isinstance(item, dict)}
+    if not isinstance(parsed, dict):
+        raise ValueError("Format de réponse inattendu pour les commentaires groupés.")
+    return {str(k).upper(): v.strip() for k, v in parsed.items() if k and isinstance(v, str) and v.strip()}
+
+
+class CommentService:
+    """Cache des commentaires IA ; les absences sont générées par un pool de threads borné.
+
+    `generate(data)` retourne le texte du commentaire ou lève une exception.
+    `generate_batch(datas)` (facultatif) traite plusieurs entreprises en un seul appel
+    et retourne {symbole: commentaire} ; les symboles absents de sa réponse sont
+    générés un par un. Avec `shared`, les commentaires sont visibles de tous les
+    workers et un bail empêche deux workers de générer le même commentaire.
+    """
+
+    def __init__(self, generate, ttl: float = 24 * 3600, failure_ttl: float = 60, workers: int = 2,
+                 generate_batch=None, batch_size: int = 5, shared=None):
+        self.generate = generate
+        self.generate_batch = generate_batch
+        self.batch_size = max(1, batch_size)
+        self.cache = TTLCache(ttls={"comment": ttl, "failed": failure_ttl}, max_bytes=8 * 1024 * 1024,
+                              shared=shared, namespace="comments")
+        self.shared = shared
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-comment")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.failures = 0
+        self.batches = 0
+        self.batch_failures = 0
+
+    def _kinds(self, data: dict):
+        fingerprint = metrics_fingerprint(data)
+        return f"comment:{fingerprint}", f"failed:{fingerprint}"
+
+    def lookup(self, symbol: str, data: dict):
+        """Retourne (statut, commentaire) sans jamais attendre le modèle.
+
+        Statuts : "ready", "pending" (génération en cours ou planifiée) ou "unavailable"
+        (échec récent, nouvel essai après `failure_ttl`).
+        """
+        status, comment = self._cached(symbol, data)
+        if status == "pending":
+            self.schedule(symbol, data)
+        return status, comment
+
+    def lookup_many(self, items) -> dict:
+        """Comme `lookup()` pour une liste de (symbole, données) ; les absences partent par lots."""
+        results, misses = {}, []
+        for symbol, data in items:
+            results[symbol.upper()] = self._cached(symbol, data)
+            if results[symbol.upper()][0] == "pending":
+                misses.append((symbol, data))
+        self.schedule_batch(misses)
+        return results
+
+    def _cached(self, symbol: str, data: dict):
+        kind, failed_kind = self._kinds(data)
+        found, comment = self.cache.get(symbol, kind)
+        if found:
+            return "ready", comment
+        if self.cache.get(symbol, failed_kind)[0]:
+            return "unavailable", None
+        return "pending", None
+
+    def _claim(self, symbol: str, data: dict):
+        """Réserve la génération d'un commentaire ; None s'il est déjà en cours."""
+        key = (symbol.upper(), self._kinds(data)[0])
+        with self._lock:
+            if key in self._pending:
+                return None
+            self._pending.add(key)
+        return key
+
+    def schedule(self, symbol: str, data: dict):
+        key = self._claim(symbol, data)
+        if key is not None:
+            self._executor.submit(self._run, symbol, dict(data), key)
+
+    def schedule_batch(self, items):
+        claimed = [(symbol, dict(data), key) for symbol, data in items
+                   if (key := self._claim(symbol, data)) is not None]
+        if self.generate_batch is None:
+            for symbol, data, key in claimed:
+                self._executor.submit(self._run, symbol, data, key)
+            return
+        for start in range(0, len(claimed), self.batch_size):
+            self._executor.submit(self._run_batch, claimed[start:start + self.batch_size])
+
+    def _lease(self, symbol: str, data: dict) -> bool:
+        """Réserve la génération auprès des autres workers ; False si l'un d'eux s'en charge."""
+        if self.shared is None:
+            return True
+        if self._cached(symbol, data)[0] != "pending":
+            return False  # Déjà généré (ou en échec récent) par un autre worker
+        return self.shared.acquire(f"comments:{symbol.upper()}:{self._kinds(data)[0]}", ttl=120)
+
+    def _release(self, symbol: str, data: dict):
+        if self.shared is not None:
+            self.shared.release(f"comments:{symbol.upper()}:{self._kinds(data)[0]}")
+
+    def _run_batch(self, chunk):
+        leased = []
+        for symbol, data, key in chunk:
+            if self._lease(symbol, data):
+                leased.append((symbol, data, key))
+            else:
+                with self._lock:
+                    self._pending.discard(key)
+        chunk = leased
+        comments = {}
+        if len(chunk) > 1:
+            try:
+                comments = self.generate_batch([data for _, data, _ in chunk])
+                self.batches += 1
+            except Exception as e:
+                print(f"Erreur lors de la génération groupée par l'IA, repli sur des appels unitaires: {e}")
+                self.batch_failures += 1
+        for symbol, data, key in chunk:
+            comment = comments.get(symbol.upper())
+            if not comment:
+                self._run(symbol, data, key, leased=True)
+                continue
+            self.store(symbol, data, comment)
+            self._release(symbol, data)
+            self.generated += 1
+            with self._lock:
+                self._pending.discard(key)
+
+    def store(self, symbol: str, data: dict, comment: str):
+        self.cache.set(symbol, self._kinds(data)[0], comment)
+
+    def _run(self, symbol: str, data: dict, key, leased: bool = False):
+        if not leased and not self._lease(symbol, data):
+            with self._lock:
+                self._pending.discard(key)
+            return
+        try:
+            self.store(symbol, data, self.generate(data))
+            self.generated += 1
+        except Exception as e:
+            print(f"Erreur lors de la génération par l'IA: {e}")
+            self.cache.set(symbol, self._kinds(data)[1], True)
+            self.failures += 1
+        finally:
+            self._release(symbol, data)
+            with self._lock:
+                self._pending.discard(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {**self.cache.stats(), "pending": pending, "generated": self.generated, "failures": self.failures,
+                "batches": self.batches, "batchFailures": self.batch_failures}
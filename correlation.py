@@ -0,0 +1,74 @@
+# correlation.py - CALCULS DE CORRÉLATION VECTORISÉS (NUMPY) SUR UNE MATRICE DE RENDEMENTS
+import numpy as np
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """Rendements logarithmiques d'une matrice de prix (T, N) -> (T-1, N)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(prices), axis=0)
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """Matrice de corrélation (N, N) : les rendements sont centrés-réduits puis Z'Z / (T-1)."""
+    t = returns.shape[0]
+    if t < 2:
+        return np.full((returns.shape[1],) * 2, np.nan)
+    centered = returns - returns.mean(axis=0)
+    std = centered.std(axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = centered / std
+        corr = (z.T @ z) / (t - 1)
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def rolling_correlation(returns: np.ndarray, window: int, step: int = 1):
+    """Corrélations glissantes de toutes les paires, via des sommes cumulées.
+
+    Retourne (indices de fin de fenêtre, paires (P, 2), valeurs (K, P)) où K est le
+    nombre de fenêtres échantillonnées tous les `step` points.
+    """
+    t, n = returns.shape
+    pairs = np.column_stack(np.triu_indices(n, k=1))
+    if window < 2 or t < window:
+        return np.empty(0, dtype=int), pairs, np.empty((0, len(pairs)))
+
+    x, y = returns[:, pairs[:, 0]], returns[:, pairs[:, 1]]
+    zero = np.zeros((1, len(pairs)))
+
+    def window_sums(values):
+        cumulative = np.vstack([zero, np.cumsum(values, axis=0)])
+        return cumulative[window:] - cumulative[:-window]
+
+    ends = np.arange(window - 1, t)[::-1][::step][::-1]
+    rows = ends - (window - 1)
+    sx, sy = window_sums(x)[rows], window_sums(y)[rows]
+    sxx, syy, sxy = window_sums(x * x)[rows], window_sums(y * y)[rows], window_sums(x * y)[rows]
+    cov = sxy - sx * sy / window
+    var_x = sxx - sx * sx / window
+    var_y = syy - sy * sy / window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = cov / np.sqrt(var_x * var_y)
+    return ends, pairs, np.clip(values, -1.0, 1.0)
+
+
+def cluster_order(corr: np.ndarray) -> np.ndarray:
+    """Ordre des feuilles d'une classification hiérarchique (lien moyen) sur d = sqrt(2(1-rho))."""
+    n = len(corr)
+    if n < 3:
+        return np.arange(n)
+    distance = np.sqrt(np.clip(2.0 * (1.0 - np.nan_to_num(corr, nan=0.0)), 0.0, None))
+    np.fill_diagonal(distance, np.inf)
+    members = [[i] for i in range(n)]
+    sizes = np.ones(n)
+    for _ in range(n - 1):
+        i, j = np.unravel_index(np.argmin(distance), distance.shape)
+        i, j = min(i, j), max(i, j)
+        # Distance moyenne pondérée par la taille des deux groupes fusionnés
+        merged = (sizes[i] * distance[i] + sizes[j] * distance[j]) / (sizes[i] + sizes[j])
+        distance[i, :] = distance[:, i] = merged
+        distance[j, :] = distance[:, j] = np.inf
+        distance[i, i] = np.inf
+        members[i] = members[i] + members[j]
+        sizes[i] += sizes[j]
+    return np.array(members[0])
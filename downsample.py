@@ -0,0 +1,89 @@
+# downsample.py - SOUS-ÉCHANTILLONNAGE DES SÉRIES DE PRIX POUR L'AFFICHAGE (LTTB, MIN/MAX, AGRÉGATION)
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def _buckets(n: int, count: int) -> np.ndarray:
+    """Bornes de `count` seaux couvrant les points 1..n-2 (le premier et le dernier sont toujours gardés)."""
+    return np.linspace(1, n - 1, count + 1).astype(np.int64)
+
+
+def _padded(values: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """Tableau (seaux, taille max) rempli de NaN : chaque ligne contient les valeurs d'un seau."""
+    sizes = np.diff(bounds)
+    width = int(sizes.max())
+    columns = np.arange(width)
+    index = bounds[:-1, None] + columns
+    valid = columns < sizes[:, None]
+    return np.where(valid, values[np.minimum(index, len(values) - 1)], np.nan)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets : indices des points gardés (forme visuelle préservée).
+
+    Dans chaque seau, on garde le point qui forme le plus grand triangle avec le point
+    retenu dans le seau précédent et la moyenne du seau suivant. L'aire se développe en
+    |ax * u + ay * v + w| avec u, v, w calculés d'un bloc pour tous les candidats ;
+    seule la propagation du point retenu reste une boucle (un argmax par seau).
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bounds = _buckets(n, threshold - 2)
+    bx, by = _padded(x, bounds), _padded(y, bounds)
+
+    # Moyenne du seau suivant (le dernier point pour le dernier seau)
+    mean_x, mean_y = np.nanmean(bx, axis=1), np.nanmean(by, axis=1)
+    cx = np.append(mean_x[1:], x[-1])
+    cy = np.append(mean_y[1:], y[-1])
+
+    # Aire (x2) du triangle a-b-c : |ax * (by - cy) + ay * (cx - bx) + (bx * cy - cx * by)|
+    u = by - cy[:, None]
+    v = cx[:, None] - bx
+    w = bx * cy[:, None] - cx[:, None] * by
+    # Le remplissage donne une aire nulle : il n'est jamais préféré à un vrai point
+    u, v, w = (np.nan_to_num(m, nan=0.0) for m in (u, v, w))
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for i in range(len(bounds) - 1):
+        selected[i + 1] = bounds[i] + int(np.abs(ax * u[i] + ay * v[i] + w[i]).argmax())
+        ax, ay = x[selected[i + 1]], y[selected[i + 1]]
+    return selected
+
+
+def minmax(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Minimum et maximum de chaque seau, dans l'ordre chronologique (entièrement vectorisé)."""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    bounds = _buckets(n, (threshold - 2) // 2)
+    by = _padded(y, bounds)
+    starts = bounds[:-1]
+    lows = starts + np.nanargmin(by, axis=1)
+    highs = starts + np.nanargmax(by, axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, threshold: int, method: str = "lttb") -> np.ndarray:
+    """Indices à conserver pour afficher au plus `threshold` points."""
+    if method == "minmax":
+        return minmax(y, threshold)
+    return lttb(x, y, threshold)
+
+
+def last_per_period(days: np.ndarray, interval: str) -> np.ndarray:
+    """Indice de la dernière séance de chaque semaine ("1wk", semaines du lundi) ou mois ("1mo")."""
+    days = np.asarray(days, dtype="datetime64[D]")
+    if interval == "1wk":
+        keys = (days.astype(np.int64) + 3) // 7  # Le 1970-01-01 est un jeudi
+    else:
+        keys = days.astype("datetime64[M]").astype(np.int64)
+    if len(keys) == 0:
+        return np.arange(0)
+    return np.append(np.flatnonzero(np.diff(keys)), len(keys) - 1)
@@ -0,0 +1,127 @@
+# feeds.py - RAFRAÎCHISSEMENT EN ARRIÈRE-PLAN DES FLUX COMMUNS À TOUS LES UTILISATEURS
+import asyncio
+import pickle
+import time
+from datetime import datetime, timezone
+
+
+class Feed:
+    """Dernier instantané valide d'un flux (stale-while-revalidate).
+
+    Le flux est servi immédiatement depuis la mémoire ; il est rafraîchi en
+    arrière-plan tous les `interval` secondes. Si l'amont échoue, l'ancien
+    instantané reste servi et est marqué `stale`.
+
+    Avec `shared`, l'instantané est publié pour les autres workers : un worker
+    reprend un instantané récent au lieu d'appeler l'amont, et un bail fait qu'un
+    seul worker rafraîchit le flux à la fois.
+    """
+
+    def __init__(self, name: str, fetch, interval: float, shared=None, lease_ttl: float = 60):
+        self.name = name
+        self.fetch = fetch
+        self.interval = interval
+        self.shared = shared
+        self.lease_ttl = lease_ttl
+        self.data = None
+        self.as_of = None
+        self._fetched_at = 0.0
+        self.last_error = None
+        self._refresh_task = None
+
+    @property
+    def stale(self) -> bool:
+        return self.last_error is not None or time.monotonic() - self._fetched_at > self.interval
+
+    async def refresh(self):
+        """Rafraîchit l'instantané ; les appels simultanés partagent la même tâche."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self):
+        leased = False
+        if self.shared is not None:
+            if await asyncio.to_thread(self._adopt_shared):
+                return
+            leased = await asyncio.to_thread(self.shared.acquire, f"feed:{self.name}", self.lease_ttl)
+            # Un autre worker rafraîchit déjà ce flux : on attend son instantané
+            if not leased and await asyncio.to_thread(self._adopt_shared, True):
+                return
+        try:
+            data = await self.fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Erreur lors du rafraîchissement du flux '{self.name}': {e}")
+            raise
+        finally:
+            if leased:
+                await asyncio.to_thread(self.shared.release, f"feed:{self.name}")
+        self.data = data
+        self.as_of = datetime.now(timezone.utc)
+        self._fetched_at = time.monotonic()
+        self.last_error = None
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set, f"feed:{self.name}",
+                                    pickle.dumps((data, self.as_of), protocol=pickle.HIGHEST_PROTOCOL), self.interval)
+
+    def _adopt_shared(self, wait: bool = False) -> bool:
+        """Reprend l'instantané publié par un autre worker (présent tant qu'il a moins de `interval` secondes)."""
+        key = f"feed:{self.name}"
+        found, blob, _ = self.shared.wait(key, self.lease_ttl) if wait else self.shared.get(key)
+        if not found:
+            return False
+        try:
+            data, as_of = pickle.loads(blob)
+        except Exception as e:
+            print(f"Erreur lors de la lecture du flux partagé '{self.name}': {e}")
+            return False
+        self.data, self.as_of = data, as_of
+        self._fetched_at = time.monotonic() - (datetime.now(timezone.utc) - as_of).total_seconds()
+        self.last_error = None
+        return True
+
+    async def get(self):
+        """Retourne (données, as_of, stale). Seul le tout premier appel attend l'amont."""
+        if self.data is None:
+            await self.refresh()
+        elif self.stale and (self._refresh_task is None or self._refresh_task.done()):
+            # Instantané trop ancien : on le sert tout de suite et on relance un rafraîchissement
+            asyncio.ensure_future(self._background_refresh())
+        return self.data, self.as_of, self.stale
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception:
+            pass  # Déjà journalisé ; l'ancien instantané reste servi
+
+    async def run(self):
+        while True:
+            await self._background_refresh()
+            await asyncio.sleep(self.interval)
+
+
+class FeedScheduler:
+    """Regroupe les flux et lance une boucle de rafraîchissement par flux."""
+
+    def __init__(self, shared=None):
+        self.shared = shared
+        self.feeds = {}
+        self._tasks = []
+
+    def register(self, name: str, fetch, interval: float, shared: bool = True) -> Feed:
+        """`shared=False` pour un flux dont `fetch` a des effets locaux au processus."""
+        feed = self.feeds[name] = Feed(name, fetch, interval, shared=self.shared if shared else None)
+        return feed
+
+    def start(self, names=None):
+        for name, feed in self.feeds.items():
+            if names is None or name in names:
+                self._tasks.append(asyncio.ensure_future(feed.run()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,71 @@
+# http_client.py - CLIENT HTTP ASYNCHRONE PARTAGÉ POUR LES API EXTERNES (FMP, MARKETAUX)
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+
+# Codes HTTP pour lesquels une nouvelle tentative a du sens
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamClient:
+    """Client httpx unique : connexions keep-alive, limite par hôte, timeouts et retries."""
+
+    def __init__(self, connect_timeout: float = 3.0, read_timeout: float = 10.0, max_connections: int = 100,
+                 max_per_host: int = 10, retries: int = 2, backoff: float = 0.3, transport=None):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport  # Transport httpx de remplacement (bancs d'essai, serveur local)
+        self._client = None
+        self._loop = None
+        self._host_slots = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Un client httpx est lié à la boucle asyncio qui l'a créé
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+            self._loop = loop
+            self._host_slots = {}
+        return self._client
+
+    def _slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_slots[host]
+
+    async def get(self, url: str, params: dict = None) -> httpx.Response:
+        """GET avec retries et backoff exponentiel ; lève httpx.HTTPError en cas d'échec."""
+        client = self._get_client()
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._slot(url):
+                    response = await client.get(url, params=params)
+                if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    await asyncio.sleep(self._delay(attempt, response))
+                    continue
+                response.raise_for_status()
+                return response
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+
+    def _delay(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 10.0)
+        return self.backoff * (2 ** attempt)
+
+    async def get_json(self, url: str, params: dict = None):
+        response = await self.get(url, params=params)
+        return response.json()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
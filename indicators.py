@@ -0,0 +1,322 @@
+# indicators.py - INDICATEURS TECHNIQUES VECTORISÉS (NUMPY) SUR LES SÉANCES DU STOCKAGE LOCAL
+#
+# Tous les indicateurs d'une requête partagent un même `Workspace` : clôtures, rendements,
+# sommes cumulées et moyennes exponentielles y sont calculés une seule fois. Les grandeurs
+# récursives (EMA, lissages de Wilder, plus haut historique) conservent leur état final,
+# ce qui permet de prolonger les résultats d'une nouvelle séance sans tout recalculer.
+import numpy as np
+
+from price_store import COLUMNS
+
+TRADING_DAYS = 252
+
+# Paramètres par défaut (dans l'ordre de la notation "nom:p1:p2...")
+DEFAULTS = {
+    "sma": (20,),
+    "ema": (20,),
+    "rsi": (14,),
+    "macd": (12, 26, 9),
+    "bb": (20, 2.0),
+    "atr": (14,),
+    "vol": (20,),
+    "drawdown": (),
+}
+DEFAULT_SET = "sma:20,sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2,atr:14,vol:20,drawdown"
+
+
+class FullRecompute(Exception):
+    """L'état nécessaire au calcul incrémental manque : il faut repartir du début."""
+
+
+def parse_specs(text: str) -> list:
+    """"sma:50,rsi,macd:12:26:9" -> [("sma", (50,)), ("rsi", (14,)), ...] ; ValueError si invalide."""
+    specs = []
+    for item in (part.strip().lower() for part in (text or DEFAULT_SET).split(",")):
+        if not item:
+            continue
+        name, *raw = item.split(":")
+        if name not in DEFAULTS:
+            raise ValueError(f"Indicateur inconnu '{name}' (attendu : {', '.join(DEFAULTS)}).")
+        defaults = DEFAULTS[name]
+        if len(raw) > len(defaults):
+            raise ValueError(f"Trop de paramètres pour '{name}'.")
+        try:
+            params = tuple(type(d)(v) for d, v in zip(defaults, raw)) + defaults[len(raw):]
+        except ValueError:
+            raise ValueError(f"Paramètres invalides pour '{item}'.")
+        windows = params[:1] if name == "bb" else params
+        if any(not 2 <= w <= 500 for w in windows) or (name == "bb" and not 0 < params[1] <= 5):
+            raise ValueError(f"Paramètres hors limites pour '{item}' (fenêtres de 2 à 500).")
+        if name == "macd" and params[0] >= params[1]:
+            raise ValueError("La moyenne rapide du MACD doit être plus courte que la lente.")
+        specs.append((name, params))
+    if not specs:
+        raise ValueError("Aucun indicateur demandé.")
+    return list(dict.fromkeys(specs))
+
+
+def spec_key(specs) -> str:
+    return ",".join(":".join([name, *("%g" % p for p in params)]) for name, params in specs)
+
+
+def lookback(specs) -> int:
+    """Nombre de séances antérieures nécessaires pour prolonger les indicateurs à fenêtre glissante."""
+    needed = 1  # Rendements, RSI et ATR regardent la clôture précédente
+    for name, params in specs:
+        if name in ("sma", "bb"):
+            needed = max(needed, params[0])
+        elif name == "vol":
+            needed = max(needed, params[0] + 1)
+    return needed
+
+
+def _recursive_mean(values: np.ndarray, alpha: float, state: float) -> np.ndarray:
+    """y_t = (1 - alpha) * y_(t-1) + alpha * x_t à partir de y_(-1) = state.
+
+    Forme fermée par blocs : y_j = d^(j+1) * (state + alpha * cumsum(x_k / d^(k+1))) avec
+    d = 1 - alpha ; la taille des blocs borne d^-k pour rester dans la précision des flottants.
+    """
+    decay = 1.0 - alpha
+    out = np.empty(len(values))
+    block = max(1, int(250 / -np.log10(decay)))
+    for start in range(0, len(values), block):
+        x = values[start:start + block]
+        powers = decay ** np.arange(1, len(x) + 1)
+        out[start:start + len(x)] = powers * (state + alpha * np.cumsum(x / powers))
+        state = out[start + len(x) - 1]
+    return out
+
+
+class Workspace:
+    """Séances [offset:] d'un symbole ; les résultats couvrent les lignes à partir de `first_new`.
+
+    Calcul complet : `first_new = 0` et aucun état. Calcul incrémental : les lignes avant
+    `first_new` ne servent que de fenêtre glissante, `states` contient l'état à la ligne
+    `first_new - 1` de chaque grandeur récursive. Les nouveaux états sont rangés dans `out_states`.
+    """
+
+    def __init__(self, bars: np.ndarray, first_new: int = 0, states: dict = None):
+        self.bars = bars
+        self.first_new = first_new
+        self.states = states
+        self.out_states = {}
+        self._memo = {}
+
+    def memo(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def column(self, name: str) -> np.ndarray:
+        # Séance sans cotation : on reprend la dernière valeur connue
+        def compute():
+            values = self.bars[:, COLUMNS.index(name)].astype(np.float64)
+            valid = np.isfinite(values)
+            index = np.where(valid, np.arange(len(values)), 0)
+            np.maximum.accumulate(index, out=index)
+            return np.where(valid[index], values[index], np.nan)
+        return self.memo(("column", name), compute)
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.column("close")
+
+    def new(self, values: np.ndarray) -> np.ndarray:
+        return values[self.first_new:]
+
+    def log_returns(self) -> np.ndarray:
+        def compute():
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.concatenate([[np.nan], np.diff(np.log(self.close))])
+        return self.memo(("log_returns",), compute)
+
+    def rolling(self, name: str, values: np.ndarray, n: int):
+        """(moyenne, écart-type population) glissants sur `n` lignes, par sommes cumulées."""
+        def compute():
+            finite = np.isfinite(values)
+            center = values[finite].mean() if finite.any() else 0.0  # Limite les pertes par annulation
+            x = np.where(finite, values - center, 0.0)
+            count = np.concatenate([[0], np.cumsum(finite)])
+            s1 = np.concatenate([[0.0], np.cumsum(x)])
+            s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+            mean = np.full(len(values), np.nan)
+            std = np.full(len(values), np.nan)
+            if len(values) >= n:
+                k = count[n:] - count[:-n]
+                m1 = (s1[n:] - s1[:-n]) / n
+                m2 = (s2[n:] - s2[:-n]) / n
+                full = k == n
+                mean[n - 1:] = np.where(full, m1 + center, np.nan)
+                std[n - 1:] = np.where(full, np.sqrt(np.clip(m2 - m1 * m1, 0.0, None)), np.nan)
+            return mean, std
+        return self.memo(("rolling", name, n), compute)
+
+    def smooth(self, name: str, values: np.ndarray, n: int, alpha: float) -> np.ndarray:
+        """Moyenne exponentielle des `values` (lignes nouvelles uniquement).
+
+        Calcul complet : amorcée par la moyenne simple des `n` premières valeurs finies.
+        Calcul incrémental : reprend l'état enregistré pour `name`.
+        """
+        def compute():
+            out = np.full(len(values), np.nan)
+            if self.states is not None:
+                state = self.states.get(name)
+                if state is None:
+                    raise FullRecompute(name)
+                out[:] = _recursive_mean(values, alpha, state)
+            else:
+                finite = np.flatnonzero(np.isfinite(values))
+                if len(finite) >= n:
+                    seed = finite[0] + n - 1
+                    out[seed] = values[finite[0]:seed + 1].mean()
+                    if seed + 1 < len(values):
+                        out[seed + 1:] = _recursive_mean(values[seed + 1:], alpha, out[seed])
+            if len(out) and np.isfinite(out[-1]):
+                self.out_states[name] = float(out[-1])
+            elif self.states is not None:
+                self.out_states[name] = self.states.get(name)
+            return out
+        return self.memo(("smooth", name), compute)
+
+    def ema(self, n: int) -> np.ndarray:
+        return self.smooth(f"ema:{n}", self.new(self.close), n, 2.0 / (n + 1))
+
+
+# --- INDICATEURS : (workspace, paramètres) -> {colonne: valeurs des lignes nouvelles} ---
+def _sma(ws: Workspace, n: int) -> dict:
+    return {"value": ws.new(ws.rolling("close", ws.close, n)[0])}
+
+
+def _ema(ws: Workspace, n: int) -> dict:
+    return {"value": ws.ema(n)}
+
+
+def _rsi(ws: Workspace, n: int) -> dict:
+    delta = ws.new(np.concatenate([[np.nan], np.diff(ws.close)]))
+    gain = ws.smooth(f"rsi:gain:{n}", np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None)), n, 1.0 / n)
+    loss = ws.smooth(f"rsi:loss:{n}", np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None)), n, 1.0 / n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+    return {"value": np.where(np.isfinite(gain) & np.isfinite(loss), rsi, np.nan)}
+
+
+def _macd(ws: Workspace, fast: int, slow: int, signal: int) -> dict:
+    line = ws.ema(fast) - ws.ema(slow)
+    signal_line = ws.smooth(f"macd:signal:{fast}:{slow}:{signal}", line, signal, 2.0 / (signal + 1))
+    return {"macd": line, "signal": signal_line, "hist": line - signal_line}
+
+
+def _bollinger(ws: Workspace, n: int, k: float) -> dict:
+    mean, std = ws.rolling("close", ws.close, n)
+    return {"middle": ws.new(mean), "upper": ws.new(mean + k * std), "lower": ws.new(mean - k * std)}
+
+
+def _atr(ws: Workspace, n: int) -> dict:
+    high, low, close = ws.column("high"), ws.column("low"), ws.close
+    previous = np.concatenate([[np.nan], close[:-1]])
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    return {"value": ws.smooth(f"atr:{n}", ws.new(true_range), n, 1.0 / n)}
+
+
+def _volatility(ws: Workspace, n: int) -> dict:
+    returns = ws.log_returns()
+    _, std = ws.rolling("log_returns", returns, n)
+    # Écart-type d'échantillon (n - 1), annualisé
+    return {"value": ws.new(std * np.sqrt(n / (n - 1)) * np.sqrt(TRADING_DAYS))}
+
+
+def _drawdown(ws: Workspace) -> dict:
+    close = ws.new(ws.close)
+    peak = np.fmax.accumulate(np.concatenate([[ws.states.get("peak", np.nan) if ws.states else np.nan], close]))[1:]
+    if len(peak) and np.isfinite(peak[-1]):
+        ws.out_states["peak"] = float(peak[-1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"value": close / peak - 1.0}
+
+
+INDICATORS = {"sma": _sma, "ema": _ema, "rsi": _rsi, "macd": _macd, "bb": _bollinger,
+              "atr": _atr, "vol": _volatility, "drawdown": _drawdown}
+
+
+def compute(bars: np.ndarray, specs, first_new: int = 0, states: dict = None):
+    """Calcule tous les indicateurs sur les mêmes tableaux ; retourne ({spec: {colonne: valeurs}}, états)."""
+    ws = Workspace(bars, first_new, states)
+    results = {spec_key([spec]): INDICATORS[spec[0]](ws, *spec[1]) for spec in specs}
+    return results, ws.out_states
+
+
+class IndicatorSeries:
+    """Résultats complets d'un jeu d'indicateurs pour un symbole, prolongeables séance par séance.
+
+    La dernière séance du stockage peut être incomplète (séance en cours) : seules les
+    séances jusqu'à l'avant-dernière sont « confirmées » et gardées avec leur état ; les
+    suivantes sont recalculées à chaque mise à jour à partir de cet état.
+    """
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.days = np.empty(0, dtype=np.float64)
+        self.columns = {}
+        self.states = {}
+        self.anchor = None  # (jour, clôture) de la dernière séance confirmée
+        self.confirmed = 0  # Nombre de lignes confirmées
+        self.full_computes = 0
+        self.incremental_updates = 0
+
+    def __sizeof__(self) -> int:
+        # Pour le plafond mémoire du cache (cache.estimate_size)
+        return object.__sizeof__(self) + self.days.nbytes + sum(v.nbytes for cols in self.columns.values() for v in cols.values())
+
+    def _matches(self, bars: np.ndarray) -> bool:
+        """Vrai si les séances confirmées sont inchangées (pas de réajustement des cours)."""
+        if self.anchor is None or self.confirmed == 0 or len(bars) < self.confirmed:
+            return False
+        day, close = bars[self.confirmed - 1, 0], bars[self.confirmed - 1, COLUMNS.index("close")]
+        return day == self.anchor[0] and np.isclose(close, self.anchor[1], rtol=1e-9, equal_nan=True)
+
+    def update(self, bars: np.ndarray) -> "IndicatorSeries":
+        """Met à jour avec toutes les séances connues ; calcul incrémental si possible."""
+        confirmed = max(0, len(bars) - 1)
+        if self._matches(bars):
+            try:
+                self._extend(bars, confirmed)
+                self.incremental_updates += 1
+                return self
+            except FullRecompute:
+                pass
+        self._recompute(bars, confirmed)
+        self.full_computes += 1
+        return self
+
+    def _recompute(self, bars: np.ndarray, confirmed: int):
+        # Les séances confirmées d'abord, pour enregistrer leur état, puis les suivantes
+        head, states = compute(bars[:confirmed], self.specs)
+        self._store(bars, confirmed, head, states)
+        self._extend(bars, confirmed)
+
+    def _extend(self, bars: np.ndarray, confirmed: int):
+        start = self.confirmed
+        offset = max(0, start - lookback(self.specs))
+        if start < confirmed:
+            # Nouvelles séances confirmées : elles rejoignent la partie stockée
+            head, states = compute(bars[offset:confirmed], self.specs, start - offset, self.states)
+            head = {key: {c: np.concatenate([self.columns[key][c][:start], v]) for c, v in cols.items()}
+                    for key, cols in head.items()}
+            self._store(bars, confirmed, head, {**self.states, **states})
+        # Séances non confirmées : recalculées à partir de l'état confirmé, jamais stockées
+        offset = max(0, confirmed - lookback(self.specs))
+        try:
+            tail, _ = compute(bars[offset:], self.specs, confirmed - offset, self.states if confirmed else None)
+        except FullRecompute:
+            # Série encore trop courte pour amorcer une moyenne : calcul complet, découpé ensuite
+            tail, _ = compute(bars, self.specs)
+            tail = {key: {c: v[confirmed:] for c, v in cols.items()} for key, cols in tail.items()}
+        self.days = bars[:, 0].copy()
+        self.columns = {key: {c: np.concatenate([self.columns[key][c][:confirmed], v]) for c, v in cols.items()}
+                        for key, cols in tail.items()}
+
+    def _store(self, bars: np.ndarray, confirmed: int, columns: dict, states: dict):
+        self.columns = columns
+        self.states = states
+        self.confirmed = confirmed
+        self.anchor = (bars[confirmed - 1, 0], bars[confirmed - 1, COLUMNS.index("close")]) if confirmed else None
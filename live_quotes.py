@@ -0,0 +1,198 @@
+# live_quotes.py - COTATIONS EN DIRECT : UN SONDEUR PAR SYMBOLE, DIFFUSÉ À TOUS LES ABONNÉS
+import asyncio
+from datetime import datetime, time as clock
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Suffixe Yahoo -> (fuseau, ouverture, clôture) ; sans suffixe : marchés américains
+EXCHANGE_HOURS = {
+    "": ("America/New_York", clock(9, 30), clock(16, 0)),
+    ".PA": ("Europe/Paris", clock(9, 0), clock(17, 30)),
+    ".AS": ("Europe/Amsterdam", clock(9, 0), clock(17, 30)),
+    ".BR": ("Europe/Brussels", clock(9, 0), clock(17, 30)),
+    ".DE": ("Europe/Berlin", clock(9, 0), clock(17, 30)),
+    ".MI": ("Europe/Rome", clock(9, 0), clock(17, 30)),
+    ".MC": ("Europe/Madrid", clock(9, 0), clock(17, 30)),
+    ".SW": ("Europe/Zurich", clock(9, 0), clock(17, 30)),
+    ".L": ("Europe/London", clock(8, 0), clock(16, 30)),
+    ".TO": ("America/Toronto", clock(9, 30), clock(16, 0)),
+    ".T": ("Asia/Tokyo", clock(9, 0), clock(15, 0)),
+    ".HK": ("Asia/Hong_Kong", clock(9, 30), clock(16, 0)),
+}
+
+
+def market_open(symbol: str, now: datetime = None) -> bool:
+    """Séance en cours sur la place du symbole (jours fériés ignorés ; fuseau inconnu = ouverte)."""
+    _, dot, suffix = symbol.upper().rpartition(".")
+    zone, opens, closes = EXCHANGE_HOURS.get(dot + suffix if dot else "", EXCHANGE_HOURS[""])
+    try:
+        local = (now or datetime.now().astimezone()).astimezone(ZoneInfo(zone))
+    except ZoneInfoNotFoundError:
+        return True
+    return local.weekday() < 5 and opens <= local.time() < closes
+
+
+class Subscriber:
+    """Une connexion : les messages en attente sont fusionnés par symbole.
+
+    Un client lent ne reçoit donc que le dernier état de chaque symbole, et la
+    mémoire par connexion reste bornée par le nombre de symboles suivis.
+    """
+
+    def __init__(self):
+        self.symbols = set()
+        self._quotes = {}
+        self._notices = []
+        self._ready = asyncio.Event()
+
+    def push_quote(self, symbol: str, fields: dict, snapshot: bool = False):
+        pending = self._quotes.setdefault(symbol, {"snapshot": False, "quote": {}})
+        pending["snapshot"] |= snapshot
+        pending["quote"].update(fields)
+        self._ready.set()
+
+    def notify(self, message: dict):
+        self._notices.append(message)
+        self._ready.set()
+
+    async def next(self) -> list:
+        """Attend puis retourne les messages accumulés depuis le dernier appel."""
+        await self._ready.wait()
+        self._ready.clear()
+        notices, quotes = self._notices, self._quotes
+        self._notices, self._quotes = [], {}
+        return notices + [{"type": "quote", "symbol": symbol, **pending} for symbol, pending in quotes.items()]
+
+
+class _Symbol:
+    def __init__(self):
+        self.subscribers = set()
+        self.last = {}
+        self.task = None
+
+
+class QuoteHub:
+    """Un sondeur asyncio par symbole suivi, quel que soit le nombre de connexions.
+
+    `load_quote(symbol)` (synchrone, exécuté dans un thread) retourne un dict de
+    champs, ou None si le symbole n'a pas de cotation. Seuls les champs modifiés
+    sont diffusés ; un nouvel abonné reçoit d'abord le dernier état connu. Le
+    sondage est rapide pendant la séance, lent en dehors, et s'arrête dès que
+    plus personne ne suit le symbole.
+    """
+
+    def __init__(self, load_quote, fast_interval: float = 10, slow_interval: float = 300,
+                 max_symbols: int = 50, max_total_symbols: int = 500, is_open=market_open):
+        self.load_quote = load_quote
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.max_symbols = max_symbols
+        # Un sondeur par symbole distinct : ce plafond borne le coût amont, quel que soit le nombre de connexions
+        self.max_total_symbols = max_total_symbols
+        self.is_open = is_open
+        self._symbols = {}
+        self._subscribers = set()
+        self.fetches = 0
+        self.failures = 0
+        self.broadcasts = 0
+
+    def connect(self) -> Subscriber:
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber, list(subscriber.symbols))
+        self._subscribers.discard(subscriber)
+
+    def subscribe(self, subscriber: Subscriber, symbols) -> list:
+        """Abonne la connexion ; retourne les symboles refusés faute de place.
+
+        Un symbole est refusé si la connexion en suit déjà `max_symbols`, ou s'il n'est pas
+        encore sondé alors que le serveur en suit déjà `max_total_symbols`.
+        """
+        refused = []
+        for symbol in symbols:
+            if symbol in subscriber.symbols:
+                continue
+            if len(subscriber.symbols) >= self.max_symbols or (
+                    symbol not in self._symbols and len(self._symbols) >= self.max_total_symbols):
+                refused.append(symbol)
+                continue
+            subscriber.symbols.add(symbol)
+            state = self._symbols.setdefault(symbol, _Symbol())
+            state.subscribers.add(subscriber)
+            if state.last:
+                subscriber.push_quote(symbol, state.last, snapshot=True)
+            if state.task is None:
+                state.task = asyncio.ensure_future(self._poll(symbol, state))
+        return refused
+
+    def unsubscribe(self, subscriber: Subscriber, symbols):
+        for symbol in symbols:
+            subscriber.symbols.discard(symbol)
+            state = self._symbols.get(symbol)
+            if state is None:
+                continue
+            state.subscribers.discard(subscriber)
+            if not state.subscribers:
+                # Plus aucun abonné : le sondeur s'arrête, même en pleine attente
+                del self._symbols[symbol]
+                if state.task is not None:
+                    state.task.cancel()
+
+    def interval(self, symbol: str) -> float:
+        return self.fast_interval if self.is_open(symbol) else self.slow_interval
+
+    async def _poll(self, symbol: str, state: _Symbol):
+        failures = 0
+        while state.subscribers:
+            delay = self.interval(symbol)
+            try:
+                self.fetches += 1
+                quote = await asyncio.to_thread(self.load_quote, symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                failures += 1
+                # Amont en échec ou quota atteint : on espace les tentatives sans dépasser le rythme lent
+                delay = min(self.slow_interval, max(delay, getattr(e, "retry_after", 0)) * 2 ** min(failures, 5))
+                print(f"Erreur lors du sondage de la cotation {symbol}: {e}")
+            else:
+                failures = 0
+                if quote is None:
+                    self._drop(symbol, state, f"Aucune cotation disponible pour '{symbol}'.")
+                    return
+                changed = {k: v for k, v in quote.items() if state.last.get(k) != v}
+                if changed:
+                    snapshot = not state.last
+                    state.last.update(quote)
+                    self.broadcasts += 1
+                    for subscriber in list(state.subscribers):
+                        subscriber.push_quote(symbol, quote if snapshot else changed, snapshot=snapshot)
+            await asyncio.sleep(delay)
+
+    def _drop(self, symbol: str, state: _Symbol, detail: str):
+        for subscriber in list(state.subscribers):
+            subscriber.symbols.discard(symbol)
+            subscriber.notify({"type": "error", "symbol": symbol, "detail": detail})
+        state.subscribers.clear()
+        if self._symbols.get(symbol) is state:
+            del self._symbols[symbol]
+
+    async def close(self):
+        tasks = [state.task for state in self._symbols.values() if state.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._symbols.clear()
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._subscribers),
+            "symbols": len(self._symbols),
+            "subscriptions": sum(len(state.subscribers) for state in self._symbols.values()),
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "broadcasts": self.broadcasts,
+        }
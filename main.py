@@ -1,42 +1,106 @@
 # main.py - VERSION FINALE, PROPRE ET SÉCURISÉE
+# Chaque composant est initialisé une seule fois. Les SDK lourds (google.generativeai,
+# yfinance, pandas) sont importés au premier usage : le health check répond avant leur chargement.
+import startup
+import asyncio
+import contextlib
+import contextvars
+import json
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-import yfinance as yf
-import requests
-from pydantic import BaseModel
-import pandas as pd
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+with startup.timed_import("fastapi"):
+    from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.middleware.gzip import GZipMiddleware
+    from fastapi.responses import JSONResponse, Response, StreamingResponse
+    from pydantic import BaseModel
+with startup.timed_import("httpx"):
+    import httpx
+with startup.timed_import("numpy"):
+    import numpy as np
+with startup.timed_import("dotenv"):
+    from dotenv import load_dotenv
+with startup.timed_import("modules internes"):
+    import metrics
+    import quota
+    import wire
+    from cache import SingleFlight, TTLCache
+    from comments import CommentService, parse_batch_comments
+    from correlation import cluster_order, correlation_matrix, log_returns, rolling_correlation
+    from downsample import METHODS as DOWNSAMPLE_METHODS, downsample, last_per_period
+    from feeds import FeedScheduler
+    from http_client import UpstreamClient
+    from indicators import IndicatorSeries, parse_specs, spec_key
+    from live_quotes import QuoteHub
+    from portfolio import (CONFIDENCE_LEVELS, annualized_moments, betas, frontier, historical_var, parametric_var,
+                           sample_weights, simple_returns)
+    from price_store import PriceStore
+    from screener import FundamentalsIndex
+    from search_index import SymbolDirectory
+    from sessions import ChatSessionStore
+    from shared_store import open_store
+    from symbols import SYMBOLS_SNAPSHOT, SymbolIndex, load_snapshot
+
+# Importés au premier accès à l'un de leurs attributs
+yf = startup.LazyModule("yfinance")
+pd = startup.LazyModule("pandas")
 
 # --- CONFIGURATION SÉCURISÉE DES CLÉS API ---
+# Charge les variables depuis le fichier .env (pour le local) ou l'environnement (pour Render)
 load_dotenv()
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+MARKETAUX_API_KEY = os.getenv('MARKETAUX_API_KEY')
 FMP_API_KEY = os.getenv('FMP_API_KEY')
 
+# Modèle Gemini (IA) : le SDK est importé et configuré au premier usage, par get_model()
 model = None
-# Configuration du modèle Gemini (IA)
+_model_error = None
+_model_lock = threading.Lock()
+
 if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        print("INFO: Clé API Google trouvée. Le service IA est activé.")
-    except Exception as e:
-        print(f"ERREUR: La configuration de l'IA a échoué. Raison : {e}")
-        model = None
+    print("INFO: Clé API Google trouvée. Le service IA est activé.")
 else:
     print("AVERTISSEMENT: La clé API Google n'est pas configurée. Le service IA est désactivé.")
 
+def ai_enabled() -> bool:
+    """Vrai si le service IA est utilisable, sans forcer l'import du SDK."""
+    return model is not None or (bool(GOOGLE_API_KEY) and _model_error is None)
+
+def get_model():
+    """Retourne le modèle Gemini (None si le service IA est désactivé)."""
+    global model, _model_error
+    if model is None and ai_enabled():
+        with _model_lock:
+            if model is None and _model_error is None:
+                try:
+                    genai = startup.load("google.generativeai")
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                    model = genai.GenerativeModel('gemini-1.5-flash')
+                except Exception as e:
+                    _model_error = str(e)
+                    print(f"ERREUR: La configuration de l'IA a échoué. Raison : {e}")
+    return model
+
+# --- STOCKAGE PARTAGÉ ENTRE WORKERS (L2 DES CACHES, SESSIONS DE CHAT, FLUX) ---
+# Ex: SHARED_STORE=sqlite:///data/shared.db avec `uvicorn main:app --workers 4` ; vide = caches par processus
+shared_store = open_store(os.getenv('SHARED_STORE', ''))
+if shared_store is not None:
+    print(f"INFO: Stockage partagé entre workers : {shared_store.path}")
+
 # --- INITIALISATION DE L'APPLICATION FASTAPI ---
 app = FastAPI()
 
 # --- CONFIGURATION CORS ---
 origins = [
-    "https://finanalyses.pages.dev", # Assurez-vous que ceci est votre URL de production
+    "https://finanalyses.pages.dev",
     "http://localhost:8080",
     "http://127.0.0.1:8080",
-    "http://localhost:5500",
+    "http://localhost:5500", # Ajout pour le développement local avec Live Server
     "http://127.0.0.1:5500",
 ]
 app.add_middleware(
@@ -45,687 +109,1302 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Data-As-Of", "X-Data-Stale"],
 )
+# Compression des réponses volumineuses (séries de prix, matrices de corrélation)
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv('GZIP_MIN_BYTES', '1024')))
+
+# --- MÉTRIQUES PAR ROUTE ET JOURNAL DES REQUÊTES LENTES (SLOW_REQUEST_MS, 0 = désactivé) ---
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    phases = metrics.begin_request()
+    metrics.http_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.http_in_flight.dec()
+        # Le gabarit de la route (/api/entreprise/{ticker}) garde un nombre de séries borné
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.http_requests.inc(method=request.method, route=route, status=status)
+        metrics.http_duration.observe(elapsed, method=request.method, route=route)
+        if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+            print(f"REQUÊTE LENTE: {request.method} {request.url.path} -> {status} en {elapsed * 1000:.0f}ms [{metrics.format_phases(phases)}]")
+
+# --- DÉMARRAGE : PRÉCHARGEMENT FACULTATIF (WARMUP_ON_STARTUP) ET HEALTH CHECK ---
+@app.on_event("startup")
+def report_startup():
+    startup.mark_ready()
+    print(f"INFO: prêt en {startup.report()['readyAfterMs']}ms ({startup.format_report()})")
+    if os.getenv('WARMUP_ON_STARTUP', '1') == '1':
+        startup.warm_up(yf.load, pd.load, get_model)
+
+@app.get("/api/health")
+def health_check():
+    """Répond sans toucher aux SDK ni aux API externes."""
+    return {"status": "ok", "ai": ai_enabled(), "startup": startup.report(),
+            # Un module remplacé (ex: doublure du banc d'essai) n'a pas d'attribut `loaded` : il est chargé
+            "loaded": {"yfinance": getattr(yf, "loaded", True), "pandas": getattr(pd, "loaded", True), "gemini": model is not None}}
 
-# --- MODÈLES DE DONNÉES ---
+# --- MODÈLES DE DONNÉES ET STOCKAGE POUR LE CHAT ---
 class ChatMessage(BaseModel):
     session_id: str
     message: str
 
-chat_sessions = {} # Stockage en mémoire simple pour les sessions de chat
-
-# --- FONCTIONS UTILITAIRES ---
-def get_stock_data(ticker: str):
-    """Récupère les données d'un ticker et gère l'erreur 404."""
-    stock = yf.Ticker(ticker.upper())
-    if stock.history(period="1d").empty:
-        raise HTTPException(status_code=404, detail=f"Symbole '{ticker}' non trouvé ou sans données.")
-    return stock
-
-# --- POINTS D'ACCÈS DE L'API (ROUTES) ---
-
-@app.get("/api/entreprise/{ticker}")
-def get_financial_data(ticker: str):
-    try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        return {
-            "name": info.get("longName", ticker.upper()),
-            "symbol": info.get("symbol", ticker.upper()),
-            "sector": info.get("sector", "N/A"),
-            "country": info.get("country", "N/A"),
-            "price": info.get("currentPrice") or info.get("previousClose"),
-            "revenue": info.get("totalRevenue"),
-            "netIncome": info.get("netIncomeToCommon"),
-            "peRatio": info.get("trailingPE"),
-            "roe": info.get("returnOnEquity"),
-            "netMargin": info.get("profitMargins"),
-            "dividendYield": info.get('dividendYield'),
-        }
-    except HTTPException as e:
-        raise e # Fait remonter l'erreur 404
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur interne du serveur : {e}")
-
-@app.get("/api/historique/{ticker}")
-def get_historical_data(ticker: str):
-    try:
-        stock = get_stock_data(ticker)
-        hist = stock.history(period="1y")
-        return {
-            "dates": hist.index.strftime("%Y-%m-%d").tolist(),
-            "prices": hist["Close"].fillna(0).tolist(),
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/api/advanced-metrics/{ticker}")
-def get_advanced_metrics(ticker: str):
-    try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        cashflow = stock.cashflow
-        free_cashflow = None
-        if not cashflow.empty and 'Total Cash From Operating Activities' in cashflow.index and 'Capital Expenditures' in cashflow.index:
-            op_cash = cashflow.loc['Total Cash From Operating Activities'].iloc[0]
-            cap_ex = cashflow.loc['Capital Expenditures'].iloc[0]
-            if pd.notna(op_cash) and pd.notna(cap_ex):
-                free_cashflow = op_cash + cap_ex
-        return {
-            "currentRatio": info.get('currentRatio'),
-            "quickRatio": info.get('quickRatio'),
-            "debtToEquity": info.get('debtToEquity'),
-            "interestCoverage": info.get('interestCoverage'),
-            "freeCashFlow": free_cashflow,
-            "dividendYield": info.get('dividendYield'),
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.get("/api/dividends/{ticker}")
-def get_dividend_data(ticker: str):
-    try:
-        stock = get_stock_data(ticker)
-        dividends = stock.dividends.last('5Y') # '5Y' pour 5 ans
-        annual_dividends = {}
-        if not dividends.empty:
-            annual_dividends = dividends.resample('YE').sum().to_dict()
-        return {
-            "dividendHistory": {
-                "years": [d.year for d in annual_dividends.keys()],
-                "amounts": list(annual_dividends.values())
-            }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/api/chat")
-def chat_with_ai(chat_message: ChatMessage):
-    if not model:
-        raise HTTPException(status_code=503, detail="Le service de chat IA est désactivé sur le serveur (clé API manquante).")
-
-    session_id = chat_message.session_id
-    user_message = chat_message.message
-
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = model.start_chat(history=[
-            {"role": "user", "parts": ["Tu es FinAnalyse AI, un assistant conversationnel spécialisé en finance pour les débutants. Sois amical, pédagogique et explique les concepts simplement. Ne donne jamais de conseil d'investissement direct."]},
-            {"role": "model", "parts": ["Bonjour ! Je suis FinAnalyse AI. Comment puis-je vous aider à mieux comprendre la finance aujourd'hui ?"]}
-        ])
-    try:
-        response = chat_sessions[session_id].send_message(user_message)
-        return {"response": response.text}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur de communication avec l'IA: {e}")
-
-# (Les autres routes comme /historique, /screener, etc. peuvent être ajoutées ici si nécessaire)
-# main.py - VERSION FINALE, PROPRE ET SÉCURISÉE
-
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-import yfinance as yf
-import requests
-from pydantic import BaseModel
-import pandas as pd 
-from datetime import datetime, timedelta
-
-# --- CONFIGURATION SÉCURISÉE DES CLÉS API ---
-# Charge les variables depuis le fichier .env (pour le local) ou l'environnement (pour Render)
-load_dotenv()
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-MARKETAUX_API_KEY = os.getenv('MARKETAUX_API_KEY')
-FMP_API_KEY = os.getenv('FMP_API_KEY')
+CHAT_PREAMBLE = [
+    {"role": "user", "parts": ["Tu es FinAnalyse AI, un assistant conversationnel spécialisé en finance pour les débutants. Sois amical, pédagogique et explique les concepts simplement. Ne donne jamais de conseil d'investissement direct, mais aide les utilisateurs à comprendre les données."]},
+    {"role": "model", "parts": ["Bonjour ! Je suis FinAnalyse AI. Comment puis-je vous aider à mieux comprendre la finance aujourd'hui ?"]}
+]
 
-model = None
+# Sessions bornées : expiration après inactivité, nombre maximal et budget d'historique par session
+chat_sessions = ChatSessionStore(
+    factory=lambda: get_model().start_chat(history=CHAT_PREAMBLE),
+    idle_ttl=float(os.getenv('CHAT_SESSION_IDLE_TTL', '1800')),
+    max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', '1000')),
+    max_turns=int(os.getenv('CHAT_MAX_TURNS', '20')),
+    max_bytes=int(os.getenv('CHAT_MAX_SESSION_BYTES', str(32 * 1024))),
+    preamble=len(CHAT_PREAMBLE),
+    shared=shared_store,
+)
 
-if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        print("INFO: Clé API Google trouvée. Le service IA est activé.")
-    except Exception as e:
-        print(f"ERREUR: La configuration de l'IA a échoué. Raison : {e}")
-        model = None 
-else: 
-    print("AVERTISSEMENT: La clé API Google n'est pas configurée. Le service IA est désactivé.")
+@app.on_event("startup")
+def start_chat_session_sweeper():
+    chat_sessions.start_sweeper(interval=float(os.getenv('CHAT_SWEEP_INTERVAL', '60')))
 
-# --- INITIALISATION DE L'APPLICATION FASTAPI ---
-app = FastAPI()
+# --- FONCTIONS HELPER ---
+# Regroupe les appels amont identiques en cours (yfinance, FMP, Marketaux) ;
+# un utilisateur qui rejoint un préchargement en cours le fait passer en priorité interactive
+upstream_flight = SingleFlight(priorities=quota.FlightPriority())
+
+# Client HTTP partagé (keep-alive, timeouts, retries) pour FMP et Marketaux
+http_client = UpstreamClient(
+    connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', '3')),
+    read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '10')),
+    max_per_host=int(os.getenv('HTTP_MAX_PER_HOST', '10')),
+    retries=int(os.getenv('HTTP_RETRIES', '2')),
+)
 
-# --- CONFIGURATION CORS ---
-origins = [
-    "https://finanalyses.pages.dev",
-    "http://localhost:8080",
-    "http://127.0.0.1:8080",
-    "http://localhost:5500", # Ajout pour le développement local avec Live Server
-    "http://127.0.0.1:5500",
-]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+UPSTREAM_HOSTS = {"financialmodelingprep.com": "fmp", "api.marketaux.com": "marketaux"}
+
+# --- QUOTAS DES API EXTERNES : UN SEAU À JETONS PAR FOURNISSEUR ---
+# Format "requêtes/secondes[:rafale]" (ex: QUOTA_FMP=300/60:30) ; "off" désactive la limite.
+# Les quotas s'appliquent par worker : avec N workers, diviser le quota du plan par N.
+UPSTREAM_QUOTAS = {"fmp": "300/60", "marketaux": "100/60", "gemini": "15/60", "yfinance": "600/60:60"}
+quotas = quota.QuotaScheduler(
+    {name: limit for name, default in UPSTREAM_QUOTAS.items()
+     if (limit := quota.parse_quota(os.getenv(f'QUOTA_{name.upper()}', default))) is not None},
+    deadlines=(float(os.getenv('QUOTA_DEADLINE_INTERACTIVE', '2')), float(os.getenv('QUOTA_DEADLINE_BACKGROUND', '30')),
+               float(os.getenv('QUOTA_DEADLINE_WARMUP', '300'))),
 )
 
-# --- MODÈLES DE DONNÉES ET STOCKAGE POUR LE CHAT ---
-class ChatMessage(BaseModel):
-    session_id: str
-    message: str
+async def fetch_json(url: str, params: dict = None, priority: int = None):
+    """GET JSON partagé entre les requêtes concurrentes identiques, dans la limite du quota de l'hôte."""
+    key = ("http", url, tuple(sorted((params or {}).items())))
+    parts = urlsplit(url)
+    upstream = UPSTREAM_HOSTS.get(parts.hostname, parts.hostname)
 
-chat_sessions = {}
+    async def load():
+        await quotas.acquire_async(upstream, priority)
+        try:
+            with metrics.timed(upstream, parts.path.rsplit("/", 1)[-1]):
+                return await http_client.get_json(url, params=params)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 429:
+                raise
+            # Quota du plan épuisé malgré les retries : plus d'appel avant le délai annoncé
+            retry_after = e.response.headers.get("Retry-After", "")
+            retry_after = float(retry_after) if retry_after.isdigit() else 60.0
+            quotas.penalize(upstream, retry_after)
+            raise quota.QuotaExceeded(upstream, retry_after)
+    return await upstream_flight.do_async(key, load)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+# --- CACHE PARTAGÉ DES DONNÉES PAR TICKER ---
+ticker_cache = TTLCache(max_bytes=int(os.getenv('TICKER_CACHE_MAX_MB', '64')) * 1024 * 1024, flight=upstream_flight,
+                        shared=shared_store, namespace="ticker")
+
+class CachedTicker:
+    """Enveloppe yf.Ticker : chaque type de donnée passe par le cache partagé."""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol.upper()
+        self._ticker = None
+
+    @property
+    def ticker(self):
+        if self._ticker is None:
+            self._ticker = yf.Ticker(self.symbol)
+        return self._ticker
+
+    def _cached(self, kind: str, fetch):
+        def load():
+            quotas.acquire("yfinance")
+            with metrics.timed("yfinance", kind.split(":")[0]):
+                return fetch()
+        return ticker_cache.get_or_fetch(self.symbol, kind, load)
+
+    def history(self, period: str = "1mo", **kwargs):
+        # La période "1d" sert de cotation : elle expire bien plus vite que l'historique
+        kind = "quote" if period == "1d" else "intraday" if kwargs.get("interval") in INTRADAY_INTERVALS else "history"
+        key = f"{kind}:{period}" + "".join(f":{k}={v}" for k, v in sorted(kwargs.items()))
+        return self._cached(key, lambda: self.ticker.history(period=period, **kwargs))
+
+    @property
+    def info(self):
+        return self._cached("info", lambda: self.ticker.info)
+
+    @property
+    def cashflow(self):
+        return self._cached("cashflow", lambda: self.ticker.cashflow)
+
+    @property
+    def financials(self):
+        return self._cached("financials", lambda: self.ticker.financials)
+
+    @property
+    def dividends(self):
+        return self._cached("dividends", lambda: self.ticker.dividends)
+
+# --- INDEX DES SYMBOLES : ÉVITE LA SONDE history("1d") POUR LES SYMBOLES DÉJÀ CONNUS ---
+symbol_index = SymbolIndex(
+    positive_ttl=float(os.getenv('SYMBOL_POSITIVE_TTL', str(24 * 3600))),
+    negative_ttl=float(os.getenv('SYMBOL_NEGATIVE_TTL', '3600')),
+)
+symbol_index.seed(row["symbol"] for row in load_snapshot())
 
-# --- FONCTIONS HELPER ---
 def get_stock_data(ticker: str):
-    stock = yf.Ticker(ticker.upper())
-    if stock.history(period="1d").empty:
+    """Fonction utilitaire pour récupérer l'objet Ticker et gérer les erreurs de base."""
+    status = symbol_index.lookup(ticker)
+    if status is False:
         raise HTTPException(status_code=404, detail=f"Symbole '{ticker}' non trouvé ou sans données.")
+    stock = CachedTicker(ticker)
+    if status is None:
+        # Symbole inconnu : si l'historique est vide, le ticker est probablement invalide
+        if stock.history(period="1d").empty:
+            symbol_index.mark_invalid(ticker)
+            raise HTTPException(status_code=404, detail=f"Symbole '{ticker}' non trouvé ou sans données.")
+        symbol_index.mark_valid(ticker)
     return stock
 
-def generate_ai_analysis_comment(data: dict) -> str:
-    if not model:
-        return "Le service d'analyse par IA est désactivé car la clé API n'est pas configurée."
-    try:
-        prompt = f"""
-        En tant qu'analyste financier pour des débutants, rédige une courte analyse (3-4 phrases) pour l'entreprise {data.get('name', 'N/A')}.
-        Le ton doit être neutre et informatif. Utilise un langage simple.
-        Voici les données clés :
-        - Prix : ${data.get('price', 0):.2f}
-        - Chiffre d'affaires : {data.get('revenue', 0) / 1e9:.1f} milliards $
-        - Bénéfice net : {data.get('netIncome', 0) / 1e9:.1f} milliards $
-        - PER : {data.get('peRatio', 0):.1f}
-        - ROE : {data.get('roe', 0) * 100:.1f}%
-        - Marge nette : {data.get('netMargin', 0) * 100:.1f}%
-        Basé sur ces données, mentionne un point fort et un point de vigilance. Conclus par une phrase neutre. Ne donne pas de conseil d'investissement.
-        """
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        print(f"Erreur lors de la génération par l'IA: {e}")
-        return "Le commentaire d'analyse par l'IA n'est pas disponible pour le moment."
-
 # --- POINTS D'ACCÈS DE L'API (ROUTES) ---
 
+# --- FLUX COMMUNS (ACTUALITÉS, MOVERS, CALENDRIER) : SERVIS DEPUIS UN INSTANTANÉ ---
+async def _fetch_news():
+    url = f"https://api.marketaux.com/v1/news/all?countries=us,fr&filter_entities=true&limit=15&language=en&api_token={MARKETAUX_API_KEY}"
+    data = await fetch_json(url, priority=quota.BACKGROUND)
+    return {"articles": data.get("data", [])}
+
+async def _fetch_gainers():
+    return await fetch_json(f"https://financialmodelingprep.com/api/v3/stock_market/gainers?apikey={FMP_API_KEY}", priority=quota.BACKGROUND)
+
+async def _fetch_losers():
+    return await fetch_json(f"https://financialmodelingprep.com/api/v3/stock_market/losers?apikey={FMP_API_KEY}", priority=quota.BACKGROUND)
+
+async def _fetch_economic_calendar():
+    # On récupère les événements pour la semaine à venir
+    today = datetime.now().strftime('%Y-%m-%d')
+    next_week = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+    return await fetch_json(f"https://financialmodelingprep.com/api/v3/economic_calendar?from={today}&to={next_week}&apikey={FMP_API_KEY}", priority=quota.BACKGROUND)
+
+market_feeds = FeedScheduler(shared=shared_store)
+market_feeds.register("news", _fetch_news, float(os.getenv('FEED_REFRESH_NEWS', '600')))
+market_feeds.register("gainers", _fetch_gainers, float(os.getenv('FEED_REFRESH_MOVERS', '300')))
+market_feeds.register("losers", _fetch_losers, float(os.getenv('FEED_REFRESH_MOVERS', '300')))
+market_feeds.register("economic-calendar", _fetch_economic_calendar, float(os.getenv('FEED_REFRESH_CALENDAR', '3600')))
+
+@app.on_event("startup")
+async def start_market_feeds():
+    # On ne rafraîchit que les flux dont la clé API est configurée
+    enabled = (["news"] if MARKETAUX_API_KEY else []) + (["gainers", "losers", "economic-calendar", "symbols"] if FMP_API_KEY else [])
+    market_feeds.start(enabled)
+
+@app.on_event("shutdown")
+async def stop_market_feeds():
+    await market_feeds.stop()
+
+async def serve_feed(name: str):
+    """Renvoie le dernier instantané du flux avec ses marqueurs de fraîcheur."""
+    data, as_of, stale = await market_feeds.feeds[name].get()
+    headers = {"X-Data-As-Of": as_of.isoformat(), "X-Data-Stale": "true" if stale else "false"}
+    if isinstance(data, dict):
+        data = {**data, "asOf": as_of.isoformat(), "stale": stale}
+    return JSONResponse(content=data, headers=headers)
+
 @app.get("/api/news")
-def get_real_time_news():
+async def get_real_time_news():
     if not MARKETAUX_API_KEY:
         raise HTTPException(status_code=500, detail="La clé API pour les actualités n'est pas configurée.")
-    
-    url = f"https://api.marketaux.com/v1/news/all?countries=us,fr&filter_entities=true&limit=15&language=en&api_token={MARKETAUX_API_KEY}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        return {"articles": data.get("data", [])}
-    except requests.exceptions.RequestException as e:
+        return await serve_feed("news")
+    except httpx.HTTPError as e:
         print(f"Erreur API Marketaux: {e}")
         raise HTTPException(status_code=503, detail="Le service d'actualités est temporairement indisponible.")
 
+# --- CONSTRUCTION DES RÉPONSES À PARTIR D'UN TICKER DÉJÀ VALIDÉ ---
+def build_financial_data(stock, ticker: str) -> dict:
+    info = stock.info
+    # Les métriques absentes restent à null : le client affiche "N/A" plutôt qu'un 0 trompeur
+    return {
+        "name": info.get("longName", ticker.upper()),
+        "symbol": info.get("symbol", ticker.upper()),
+        "sector": info.get("sector", "N/A"),
+        "country": info.get("country", "N/A"),
+        "price": info.get("currentPrice") or info.get("previousClose"),
+        "revenue": info.get("totalRevenue"),
+        "netIncome": info.get("netIncomeToCommon"),
+        "peRatio": info.get("trailingPE"),
+        "roe": info.get("returnOnEquity"),
+        "netMargin": info.get("profitMargins"),
+        "dividendYield": info.get('dividendYield'),
+    }
 
+# Profondeur en jours calendaires ; "1d" et "5d" comptent des séances, "ytd" et "max" sont calculées
+HISTORY_PERIODS = {"1d": None, "5d": None, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 365, "2y": 730,
+                   "5y": 1826, "10y": 3653, "ytd": None, "max": None}
+SESSION_PERIODS = {"1d": 1, "5d": 5}
+# Intervalle intrajournalier -> (période téléchargée en une fois, profondeur en jours) : la plus longue
+# acceptée par Yahoo ; les périodes plus courtes et les zooms sont découpés dans cette série en cache.
+INTRADAY_INTERVALS = {"1m": ("5d", 7), "2m": ("1mo", 31), "5m": ("1mo", 31), "15m": ("1mo", 31), "30m": ("1mo", 31),
+                      "90m": ("1mo", 31), "60m": ("2y", 730), "1h": ("2y", 730)}
+DAILY_INTERVALS = ("1d", "1wk", "1mo")
+
+def _history_start(times: np.ndarray, period: str):
+    """Premier instant affiché pour `period` (None = toute la série)."""
+    if period in SESSION_PERIODS:
+        sessions = np.unique(times.astype("datetime64[D]"))
+        return sessions[-min(SESSION_PERIODS[period], len(sessions))] if len(sessions) else None
+    if period == "ytd":
+        return np.datetime64(date(date.today().year, 1, 1), "D")
+    if period == "max":
+        return None
+    return np.datetime64(date.today() - timedelta(days=HISTORY_PERIODS[period]), "D")
+
+def load_price_series(stock, period: str = "1y", interval: str = "1d", start: date = None, end: date = None):
+    """Retourne (instants, clôtures) en pleine résolution sur la fenêtre demandée.
+
+    Journalier, hebdomadaire, mensuel : stockage local des cours (aucun appel amont pour zoomer).
+    Intrajournalier : série Yahoo la plus longue pour l'intervalle, en cache, heure de la place de cotation.
+    """
+    if interval in INTRADAY_INTERVALS:
+        hist = stock.history(period=INTRADAY_INTERVALS[interval][0], interval=interval)
+        index = hist.index.tz_localize(None) if getattr(hist.index, "tz", None) is not None else hist.index
+        times = index.values.astype("datetime64[m]")
+        close = hist["Close"].to_numpy(dtype=np.float64) if "Close" in hist else np.empty(0)
+    else:
+        series = price_store.get(stock.symbol)
+        times, close = series.days, series.close
+        if interval != "1d":
+            keep = last_per_period(times, interval)
+            times, close = times[keep], close[keep]
+
+    first = np.datetime64(start, "D") if start else _history_start(times, period)
+    mask = np.ones(len(times), dtype=bool)
+    if first is not None:
+        mask &= times >= first
+    if end:
+        mask &= times < np.datetime64(end, "D") + np.timedelta64(1, "D")
+    return times[mask], close[mask]
+
+def select_points(times: np.ndarray, close: np.ndarray, max_points: int = None, method: str = "lttb"):
+    """Sous-échantillonne la série au-delà de `max_points` ; retourne (instants, clôtures, méthode ou None)."""
+    if not max_points or len(times) <= max_points:
+        return times, close, None
+    finite = np.isfinite(close)
+    times, close = times[finite], close[finite]
+    with metrics.phase("historique.downsample"):
+        keep = downsample(times.astype(np.int64), close, max_points, method)
+    return times[keep], close[keep], method
+
+def build_historical_data(stock, encoding: str = "json", period: str = "1y", interval: str = "1d",
+                          max_points: int = None, method: str = "lttb", start: date = None, end: date = None) -> dict:
+    times, close = load_price_series(stock, period, interval, start, end)
+    total = len(times)
+    times, close, downsampled = select_points(times, close, max_points, method)
+    meta = {"period": period, "interval": interval, "points": len(times), "totalPoints": total, "downsampled": downsampled}
+
+    intraday = interval in INTRADAY_INTERVALS
+    if encoding == "compact":
+        axis = wire.encode_times(times) if intraday else wire.encode_days(times)
+        return {**axis, "prices": wire.encode_column(close), **meta}
+    return {
+        "dates": np.datetime_as_string(times).tolist(),
+        "prices": np.nan_to_num(close, nan=0.0).tolist(),
+        **meta,
+    }
 
+def build_advanced_metrics(stock) -> dict:
+    info = stock.info
+    cashflow = stock.cashflow
+
+    free_cashflow = None
+    if not cashflow.empty and 'Total Cash From Operating Activities' in cashflow.index and 'Capital Expenditures' in cashflow.index:
+        op_cash = cashflow.loc['Total Cash From Operating Activities'].iloc[0]
+        cap_ex = cashflow.loc['Capital Expenditures'].iloc[0]
+        if pd.notna(op_cash) and pd.notna(cap_ex):
+            free_cashflow = op_cash + cap_ex
+
+    return {
+        "currentRatio": info.get('currentRatio'),
+        "quickRatio": info.get('quickRatio'),
+        "debtToEquity": info.get('debtToEquity'),
+        "interestCoverage": info.get('interestCoverage'),
+        "freeCashFlow": free_cashflow,
+        "dividendYield": info.get('dividendYield'),
+    }
 
+def build_dividend_data(stock) -> dict:
+    dividends = stock.dividends
+    if not dividends.empty:
+        # Équivalent de `last('5YE')`, retiré de pandas 3
+        dividends = dividends[dividends.index > dividends.index[-1] - pd.DateOffset(years=5)]
+    annual_dividends = {}
+    if not dividends.empty:
+        annual_dividends = dividends.resample('YE').sum().to_dict()
+
+    return {
+        "dividendHistory": {
+            "years": [d.year for d in annual_dividends.keys()],
+            "amounts": list(annual_dividends.values())
+        }
+    }
 
 @app.get("/api/entreprise/{ticker}")
 def get_financial_data(ticker: str):
     try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        
-        financial_data = {
-            "name": info.get("longName", ticker.upper()),
-            "symbol": info.get("symbol", ticker.upper()),
-            "logo_url": info.get("logo_url", ""),
-            "sector": info.get("sector", "N/A"),
-            "country": info.get("country", "N/A"),
-            "price": info.get("currentPrice") or info.get("previousClose") or 0,
-            "revenue": info.get("totalRevenue") or 0,
-            "netIncome": info.get("netIncomeToCommon") or 0,
-            "peRatio": info.get("trailingPE") or 0,
-            "roe": info.get("returnOnEquity") or 0,
-            "netMargin": info.get("profitMargins") or 0,
-            "dividendYield": info.get('dividendYield') or 0,
-        }
-        
-        return financial_data
-        
+        return attach_analysis_comment(build_financial_data(get_stock_data(ticker), ticker))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+# --- LOT DE TICKERS : LISTES DE SUIVI, COMPARAISONS, RÉSULTATS PAR PAYS ---
+ENTREPRISE_BATCH_MAX = int(os.getenv('ENTREPRISE_BATCH_MAX', '50'))
+ENTREPRISE_BATCH_TIMEOUT = float(os.getenv('ENTREPRISE_BATCH_TIMEOUT', '20'))
+# Pool partagé par toutes les requêtes de lots du worker : petit et indépendant de la taille d'un lot,
+# l'essentiel des cotations venant déjà d'un seul téléchargement groupé
+batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ENTREPRISE_BATCH_WORKERS', '8')), thread_name_prefix="batch")
+
+def download_quotes(symbols: list) -> dict:
+    """{symbole: dernière cotation} en un seul yf.download ; un symbole sans cotation est absent."""
+    def load():
+        quotas.acquire("yfinance")
+        with metrics.timed("yfinance", "download"):
+            return yf.download(symbols, period="5d", progress=False, threads=True)
+    frame = upstream_flight.do(("download",) + tuple(symbols), load)
+    close = frame["Close"] if "Close" in frame else pd.DataFrame()
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    quotes = {}
+    for symbol in symbols:
+        series = close[symbol].dropna() if symbol in close else ()
+        if not len(series):
+            continue
+        price = float(series.iloc[-1])
+        previous = float(series.iloc[-2]) if len(series) > 1 else None
+        quotes[symbol] = {
+            "price": price,
+            "previousClose": previous,
+            "change": price - previous if previous else None,
+            "changePercent": (price / previous - 1) * 100 if previous else None,
+            "asOf": series.index[-1].date().isoformat(),
+        }
+    return quotes
+
+def load_last_quotes(symbols: list) -> dict:
+    """Comme `download_quotes`, mais seuls les symboles absents du cache sont téléchargés."""
+    quotes, missing = {}, []
+    for symbol in symbols:
+        found, quote = ticker_cache.get(symbol, "quote:last")
+        if found:
+            quotes[symbol] = quote
+        else:
+            missing.append(symbol)
+    if missing:
+        for symbol, quote in download_quotes(missing).items():
+            quotes[symbol] = quote
+            ticker_cache.set(symbol, "quote:last", quote)
+    return quotes
+
+def _build_batch_entry(symbol: str, quote: dict) -> dict:
+    if quote is None:
+        # Absent du téléchargement groupé : validation habituelle (index, puis sonde)
+        stock = get_stock_data(symbol)
+    else:
+        symbol_index.mark_valid(symbol)
+        stock = CachedTicker(symbol)
+    data = build_financial_data(stock, symbol)
+    if quote is not None:
+        data.update(price=quote["price"], previousClose=quote["previousClose"],
+                    change=quote["change"], changePercent=quote["changePercent"])
+    return data
+
+@app.get("/api/entreprise")
+def get_financial_data_batch(tickers: str, comments: bool = True):
+    """Données clés de plusieurs entreprises (`tickers=A,B,C`) ; les échecs sont rapportés par symbole."""
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="Aucun ticker fourni.")
+    if len(symbols) > ENTREPRISE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Au plus {ENTREPRISE_BATCH_MAX} tickers par requête.")
+
+    errors = {s: f"Symbole '{s}' non trouvé ou sans données." for s in symbols if symbol_index.lookup(s) is False}
+    candidates = [s for s in symbols if s not in errors]
+    try:
+        quotes = load_last_quotes(candidates) if candidates else {}
+    except Exception as e:
+        # Sans téléchargement groupé, chaque symbole retombe sur le cours de `info`
+        print(f"Erreur lors du téléchargement groupé des cotations: {e}")
+        quotes = {}
+
+    pending = {s: batch_executor.submit(contextvars.copy_context().run, _build_batch_entry, s, quotes.get(s))
+               for s in candidates}
+    done, _ = wait(pending.values(), timeout=ENTREPRISE_BATCH_TIMEOUT)
+    results = []
+    for symbol, future in pending.items():
+        if future not in done:
+            # `cancel()` ne retire que les tâches encore en file : une recherche déjà commencée va
+            # jusqu'au bout et ne fait que remplir le cache, sa réponse n'est plus attendue
+            future.cancel()
+            errors[symbol] = "Délai dépassé pour ce symbole."
+            continue
+        try:
+            results.append(future.result())
+        except HTTPException as e:
+            errors[symbol] = e.detail
+        except Exception as e:
+            errors[symbol] = str(e)
+    if comments:
+        attach_analysis_comments(results)
+    return {"results": results, "errors": errors}
+
+# --- COTATIONS EN DIRECT (WEBSOCKET) : LE COÛT AMONT SUIT LE NOMBRE DE SYMBOLES, PAS DE CLIENTS ---
+def load_live_quote(symbol: str):
+    # Via le cache "live" : avec SHARED_STORE, un seul worker interroge l'amont par symbole et par période
+    with quota.priority(quota.BACKGROUND):
+        return ticker_cache.get_or_fetch(symbol, "live", lambda: download_quotes([symbol]).get(symbol))
+
+quote_hub = QuoteHub(
+    load_quote=load_live_quote,
+    fast_interval=float(os.getenv('QUOTES_FAST_INTERVAL', '10')),
+    slow_interval=float(os.getenv('QUOTES_SLOW_INTERVAL', '300')),
+    max_symbols=int(os.getenv('QUOTES_MAX_SYMBOLS', '50')),
+    max_total_symbols=int(os.getenv('QUOTES_MAX_TOTAL_SYMBOLS', '500')),
+)
+
+@app.on_event("shutdown")
+async def close_quote_hub():
+    await quote_hub.close()
+
+@app.websocket("/ws/quotes")
+async def quotes_socket(websocket: WebSocket):
+    """Messages du client : {"action": "subscribe" | "unsubscribe", "symbols": ["AAPL", ...]}.
+
+    Le serveur envoie l'état complet d'un symbole à l'abonnement ("snapshot": true),
+    puis uniquement les champs modifiés à chaque nouveau sondage.
+    """
+    await websocket.accept()
+    subscriber = quote_hub.connect()
+
+    async def send():
+        while True:
+            for message in await subscriber.next():
+                await websocket.send_json(message)
+
+    sender = asyncio.ensure_future(send())
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+                action = message.get("action")
+                symbols = list(dict.fromkeys(str(s).strip().upper() for s in message.get("symbols", []) if str(s).strip()))
+            except (ValueError, AttributeError, TypeError):
+                subscriber.notify({"type": "error", "detail": "Message invalide (JSON attendu)."})
+                continue
+            if action == "subscribe":
+                unknown = [s for s in symbols if symbol_index.lookup(s) is False]
+                for symbol in unknown:
+                    subscriber.notify({"type": "error", "symbol": symbol, "detail": f"Symbole '{symbol}' non trouvé ou sans données."})
+                refused = quote_hub.subscribe(subscriber, [s for s in symbols if s not in unknown])
+                if refused:
+                    subscriber.notify({"type": "error", "symbols": refused,
+                                       "detail": f"Au plus {quote_hub.max_symbols} symboles par connexion et {quote_hub.max_total_symbols} sur le serveur."})
+            elif action == "unsubscribe":
+                quote_hub.unsubscribe(subscriber, symbols)
+            else:
+                subscriber.notify({"type": "error", "detail": f"Action inconnue '{action}' (attendu : subscribe, unsubscribe)."})
+                continue
+            subscriber.notify({"type": "subscriptions", "symbols": sorted(subscriber.symbols)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        quote_hub.disconnect(subscriber)
+        sender.cancel()
+        # Une erreur d'envoi (client parti) n'a plus d'intérêt une fois la connexion fermée
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await sender
+
 @app.get("/api/historique/{ticker}")
-def get_historical_data(ticker: str):
+def get_historical_data(ticker: str, request: Request, format: str = None, period: str = "1y", interval: str = "1d",
+                        max_points: int = Query(None, ge=10, le=20000), method: str = "lttb",
+                        start: date = None, end: date = None):
+    # format=compact (ou Accept: application/vnd.finanalyse.compact+json) : dates et prix codés par deltas
+    # max_points : sous-échantillonnage côté serveur (lttb par défaut, ou minmax) ; start/end pour zoomer
+    encoding = wire.negotiate(format, request.headers.get("accept"))
+    if period not in HISTORY_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Période inconnue '{period}' (attendu : {', '.join(HISTORY_PERIODS)}).")
+    if interval not in DAILY_INTERVALS and interval not in INTRADAY_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Intervalle inconnu '{interval}' (attendu : {', '.join(DAILY_INTERVALS + tuple(INTRADAY_INTERVALS))}).")
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"Méthode inconnue '{method}' (attendu : {', '.join(DOWNSAMPLE_METHODS)}).")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="La date de début doit précéder la date de fin.")
+    if interval in INTRADAY_INTERVALS:
+        depth_period, depth = INTRADAY_INTERVALS[interval]
+        too_long = period not in SESSION_PERIODS and (period in ("ytd", "max") or HISTORY_PERIODS[period] > depth)
+        if too_long or (start and start < date.today() - timedelta(days=depth)):
+            raise HTTPException(status_code=400, detail=f"L'intervalle '{interval}' n'est disponible que sur la période '{depth_period}'.")
     try:
         stock = get_stock_data(ticker)
-        hist = stock.history(period="1y")
-        return {
-            "dates": hist.index.strftime("%Y-%m-%d").tolist(),
-            "prices": hist["Close"].fillna(0).tolist(),
-        }
+        if encoding == "arrow":
+            times, close, _ = select_points(*load_price_series(stock, period, interval, start, end), max_points, method)
+            return wire.arrow_response({"date": times, "close": close})
+        return wire.json_response(build_historical_data(stock, encoding, period, interval, max_points, method, start, end), encoding)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/advanced-metrics/{ticker}")
 def get_advanced_metrics(ticker: str):
     try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        cashflow = stock.cashflow
-        
-        free_cashflow = None
-        if not cashflow.empty and 'Total Cash From Operating Activities' in cashflow.index and 'Capital Expenditures' in cashflow.index:
-            op_cash = cashflow.loc['Total Cash From Operating Activities'].iloc[0]
-            cap_ex = cashflow.loc['Capital Expenditures'].iloc[0]
-            if pd.notna(op_cash) and pd.notna(cap_ex):
-                free_cashflow = op_cash + cap_ex
-        
-        return {
-            "currentRatio": info.get('currentRatio'),
-            "quickRatio": info.get('quickRatio'),
-            "debtToEquity": info.get('debtToEquity'),
-            "interestCoverage": info.get('interestCoverage'),
-            "freeCashFlow": free_cashflow,
-            "dividendYield": info.get('dividendYield'),
-        }
+        return build_advanced_metrics(get_stock_data(ticker))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/dividends/{ticker}")
 def get_dividend_data(ticker: str):
     try:
-        stock = get_stock_data(ticker)
-        dividends = stock.dividends.last('5YE')
-        annual_dividends = {}
-        if not dividends.empty:
-            annual_dividends = dividends.resample('YE').sum().to_dict()
-        
-        return {
-            "dividendRate": stock.info.get("dividendRate"),
-            "payoutRatio": stock.info.get("payoutRatio"),
-            "dividendHistory": {
-                "years": [d.year for d in annual_dividends.keys()],
-                "amounts": list(annual_dividends.values())
-            }
-        }
+        return build_dividend_data(get_stock_data(ticker))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/screener")
-def stock_screener(sector: str = None, pe_max: float = None, dividend_min: float = None):
-    # Vérifie si la clé API FMP est disponible
-    if not FMP_API_KEY:
-        raise HTTPException(status_code=503, detail="La clé API pour le screener n'est pas configurée sur le serveur.")
-
-    # Construit l'URL de l'API FMP avec les paramètres
-    base_url = "https://financialmodelingprep.com/api/v3/stock-screener"
-    params = {
-        "apikey": FMP_API_KEY,
-        "limit": 100  # On peut récupérer jusqu'à 100 résultats
-    }
+# --- NOUVEAU : POINT D'ACCÈS GROUPÉ POUR LA PAGE D'ANALYSE ---
+ANALYSIS_SECTIONS = {
+    "entreprise": lambda stock, ticker: attach_analysis_comment(build_financial_data(stock, ticker)),
+    "historique": lambda stock, ticker: build_historical_data(stock),
+    "advancedMetrics": lambda stock, ticker: build_advanced_metrics(stock),
+    "dividends": lambda stock, ticker: build_dividend_data(stock),
+}
+# Pour les comparaisons, les commentaires IA sont demandés ensuite en un seul lot
+COMPARE_SECTIONS = {
+    "entreprise": lambda stock, ticker: build_financial_data(stock, ticker),
+    "advancedMetrics": ANALYSIS_SECTIONS["advancedMetrics"],
+}
+analysis_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ANALYSIS_WORKERS', '8')), thread_name_prefix="analysis")
 
-    if sector:
-        params["sector"] = sector
-    if pe_max is not None:
-        params["priceEarningRatio"] = pe_max  # FMP utilise "priceEarningRatio" pour le P/E Ratio
-    if dividend_min is not None:
-        # FMP attend le % de dividende, donc on n'a pas besoin de le diviser par 100
-        params["dividendYield"] = dividend_min
+def _build_sections(ticker: str, sections, parallel: bool = True, builders: dict = ANALYSIS_SECTIONS) -> dict:
+    """Valide le ticker une seule fois puis construit les sections demandées.
 
+    Les sections d'un même ticker partagent les données via le cache ; `parallel=False`
+    est utilisé depuis un thread du pool pour ne jamais attendre une tâche du même pool.
+    """
+    stock = get_stock_data(ticker)
+    if parallel:
+        # Chaque tâche reçoit une copie du contexte : ses phases sont attribuées à la requête
+        pending = {name: analysis_executor.submit(contextvars.copy_context().run, builders[name], stock, ticker) for name in sections}
+        calls = {name: future.result for name, future in pending.items()}
+    else:
+        calls = {name: (lambda name=name: builders[name](stock, ticker)) for name in sections}
+    result, errors = {}, {}
+    for name, call in calls.items():
+        try:
+            result[name] = call()
+        except Exception as e:
+            errors[name] = str(e)
+    if errors:
+        result["errors"] = errors
+    return result
+
+@app.get("/api/analysis/{ticker}")
+def get_analysis_bundle(ticker: str, request: Request, sections: str = None, compare: str = None, format: str = None):
+    """Regroupe entreprise, historique, métriques avancées et dividendes en une seule réponse."""
+    encoding = wire.negotiate(format, request.headers.get("accept"), allowed=("json", "compact"))
+    builders = ANALYSIS_SECTIONS
+    if encoding == "compact":
+        builders = {**ANALYSIS_SECTIONS, "historique": lambda stock, ticker: build_historical_data(stock, "compact")}
+    requested = [s.strip() for s in sections.split(',') if s.strip()] if sections else list(ANALYSIS_SECTIONS)
+    unknown = [s for s in requested if s not in ANALYSIS_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Sections inconnues : {', '.join(unknown)}")
+    compare_list = [t.strip().upper() for t in compare.split(',') if t.strip()] if compare else []
+
+    # Les comparaisons sont lancées en même temps que le ticker principal
+    compare_futures = {t: analysis_executor.submit(contextvars.copy_context().run, _build_sections, t, COMPARE_SECTIONS, False, COMPARE_SECTIONS) for t in compare_list}
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Lève une exception si la requête échoue (ex: 4xx, 5xx)
-        
-        # Formate les résultats pour correspondre à ce que le frontend attend
-        data = response.json()
-        results = []
-        for item in data:
-            results.append({
-                "symbol": item.get("symbol"),
-                "name": item.get("companyName"),
-                "pe": item.get("priceEarningRatio"),
-                "dividendYield": item.get("dividendYield")
-            })
-
-        return {"results": results}
-
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=503, detail=f"Erreur de communication avec le service de screener: {e}")
+        bundle = _build_sections(ticker, requested, builders=builders)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    bundle["symbol"] = ticker.upper()
+    if compare_list:
+        bundle["compare"] = {}
+        for t, future in compare_futures.items():
+            try:
+                bundle["compare"][t] = future.result()
+            except HTTPException as e:
+                bundle["compare"][t] = {"error": e.detail}
+            except Exception as e:
+                bundle["compare"][t] = {"error": str(e)}
+        attach_analysis_comments([c["entreprise"] for c in bundle["compare"].values() if "entreprise" in c])
+    return wire.json_response(bundle, encoding)
+
+# --- SCREENER : INDEX DES FONDAMENTAUX RAFRAÎCHI EN ARRIÈRE-PLAN ---
+# L'univers vient de l'instantané local, ou d'un CSV plus large via SCREENER_UNIVERSE
+def _warmup_info(symbol: str) -> dict:
+    # Classe la moins prioritaire : le préchargement ne consomme pas le quota réservé aux utilisateurs
+    with quota.priority(quota.WARMUP):
+        return CachedTicker(symbol).info
+
+screener_universe = [row["symbol"] for row in load_snapshot(os.getenv('SCREENER_UNIVERSE') or SYMBOLS_SNAPSHOT)]
+fundamentals_index = FundamentalsIndex(
+    # Via le cache des tickers : avec plusieurs workers, chaque `info` n'est demandé qu'une fois
+    load_info=_warmup_info,
+    universe=screener_universe,
+    refresh_interval=float(os.getenv('SCREENER_REFRESH_SECONDS', str(6 * 3600))),
+    workers=int(os.getenv('SCREENER_WORKERS', '8')),
+)
+SCREENER_SORT_FIELDS = {"symbol", "name", "sector", "pe", "forwardPe", "dividendYield", "marketCap", "price", "beta", "roe", "netMargin", "revenue", "netIncome"}
+
+@app.on_event("startup")
+def start_fundamentals_index():
+    fundamentals_index.start()
+
+@app.get("/api/screener")
+def stock_screener(sector: str = None, pe_max: float = None, dividend_min: float = None,
+                   pe_min: float = None, dividend_max: float = None, country: str = None,
+                   market_cap_min: float = None, market_cap_max: float = None,
+                   sort_by: str = "marketCap", order: str = "desc",
+                   limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0), comments: bool = False):
+    if sort_by not in SCREENER_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Tri impossible sur '{sort_by}'.")
+    if not fundamentals_index.ready:
+        raise HTTPException(status_code=503, detail="L'index du screener est en cours de construction, réessayez dans un instant.")
+
+    # Les rendements de dividende sont saisis en % par l'utilisateur
+    page = fundamentals_index.query(
+        sector=sector, country=country, pe_min=pe_min, pe_max=pe_max,
+        dividend_min=dividend_min / 100 if dividend_min is not None else None,
+        dividend_max=dividend_max / 100 if dividend_max is not None else None,
+        market_cap_min=market_cap_min, market_cap_max=market_cap_max,
+        sort_by=sort_by, descending=order.lower() != "asc", limit=limit, offset=offset,
+    )
+    page["asOf"] = fundamentals_index.as_of.isoformat()
+    if comments:
+        # Un seul appel au modèle par lot d'entreprises (AI_COMMENT_BATCH_SIZE)
+        companies = [{**row, "peRatio": row["pe"]} for row in page["results"]]
+        attach_analysis_comments(companies)
+        for row, data in zip(page["results"], companies):
+            row["analysisStatus"], row["analysisComment"] = data["analysisStatus"], data["analysisComment"]
+    return page
+
+# --- RECHERCHE : ANNUAIRE LOCAL DES SYMBOLES, FMP EN SECOURS ---
+# Chargé depuis l'instantané local, puis remplacé par la liste complète FMP rafraîchie en arrière-plan
+symbol_directory = SymbolDirectory(market_cap=fundamentals_index.market_cap)
+symbol_directory.load(load_snapshot(), source="snapshot")
+
+async def _fetch_symbol_list():
+    rows = await fetch_json("https://financialmodelingprep.com/api/v3/stock/list", params={"apikey": FMP_API_KEY},
+                            priority=quota.WARMUP)
+    if rows:
+        symbol_directory.load(rows, source="fmp")
+    return {"symbols": len(symbol_directory)}
+
+# Non partagé : le rafraîchissement recharge l'annuaire de ce processus
+market_feeds.register("symbols", _fetch_symbol_list, float(os.getenv('SYMBOL_DIRECTORY_REFRESH', str(24 * 3600))), shared=False)
 
 @app.get("/api/search")
-def search_symbols(query: str):
-    if not FMP_API_KEY: raise HTTPException(status_code=500, detail="Clé API FMP non configurée.")
-    url = f"https://financialmodelingprep.com/api/v3/search?query={query}&limit=10&apikey={FMP_API_KEY}"
+async def search_symbols(query: str, limit: int = Query(10, ge=1, le=50)):
+    results = symbol_directory.search(query, limit=limit)
+    if results or not FMP_API_KEY:
+        return results
+    # Aucun résultat local : on interroge FMP (symbole récent ou hors de l'annuaire)
+    url = "https://financialmodelingprep.com/api/v3/search"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return await fetch_json(url, params={"query": query, "limit": limit, "apikey": FMP_API_KEY})
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Service de recherche indisponible: {e}")
 
 @app.get("/api/companies-by-country/{country_code}")
-def get_companies_by_country(country_code: str):
+async def get_companies_by_country(country_code: str):
     if not FMP_API_KEY: raise HTTPException(status_code=500, detail="Clé API FMP non configurée.")
     url = f"https://financialmodelingprep.com/api/v3/stock-screener?country={country_code.upper()}&limit=20&apikey={FMP_API_KEY}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return await fetch_json(url)
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Service de recherche par pays indisponible: {e}")
 
 @app.get("/api/gainers")
-def get_top_gainers():
+async def get_top_gainers():
     if not FMP_API_KEY: raise HTTPException(status_code=500, detail="Clé API FMP non configurée.")
-    url = f"https://financialmodelingprep.com/api/v3/stock_market/gainers?apikey={FMP_API_KEY}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return await serve_feed("gainers")
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Service 'top gainers' indisponible: {e}")
 
 @app.get("/api/losers")
-def get_top_losers():
+async def get_top_losers():
     if not FMP_API_KEY: raise HTTPException(status_code=500, detail="Clé API FMP non configurée.")
-    url = f"https://financialmodelingprep.com/api/v3/stock_market/losers?apikey={FMP_API_KEY}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return await serve_feed("losers")
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Service 'top losers' indisponible: {e}")
 
 # --- NOUVEAU : POINT D'ACCÈS POUR LE CALENDRIER ÉCONOMIQUE ---
 @app.get("/api/economic-calendar")
-def get_economic_calendar():
+async def get_economic_calendar():
     if not FMP_API_KEY:
         raise HTTPException(status_code=500, detail="La clé API pour le calendrier n'est pas configurée.")
-    
-    # On récupère les événements pour la semaine à venir
-    today = datetime.now().strftime('%Y-%m-%d')
-    next_week = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
-    url = f"https://financialmodelingprep.com/api/v3/economic_calendar?from={today}&to={next_week}&apikey={FMP_API_KEY}"
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        return data
-    except requests.exceptions.RequestException as e:
+        return await serve_feed("economic-calendar")
+    except httpx.HTTPError as e:
         print(f"Erreur API FMP (calendrier): {e}")
         raise HTTPException(status_code=503, detail="Le service de calendrier économique est indisponible.")
 
+# --- STOCKAGE LOCAL DES COURS JOURNALIERS ---
+def _load_price_history(symbol: str, start):
+    period_or_start = {"period": os.getenv('PRICE_STORE_INITIAL_PERIOD', '10y')} if start is None else {"start": start.isoformat()}
+    key = ("price-history", symbol, tuple(period_or_start.items()))
+    def load():
+        quotas.acquire("yfinance")
+        with metrics.timed("yfinance", "history"):
+            return yf.Ticker(symbol).history(**period_or_start)
+    return upstream_flight.do(key, load)
+
+price_store = PriceStore(
+    directory=os.getenv('PRICE_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prices")),
+    load_history=_load_price_history,
+    sync_interval=float(os.getenv('PRICE_STORE_SYNC_SECONDS', '900')),
+)
+
+def load_close_matrix(symbols, start) -> "pd.DataFrame":
+    """Clôtures alignées par date (une colonne par symbole, NaN si absent) depuis `start`."""
+    def load(symbol):
+        if symbol_index.lookup(symbol) is False:
+            return symbol, None
+        series = price_store.get(symbol).since(start)
+        if not len(series):
+            symbol_index.mark_invalid(symbol)
+            return symbol, None
+        return symbol, pd.Series(series.close, index=pd.DatetimeIndex(series.days))
+
+    columns = dict(analysis_executor.map(load, symbols))
+    data = pd.DataFrame({s: c for s, c in columns.items() if c is not None})
+    return data.reindex(columns=list(columns)).sort_index()
+
 # --- NOUVEAU : POINT D'ACCÈS POUR L'ANALYSE DE CORRÉLATION ---
+correlation_cache = TTLCache(ttls={"correlation": 900}, max_bytes=16 * 1024 * 1024, shared=shared_store, namespace="correlation")
+
+def _round_matrix(values: np.ndarray, digits: int = 4) -> list:
+    """Liste de listes arrondie, NaN -> None (JSON)."""
+    rounded = np.round(values.astype(np.float64), digits)
+    return np.where(np.isfinite(rounded), rounded, None).tolist()
+
 @app.get("/api/correlation")
-def get_correlation(tickers: str = Query(..., min_length=3)):
-    ticker_list = [ticker.strip().upper() for ticker in tickers.split(',')]
+def get_correlation(request: Request, tickers: str = Query(..., min_length=3), lookback: int = Query(365, ge=30, le=3650),
+                    window: int = Query(None, ge=5, le=750), step: int = Query(5, ge=1),
+                    order: str = "input", include_prices: bool = True, format: str = None):
+    ticker_list = list(dict.fromkeys(ticker.strip().upper() for ticker in tickers.split(',') if ticker.strip()))
     if len(ticker_list) < 2:
         raise HTTPException(status_code=400, detail="Veuillez fournir au moins deux symboles.")
+    if order not in ("input", "cluster"):
+        raise HTTPException(status_code=400, detail="Le paramètre 'order' doit valoir 'input' ou 'cluster'.")
+    encoding = wire.negotiate(format, request.headers.get("accept"), allowed=("json", "compact"))
 
     try:
-        # Télécharger les données historiques sur 1 an pour tous les tickers
-        data = yf.download(ticker_list, period="1y")['Close']
+        # Lire les clôtures depuis le stockage local (seule la fin manquante est téléchargée)
+        with metrics.phase("correlation.load"):
+            data = load_close_matrix(ticker_list, date.today() - timedelta(days=lookback))
         if data.empty or data.isnull().all().all():
             raise HTTPException(status_code=404, detail="Impossible de récupérer les données pour les symboles fournis.")
 
         # Supprimer les colonnes où toutes les valeurs sont NaN (tickers invalides)
-        data.dropna(axis=1, how='all', inplace=True)
+        dropped = [col for col in data.columns if data[col].isnull().all()]
+        data = data.drop(columns=dropped)
         if len(data.columns) < 2:
             raise HTTPException(status_code=400, detail="Données valides trouvées pour moins de deux symboles.")
-        
-        # Remplir les valeurs manquantes restantes
-        data.ffill(inplace=True)
-        data.bfill(inplace=True)
-
-        # Calculer la matrice de corrélation
-        correlation_matrix = data.corr()
-
-        # Normaliser les prix pour la visualisation
-        normalized_prices = (data / data.iloc[0] * 100)
-        
-        return {
-            "correlation_matrix": correlation_matrix.to_dict(),
-            "normalized_prices": {
-                "dates": normalized_prices.index.strftime('%Y-%m-%d').tolist(),
-                "series": {col: normalized_prices[col].tolist() for col in normalized_prices.columns}
-            }
-        }
+
+        # Le résultat ne dépend que de l'ensemble des symboles, des paramètres et de la dernière séance
+        as_of = data.index[-1].strftime('%Y-%m-%d')
+        key_symbols = "|".join(sorted(data.columns))
+        if order == "cluster":
+            data = data[sorted(data.columns)]  # L'ordre d'entrée n'influence pas le résultat
+        key_kind = f"correlation:{lookback}:{window}:{step}:{order}:{include_prices}:{encoding}:{as_of}:{','.join(data.columns)}"
+        # Le cache conserve la réponse déjà sérialisée
+        def compute():
+            with metrics.phase("correlation.compute"):
+                return wire.dumps(_compute_correlation(data, window, step, order, include_prices, as_of, dropped, encoding))
+        body = correlation_cache.get_or_fetch(key_symbols, key_kind, compute)
+        return Response(content=body, media_type=wire.COMPACT_MEDIA_TYPE if encoding == "compact" else "application/json", headers={"Vary": "Accept"})
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul de la corrélation : {str(e)}")
 
+def _compute_correlation(data: "pd.DataFrame", window, step, order, include_prices, as_of, dropped, encoding: str = "json") -> dict:
+    # Période commune : on propage la dernière clôture connue puis on ignore le début incomplet
+    data = data.ffill()
+    data = data[data.notna().all(axis=1)]
+    if len(data) < 3:
+        raise HTTPException(status_code=400, detail="Pas assez de séances communes pour calculer une corrélation.")
+
+    symbols = list(data.columns)
+    prices = data.to_numpy(dtype=np.float64)
+    returns = log_returns(prices)
+    matrix = correlation_matrix(returns)
+
+    if order == "cluster":
+        permutation = cluster_order(matrix)
+        symbols = [symbols[i] for i in permutation]
+        prices = prices[:, permutation]
+        returns = returns[:, permutation]
+        matrix = matrix[np.ix_(permutation, permutation)]
+
+    result = {
+        "tickers": symbols,
+        "asOf": as_of,
+        "observations": int(returns.shape[0]),
+        "matrix": _round_matrix(matrix),
+        "dropped": dropped,
+    }
+    if encoding == "compact":
+        # Axe des dates transmis une seule fois ; les fenêtres glissantes y renvoient par indice
+        days = data.index.values.astype("datetime64[D]")
+        if include_prices:
+            normalized = prices / prices[0] * 100
+            result["normalized_prices"] = {**wire.encode_days(days), "values": [wire.encode_column(column, 2) for column in normalized.T]}
+        if window:
+            ends, pairs, values = rolling_correlation(returns, window, step)
+            if not include_prices:
+                result["dates"] = wire.encode_days(days)
+            result["rolling"] = {"window": window, "ends": (ends + 1).tolist(), "pairs": pairs.tolist(), "values": _round_matrix(values)}
+        return result
+
+    dates = data.index.strftime('%Y-%m-%d')
+    if include_prices:
+        # Normaliser les prix (base 100) pour la visualisation : une ligne par ticker
+        result["normalized_prices"] = {
+            "dates": dates.tolist(),
+            "values": _round_matrix((prices / prices[0] * 100).T, 2),
+        }
+    if window:
+        ends, pairs, values = rolling_correlation(returns, window, step)
+        result["rolling"] = {
+            "window": window,
+            # Les rendements commencent à la deuxième séance
+            "dates": dates[1:][ends].tolist(),
+            "pairs": pairs.tolist(),
+            "values": _round_matrix(values),
+        }
+    return result
+
+# --- PORTEFEUILLE : VOLATILITÉ, VAR/CVAR, BÊTA ET FRONTIÈRE EFFICIENTE (MÊMES CLÔTURES QUE LA CORRÉLATION) ---
+portfolio_cache = TTLCache(ttls={"portfolio": 900}, max_bytes=16 * 1024 * 1024, shared=shared_store, namespace="portfolio")
+PORTFOLIO_MAX_ASSETS = int(os.getenv('PORTFOLIO_MAX_ASSETS', '50'))
+
+@app.get("/api/portfolio")
+def get_portfolio(tickers: str = Query(..., min_length=1), weights: str = None, lookback: int = Query(365, ge=60, le=3650),
+                  benchmark: str = os.getenv('PORTFOLIO_BENCHMARK', '^GSPC'), samples: int = Query(5000, ge=0, le=50000),
+                  risk_free: float = Query(0.0, ge=-0.1, le=0.5), cloud_points: int = Query(500, ge=0, le=5000)):
+    """Risque d'un portefeuille ; `weights` dans l'ordre de `tickers` (normalisés, poids égaux par défaut)."""
+    ticker_list = list(dict.fromkeys(ticker.strip().upper() for ticker in tickers.split(',') if ticker.strip()))
+    if not ticker_list or len(ticker_list) > PORTFOLIO_MAX_ASSETS:
+        raise HTTPException(status_code=400, detail=f"Veuillez fournir entre 1 et {PORTFOLIO_MAX_ASSETS} symboles distincts.")
+    try:
+        weight_values = np.array([float(w) for w in weights.split(',')]) if weights else np.ones(len(ticker_list))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Les poids doivent être des nombres séparés par des virgules.")
+    if len(weight_values) != len(ticker_list) or not np.isfinite(weight_values).all() or weight_values.sum() <= 0:
+        raise HTTPException(status_code=400, detail="Un poids par symbole est attendu, de somme strictement positive.")
+    weight_values = weight_values / weight_values.sum()
+    benchmark = benchmark.strip().upper()
+
+    try:
+        with metrics.phase("portfolio.load"):
+            data = load_close_matrix(list(dict.fromkeys(ticker_list + [benchmark])), date.today() - timedelta(days=lookback))
+        missing = [s for s in ticker_list if s not in data.columns or data[s].isnull().all()]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Aucune donnée pour : {', '.join(missing)}.")
+        has_benchmark = benchmark in data.columns and not data[benchmark].isnull().all()
+        # Séances communes : les jours fériés propres à une place reprennent la clôture précédente
+        prices = data[ticker_list + ([benchmark] if has_benchmark and benchmark not in ticker_list else [])].ffill().dropna()
+        if len(prices) < 30:
+            raise HTTPException(status_code=400, detail="Pas assez de séances communes pour estimer le risque (30 minimum).")
+
+        as_of = prices.index[-1].strftime('%Y-%m-%d')
+        key_kind = (f"portfolio:{lookback}:{benchmark}:{samples}:{risk_free}:{cloud_points}:{as_of}:"
+                    + ",".join(f"{s}={w:.6f}" for s, w in zip(ticker_list, weight_values)))
+        def compute():
+            with metrics.phase("portfolio.compute"):
+                market = prices[benchmark].to_numpy(dtype=np.float64) if has_benchmark else None
+                return wire.dumps(_compute_portfolio(prices[ticker_list].to_numpy(dtype=np.float64), market, ticker_list,
+                                                     weight_values, benchmark if has_benchmark else None, samples,
+                                                     risk_free, cloud_points, as_of))
+        body = portfolio_cache.get_or_fetch("|".join(sorted(ticker_list)), key_kind, compute)
+        return Response(content=body, media_type="application/json")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse du portefeuille : {str(e)}")
+
+def _compute_portfolio(prices: np.ndarray, market, symbols, weights, benchmark, samples, risk_free, cloud_points, as_of) -> dict:
+    returns = simple_returns(prices)
+    mean, cov = annualized_moments(returns)
+    daily = returns @ weights
+    volatility = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    expected = float(weights @ mean)
+    levels = [f"{level * 100:g}" for level in CONFIDENCE_LEVELS]
+    historical = historical_var(daily)
+    parametric = parametric_var(float(daily.mean()), float(daily.std(ddof=1)))
+
+    result = {
+        "symbols": symbols,
+        "weights": _round_matrix(weights, 6),
+        "asOf": as_of,
+        "observations": len(returns),
+        "benchmark": benchmark,
+        "assets": {
+            "expectedReturn": _round_matrix(mean),
+            "volatility": _round_matrix(np.sqrt(np.clip(np.diag(cov), 0.0, None))),
+            "beta": None,
+        },
+        "covariance": _round_matrix(cov, 6),
+        "correlation": _round_matrix(correlation_matrix(returns)),
+        "portfolio": {
+            "expectedReturn": round(expected, 4),
+            "volatility": round(volatility, 4),
+            "sharpe": round((expected - risk_free) / volatility, 4) if volatility > 0 else None,
+            "beta": None,
+            # Pertes sur un jour, en fraction de la valeur du portefeuille
+            "var": {"historical": dict(zip(levels, _round_matrix(historical["var"]))),
+                    "parametric": dict(zip(levels, _round_matrix(parametric["var"])))},
+            "cvar": {"historical": dict(zip(levels, _round_matrix(historical["cvar"]))),
+                     "parametric": dict(zip(levels, _round_matrix(parametric["cvar"])))},
+        },
+        "frontier": None,
+    }
+    if market is not None:
+        asset_betas = betas(np.column_stack([returns, daily]), simple_returns(market[:, None])[:, 0])
+        result["assets"]["beta"] = _round_matrix(asset_betas[:-1])
+        result["portfolio"]["beta"] = _round_matrix(asset_betas[-1:])[0]
+
+    if samples and len(symbols) > 1:
+        candidates = sample_weights(len(symbols), samples)
+        front = frontier(mean, cov, candidates, risk_free)
+
+        def point(i):
+            return {"return": round(float(front["returns"][i]), 4), "volatility": round(float(front["volatility"][i]), 4),
+                    "sharpe": round(float(front["sharpe"][i]), 4), "weights": _round_matrix(candidates[i], 4)}
+
+        cloud = np.unique(np.linspace(0, len(candidates) - 1, min(cloud_points, len(candidates))).astype(int))
+        result["frontier"] = {
+            "samples": len(candidates),
+            "efficient": {"return": _round_matrix(front["returns"][front["envelope"]]),
+                          "volatility": _round_matrix(front["volatility"][front["envelope"]])},
+            "maxSharpe": point(front["maxSharpe"]),
+            "minVolatility": point(front["minVolatility"]),
+            "cloud": {"return": _round_matrix(front["returns"][cloud]), "volatility": _round_matrix(front["volatility"][cloud])},
+        }
+    return result
+
+# --- INDICATEURS TECHNIQUES : CALCULÉS UNE FOIS PAR JEU DE PARAMÈTRES, PROLONGÉS SÉANCE PAR SÉANCE ---
+indicator_cache = TTLCache(ttls={"indicators": 24 * 3600}, max_bytes=int(os.getenv('INDICATOR_CACHE_MAX_MB', '32')) * 1024 * 1024,
+                           shared=shared_store, namespace="indicators")
+
+def load_indicators(symbol: str, specs):
+    """Retourne (jours, clôtures, {indicateur: {colonne: valeurs}}) sur toutes les séances stockées."""
+    kind = f"indicators:{spec_key(specs)}"
+
+    def update():
+        prices = price_store.get(symbol)
+        found, series = indicator_cache.get(symbol, kind)
+        if not found:
+            series = IndicatorSeries(specs)
+        before = (series.confirmed, series.full_computes)
+        with metrics.phase("indicators.compute"):
+            series.update(prices.bars)
+        # Seule la partie confirmée est conservée : la séance en cours est recalculée à chaque appel
+        if not found or (series.confirmed, series.full_computes) != before:
+            indicator_cache.set(symbol, kind, series)
+        return series.days, prices.close.copy(), series.columns
+
+    return upstream_flight.do(("indicators", symbol, kind), update)
+
+@app.get("/api/indicators/{ticker}")
+def get_indicators(ticker: str, request: Request, indicators: str = None, period: str = "1y", format: str = None):
+    """Indicateurs techniques, ex: ?indicators=sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2,atr:14,vol:20,drawdown"""
+    encoding = wire.negotiate(format, request.headers.get("accept"), allowed=("json", "compact"))
+    if period not in HISTORY_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Période inconnue '{period}' (attendu : {', '.join(HISTORY_PERIODS)}).")
+    try:
+        specs = parse_specs(indicators)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        stock = get_stock_data(ticker)
+        days, close, columns = load_indicators(stock.symbol, specs)
+        if len(days) == 0:
+            raise HTTPException(status_code=404, detail=f"Aucune séance disponible pour '{ticker}'.")
+        days = days.astype("datetime64[D]")
+        start = _history_start(days, period)
+        first = int(np.searchsorted(days, start)) if start is not None else 0
+        days, close = days[first:], close[first:]
+
+        def encode(values):
+            values = values[first:]
+            return wire.encode_column(values, 4) if encoding == "compact" else _round_matrix(values)
+
+        result = {key: encode(cols["value"]) if list(cols) == ["value"] else {c: encode(v) for c, v in cols.items()}
+                  for key, cols in columns.items()}
+        payload = {"symbol": stock.symbol, "asOf": str(days[-1]) if len(days) else None, "period": period}
+        if encoding == "compact":
+            payload.update(wire.encode_days(days), close=wire.encode_column(close))
+        else:
+            payload.update(dates=np.datetime_as_string(days).tolist(), close=_round_matrix(close))
+        payload["indicators"] = result
+        return wire.json_response(payload, encoding)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des indicateurs : {str(e)}")
 
 @app.post("/api/chat")
 def chat_with_ai(chat_message: ChatMessage):
     session_id = chat_message.session_id
     user_message = chat_message.message
 
-    if not model:
+    if not get_model():
         raise HTTPException(status_code=503, detail="Le service de chat IA est désactivé.")
 
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = model.start_chat(history=[
-            {"role": "user", "parts": ["Tu es FinAnalyse AI, un assistant conversationnel spécialisé en finance pour les débutants. Sois amical, pédagogique et explique les concepts simplement. Ne donne jamais de conseil d'investissement direct, mais aide les utilisateurs à comprendre les données."]},
-            {"role": "model", "parts": ["Bonjour ! Je suis FinAnalyse AI. Comment puis-je vous aider à mieux comprendre la finance aujourd'hui ?"]}
-        ])
-
     try:
-        response = chat_sessions[session_id].send_message(user_message)
+        quotas.acquire("gemini", quota.INTERACTIVE)
+        with chat_sessions.use(session_id) as chat, metrics.timed("gemini", "chat"):
+            response = chat.send_message(user_message)
         return {"response": response.text}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur de communication avec l'IA: {e}")
+
+def _sse(data: dict, event: str = None) -> str:
+    """Formate un événement Server-Sent Events."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(chat_message: ChatMessage):
+    """Variante en streaming (SSE) : les morceaux de réponse sont transmis dès leur génération."""
+    # Sur un worker froid, get_model() importe le SDK : hors de la boucle d'événements
+    if not await asyncio.to_thread(get_model):
+        raise HTTPException(status_code=503, detail="Le service de chat IA est désactivé.")
+    # Avant d'ouvrir le flux : un quota épuisé doit encore pouvoir répondre 429
+    await quotas.acquire_async("gemini", quota.INTERACTIVE)
+
+    async def events():
+        try:
+            async with chat_sessions.use_async(chat_message.session_id) as chat:
+                with metrics.timed("gemini", "chat_stream_first_chunk"):
+                    response = await chat.send_message_async(chat_message.message, stream=True)
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue  # Morceau sans texte (ex: métadonnées de sécurité)
+                    if text:
+                        yield _sse({"text": text})
+            yield _sse({}, event="done")
+        except Exception as e:
+            yield _sse({"detail": f"Erreur de communication avec l'IA: {e}"}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # --- NOUVELLE FONCTION D'ANALYSE PAR IA ---
-def generate_ai_analysis_comment(data: dict) -> str:
-    """
-    Utilise l'IA Gemini pour générer un commentaire d'analyse financière.
-    """
-    try:
-        # On prépare un "prompt" clair et détaillé pour l'IA
-        prompt = f"""
+def build_analysis_prompt(data: dict) -> str:
+    """Prépare un "prompt" clair et détaillé pour l'IA."""
+    return f"""
         En tant qu'analyste financier pour des investisseurs débutants, rédige une courte analyse (3-4 phrases) pour l'entreprise {data.get('name', 'N/A')}.
         Le ton doit être neutre et informatif. Utilise un langage simple.
         Voici les données financières clés :
-        - Prix de l'action : ${data.get('price', 'N/A'):.2f}
-        - Chiffre d'affaires annuel : {data.get('revenue', 0) / 1e9:.1f} milliards de dollars
-        - Bénéfice net annuel : {data.get('netIncome', 0) / 1e9:.1f} milliards de dollars
-        - Ratio Cours/Bénéfice (PER) : {data.get('peRatio', 'N/A'):.1f}
-        - Rentabilité des capitaux propres (ROE) : {data.get('roe', 0) * 100:.1f}%
-        - Marge nette : {data.get('netMargin', 0) * 100:.1f}%
+        - Prix de l'action : ${data.get('price') or 0:.2f}
+        - Chiffre d'affaires annuel : {(data.get('revenue') or 0) / 1e9:.1f} milliards de dollars
+        - Bénéfice net annuel : {(data.get('netIncome') or 0) / 1e9:.1f} milliards de dollars
+        - Ratio Cours/Bénéfice (PER) : {data.get('peRatio') or 0:.1f}
+        - Rentabilité des capitaux propres (ROE) : {(data.get('roe') or 0) * 100:.1f}%
+        - Marge nette : {(data.get('netMargin') or 0) * 100:.1f}%
 
         Basé sur ces données, mentionne un point fort (par exemple, une forte rentabilité ou une faible valorisation) et un point de vigilance (par exemple, une valorisation élevée ou une faible marge). Termine par une phrase de conclusion neutre.
         Ne donne pas de conseil d'investissement.
         """
-        
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"Erreur lors de la génération par l'IA: {e}")
-        return "Le commentaire d'analyse par l'IA n'est pas disponible pour le moment."
-
-
-
 
+def _generate_comment_text(data: dict) -> str:
+    quotas.acquire("gemini", quota.BACKGROUND)
+    with metrics.timed("gemini", "comment"):
+        response = get_model().generate_content(build_analysis_prompt(data))
+    return response.text.strip()
+
+def build_batch_analysis_prompt(companies: list) -> str:
+    """Un seul prompt pour plusieurs entreprises ; la réponse attendue est un objet JSON par symbole."""
+    lines = []
+    for data in companies:
+        lines.append(
+            f"- {data.get('symbol')} ({data.get('name', 'N/A')}) : prix ${data.get('price') or 0:.2f}, "
+            f"chiffre d'affaires {(data.get('revenue') or 0) / 1e9:.1f} Md$, bénéfice net {(data.get('netIncome') or 0) / 1e9:.1f} Md$, "
+            f"PER {data.get('peRatio') or 0:.1f}, ROE {(data.get('roe') or 0) * 100:.1f}%, marge nette {(data.get('netMargin') or 0) * 100:.1f}%"
+        )
+    companies_text = "\n        ".join(lines)
+    return f"""
+        En tant qu'analyste financier pour des investisseurs débutants, rédige pour CHACUNE des entreprises suivantes une courte analyse (3-4 phrases).
+        Le ton doit être neutre et informatif. Utilise un langage simple.
+        {companies_text}
 
+        Pour chaque entreprise, mentionne un point fort et un point de vigilance, puis termine par une phrase de conclusion neutre.
+        Ne donne pas de conseil d'investissement.
+        Réponds uniquement avec un objet JSON dont les clés sont les symboles et les valeurs les analyses.
+        """
 
-# --- DONNÉES SIMULÉES POUR LES ACTUALITÉS ---
-MOCK_NEWS = {
-    "moneywise": [
-        {"title": "Inflation Reduction Act: Are You Missing Out on These Major Savings?", "snippet": "The landmark legislation could save you thousands. Are you taking advantage?", "url": "#", "source": "Moneywise"},
-        {"title": "Suze Orman Warns of a Major Financial 'Earthquake' — Here's How to Prepare", "snippet": "The personal finance guru is sounding the alarm. Here are three ways to protect yourself.", "url": "#", "source": "Moneywise"},
-    ],
-    "gobankingrates": [
-        {"title": "5 High-Paying Jobs That Don’t Require a Bachelor’s Degree", "snippet": "You don't need a four-year degree to land a lucrative career. Check out these options.", "url": "#", "source": "GOBankingRates"},
-        {"title": "How To Build Generational Wealth With Just a Few Hundred Dollars", "snippet": "Think you need a fortune to start? Think again. Small, consistent investments can lead to big results.", "url": "#", "source": "GOBankingRates"},
-    ],
-    "morningstar": [
-        {"title": "3 Undervalued Stocks to Buy Now", "snippet": "Our analysts have identified three companies trading below their intrinsic value.", "url": "#", "source": "Morningstar Research"},
-        {"title": "Market Outlook 2025: Navigating a Shifting Landscape", "snippet": "Experts weigh in on what to expect from the markets in the coming year.", "url": "#", "source": "Morningstar Research"},
-    ],
-    "barchart": [
-        {"title": "Corn Prices Surge on Weather Concerns", "snippet": "Futures for corn are up as unfavorable weather patterns threaten crop yields.", "url": "#", "source": "Barchart"},
-        {"title": "Analyst Upgrade: Is This Tech Giant a 'Strong Buy'?", "snippet": "Barchart's technical analysis points to a strong upward trend for this well-known stock.", "url": "#", "source": "Barchart"},
-    ]
-}
-def get_stock_data(ticker: str):
-    """Fonction utilitaire pour récupérer l'objet Ticker et gérer les erreurs de base."""
-    stock = yf.Ticker(ticker.upper())
-    # Si l'historique est vide, le ticker est probablement invalide
-    if stock.history(period="1d").empty:
-        raise HTTPException(status_code=404, detail=f"Symbole '{ticker}' non trouvé ou sans données.")
-    return stock
+def _generate_comment_batch(companies: list) -> dict:
+    quotas.acquire("gemini", quota.BACKGROUND)
+    with metrics.timed("gemini", "comment_batch"):
+        response = get_model().generate_content(build_batch_analysis_prompt(companies),
+                                          generation_config={"response_mime_type": "application/json"})
+    return parse_batch_comments(response.text)
+
+# Commentaires mis en cache par empreinte des métriques ; générés hors du chemin de la requête
+ai_comments = CommentService(
+    generate=_generate_comment_text,
+    generate_batch=_generate_comment_batch,
+    batch_size=int(os.getenv('AI_COMMENT_BATCH_SIZE', '5')),
+    ttl=float(os.getenv('AI_COMMENT_TTL', str(24 * 3600))),
+    workers=int(os.getenv('AI_COMMENT_WORKERS', '2')),
+    shared=shared_store,
+)
 
-@app.get("/api/entreprise/{ticker}")
-def get_financial_data(ticker: str):
-    try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        financials = stock.financials
-        
-        latest_revenue = None
-        latest_net_income = None
-
-        if not financials.empty:
-            if 'Total Revenue' in financials.index:
-                latest_revenue = financials.loc['Total Revenue'].iloc[0]
-            if 'Net Income' in financials.index:
-                latest_net_income = financials.loc['Net Income'].iloc[0]
-        
-        return {
-            "name": info.get("longName", ticker.upper()),
-            "symbol": info.get("symbol", ticker.upper()),
-            "logo_url": info.get("logo_url", ""),
-            "sector": info.get("sector", "N/A"),
-            "country": info.get("country", "N/A"),
-            "price": info.get("currentPrice") or info.get("previousClose"),
-            "revenue": info.get("totalRevenue"),
-            "netIncome": info.get("netIncomeToCommon"),
-            "peRatio": info.get("trailingPE"),
-            "roe": info.get("returnOnEquity"),
-            "netMargin": info.get("profitMargins"),
-            "dividendYield": info.get('dividendYield'),
-            "financialScore": 7.5
-        }
-# ON APPELLE LA NOUVELLE FONCTION IA !
-        financial_data["analysisComment"] = generate_ai_analysis_comment(financial_data)
-        
+def attach_analysis_comment(financial_data: dict) -> dict:
+    """Ajoute le commentaire IA s'il est en cache, sinon planifie sa génération (statut "pending")."""
+    if not ai_enabled():
+        financial_data["analysisStatus"] = "disabled"
+        financial_data["analysisComment"] = None
         return financial_data
-        
-          
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur interne dans get_financial_data: {str(e)}")
-
-@app.get("/api/historique/{ticker}")
-def get_historical_data(ticker: str):
+    status, comment = ai_comments.lookup(financial_data["symbol"], financial_data)
+    financial_data["analysisStatus"] = status
+    financial_data["analysisComment"] = comment
+    return financial_data
+
+def attach_analysis_comments(companies: list) -> list:
+    """Version groupée de `attach_analysis_comment` : les absences sont générées par lots."""
+    if not ai_enabled():
+        for data in companies:
+            data["analysisStatus"], data["analysisComment"] = "disabled", None
+        return companies
+    results = ai_comments.lookup_many([(data["symbol"], data) for data in companies])
+    for data in companies:
+        data["analysisStatus"], data["analysisComment"] = results[data["symbol"].upper()]
+    return companies
+
+@app.get("/api/comments")
+def get_analysis_comments(tickers: str = Query(..., min_length=1)):
+    """Commentaires IA de plusieurs entreprises ; à interroger tant que certains sont "pending"."""
+    ticker_list = list(dict.fromkeys(t.strip().upper() for t in tickers.split(',') if t.strip()))[:50]
+    companies, errors = [], {}
+    for ticker, outcome in zip(ticker_list, analysis_executor.map(_financial_data_or_error, ticker_list)):
+        if isinstance(outcome, dict):
+            companies.append(outcome)
+        else:
+            errors[ticker] = outcome
+    attach_analysis_comments(companies)
+    comments = {data["symbol"].upper(): {"status": data["analysisStatus"], "comment": data["analysisComment"]} for data in companies}
+    comments.update({ticker: {"status": "error", "detail": detail} for ticker, detail in errors.items()})
+    return {"comments": comments}
+
+def _financial_data_or_error(ticker: str):
     try:
-        stock = get_stock_data(ticker)
-        hist = stock.history(period="1y")
-        # Remplacer les valeurs NaN (Not a Number) par 0 pour éviter les erreurs dans les graphiques
-        return {
-            "dates": hist.index.strftime("%Y-%m-%d").tolist(),
-            "prices": hist["Close"].fillna(0).tolist(),
-        }
+        return build_financial_data(get_stock_data(ticker), ticker)
     except HTTPException as e:
-        raise e
+        return e.detail
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur interne dans get_historical_data: {str(e)}")
+        return str(e)
 
-@app.get("/api/advanced-metrics/{ticker}")
-def get_advanced_metrics(ticker: str):
+@app.get("/api/entreprise/{ticker}/comment")
+def get_analysis_comment(ticker: str):
+    """Point d'accès interrogé par le client tant que le commentaire est "pending"."""
     try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        cashflow = stock.cashflow
-        
-        free_cashflow = None
-        if not cashflow.empty:
-            op_cash_names = ['Total Cash From Operating Activities', 'Cash From Operations']
-            op_cash_series = next((cashflow.loc[name] for name in op_cash_names if name in cashflow.index), None)
-            cap_ex_series = cashflow.loc['Capital Expenditures'] if 'Capital Expenditures' in cashflow.index else None
-            
-            if op_cash_series is not None and cap_ex_series is not None:
-                op_cash = op_cash_series.iloc[0]
-                cap_ex = cap_ex_series.iloc[0]
-                if pd.notna(op_cash) and pd.notna(cap_ex):
-                    free_cashflow = op_cash + cap_ex
-        
-        return {
-            "currentRatio": info.get('currentRatio'),
-            "quickRatio": info.get('quickRatio'),
-            "debtToEquity": info.get('debtToEquity'),
-            "interestCoverage": info.get('interestCoverage'),
-            "freeCashFlow": free_cashflow,
-            "dividendYield": info.get('dividendYield'),
-        }
+        financial_data = build_financial_data(get_stock_data(ticker), ticker)
     except HTTPException as e:
         raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur interne dans get_advanced_metrics: {str(e)}")
-
-@app.get("/api/dividends/{ticker}")
-def get_dividend_data(ticker: str):
-    try:
-        stock = get_stock_data(ticker)
-        info = stock.info
-        dividends = stock.dividends
-        
-        annual_dividends = {}
-        if not dividends.empty:
-            dividends_last_5y = dividends.last('5Y')
-            if not dividends_last_5y.empty:
-                 annual_dividends = dividends_last_5y.resample('YE').sum().to_dict()
-        
-        return {
-            "dividendRate": info.get("dividendRate"),
-            "payoutRatio": info.get("payoutRatio"),
-            "dividendHistory": {
-                "years": [d.year for d in annual_dividends.keys()],
-                "amounts": list(annual_dividends.values())
-            }
-        }
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur interne dans get_dividend_data: {str(e)}")
-
-@app.get("/api/screener")
-def stock_screener(sector: str = None, pe_max: float = None, dividend_min: float = None):
-    sample_tickers = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "JPM", "JNJ", "WMT", "PG", "XOM", "NVDA", "V", "UNH", "HD"]
-    results = []
-    
-    dividend_min_float = dividend_min / 100 if dividend_min is not None else None
-
-    for ticker in sample_tickers:
-        try:
-            info = yf.Ticker(ticker).info
-            
-            # Vérification rapide pour éviter les tickers morts
-            if not info.get('longName'):
-                continue
-            
-            include = True
-            if sector and info.get('sector') != sector:
-                include = False
-            if pe_max is not None and info.get('trailingPE', float('inf')) > pe_max:
-                include = False
-            if dividend_min_float is not None and info.get('dividendYield', 0) < dividend_min_float:
-                include = False
-            
-            if include:
-                results.append({
-                    "symbol": info.get('symbol'), "name": info.get('longName'),
-                    "pe": info.get('trailingPE'), "dividendYield": info.get('dividendYield'),
-                })
-        except Exception:
-            continue
-
-    return {"results": results}
-
-@app.get("/api/news")
-def get_news(source: str):
-    """Nouveau point d'accès pour les actualités."""
-    if source not in MOCK_NEWS:
-        raise HTTPException(status_code=404, detail="Source not found")
-    return {"articles": MOCK_NEWS[source]}
+        raise HTTPException(status_code=500, detail=str(e))
+    attach_analysis_comment(financial_data)
+    return {"status": financial_data["analysisStatus"], "comment": financial_data["analysisComment"]}
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Compteurs des caches, des appels amont regroupés et de leurs quotas, de l'index des symboles et des sessions de chat."""
+    return {"tickerCache": ticker_cache.stats(), "singleFlight": upstream_flight.stats(), "symbols": symbol_index.stats(), "symbolDirectory": symbol_directory.stats(), "chatSessions": chat_sessions.stats(), "aiComments": ai_comments.stats(),
+            "quotas": quotas.stats(), "priceStore": price_store.stats(), "liveQuotes": quote_hub.stats(), "sharedStore": shared_store.stats() if shared_store is not None else None}
+
+@metrics.registry.collector
+def collect_cache_metrics():
+    """Expose les compteurs déjà tenus par les caches, index et flux au moment de l'export."""
+    caches = {"ticker": ticker_cache.stats(), "correlation": correlation_cache.stats(), "indicators": indicator_cache.stats(), "portfolio": portfolio_cache.stats(), "aiComments": ai_comments.stats()}
+    lookups = {"symbolIndex": symbol_index.stats(), "symbolDirectory": symbol_directory.stats(), **caches}
+    flight = upstream_flight.stats()
+    budgets = quotas.stats()
+    sessions = chat_sessions.stats()
+    return [
+        ("finanalyse_cache_hits_total", "counter", "Lectures servies par le cache.", [({"cache": n}, c["hits"]) for n, c in lookups.items()]),
+        ("finanalyse_cache_misses_total", "counter", "Lectures absentes du cache.", [({"cache": n}, c["misses"]) for n, c in lookups.items()]),
+        ("finanalyse_cache_hit_ratio", "gauge", "Part des lectures servies par le cache.",
+         [({"cache": n}, c["hits"] / (c["hits"] + c["misses"]) if c["hits"] + c["misses"] else None) for n, c in lookups.items()]),
+        ("finanalyse_cache_bytes", "gauge", "Taille estimée du cache.", [({"cache": n}, c["bytes"]) for n, c in caches.items()]),
+        ("finanalyse_cache_evictions_total", "counter", "Entrées évincées par le plafond mémoire.", [({"cache": n}, c["evictions"]) for n, c in caches.items()]),
+        ("finanalyse_cache_shared_hits_total", "counter", "Lectures servies par le stockage partagé entre workers.", [({"cache": n}, c["sharedHits"]) for n, c in caches.items()]),
+        ("finanalyse_singleflight_calls_total", "counter", "Appels amont demandés.", [({}, flight["calls"])]),
+        ("finanalyse_singleflight_coalesced_total", "counter", "Appels amont regroupés avec un appel identique en cours.", [({}, flight["coalesced"])]),
+        ("finanalyse_upstream_budget_remaining", "gauge", "Jetons disponibles dans le seau du fournisseur.",
+         [({"upstream": n}, b["remaining"]) for n, b in budgets.items()]),
+        ("finanalyse_upstream_quota_granted_total", "counter", "Appels amont autorisés par le quota.",
+         [({"upstream": n, "priority": p}, v) for n, b in budgets.items() for p, v in b["granted"].items()]),
+        ("finanalyse_upstream_quota_shed_total", "counter", "Appels amont rejetés (429) faute de quota avant l'échéance.",
+         [({"upstream": n, "priority": p}, v) for n, b in budgets.items() for p, v in b["shed"].items()]),
+        ("finanalyse_upstream_quota_wait_seconds_total", "counter", "Temps passé à attendre un jeton.",
+         [({"upstream": n, "priority": p}, v) for n, b in budgets.items() for p, v in b["waitedSeconds"].items()]),
+        ("finanalyse_live_quote_connections", "gauge", "Connexions WebSocket aux cotations en direct.", [({}, quote_hub.stats()["connections"])]),
+        ("finanalyse_live_quote_symbols", "gauge", "Symboles sondés pour les cotations en direct.", [({}, quote_hub.stats()["symbols"])]),
+        ("finanalyse_price_store_sync_errors_total", "counter", "Synchronisations du stockage des cours en échec (amont ou disque).",
+         [({}, price_store.stats()["syncErrors"])]),
+        ("finanalyse_chat_sessions", "gauge", "Sessions de chat en mémoire.", [({}, sessions["sessions"])]),
+        ("finanalyse_chat_session_bytes", "gauge", "Taille des historiques des sessions de chat en mémoire.", [({}, sessions["bytes"])]),
+        ("finanalyse_ai_comments_pending", "gauge", "Commentaires IA en attente de génération.", [({}, caches["aiComments"]["pending"])]),
+        ("finanalyse_feed_stale", "gauge", "1 si le dernier instantané du flux est périmé.",
+         [({"feed": n}, int(f.stale)) for n, f in market_feeds.feeds.items() if f.data is not None]),
+    ]
 
+@app.get("/metrics")
+def get_metrics():
+    """Métriques au format texte Prometheus."""
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,205 @@
+# metrics.py - MÉTRIQUES AU FORMAT TEXTE PROMETHEUS (ROUTES, APPELS AMONT, CACHES) ET JOURNAL DES REQUÊTES LENTES
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_INF_BUCKET = 'le="+Inf"'
+
+# Phases (nom, durée) de la requête en cours, pour le journal des requêtes lentes
+_phases = contextvars.ContextVar("request_phases", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            for bound, c in zip(self.buckets, counts):
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {c}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, _INF_BUCKET)} {n}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {n}")
+        return lines
+
+
+class Registry:
+    """Ensemble de métriques plus des collecteurs appelés au moment de l'export.
+
+    Un collecteur retourne une liste de (nom, type, aide, [(labels dict, valeur)]) ;
+    il sert à exposer les compteurs déjà tenus par les caches et index existants.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        families = {}
+        for collect in self._collectors:
+            try:
+                for name, kind, help, samples in collect():
+                    families.setdefault(name, (kind, help, []))[2].extend(samples)
+            except Exception as e:
+                print(f"Erreur lors de la collecte des métriques: {e}")
+        for name, (kind, help, samples) in families.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+http_requests = registry.counter("finanalyse_http_requests_total", "Requêtes HTTP traitées.", ("method", "route", "status"))
+http_duration = registry.histogram("finanalyse_http_request_duration_seconds", "Durée des requêtes HTTP.", ("method", "route"))
+http_in_flight = registry.gauge("finanalyse_http_requests_in_flight", "Requêtes HTTP en cours.")
+upstream_duration = registry.histogram("finanalyse_upstream_duration_seconds", "Durée des appels amont.", ("upstream", "operation"))
+upstream_errors = registry.counter("finanalyse_upstream_errors_total", "Appels amont en échec.", ("upstream", "operation"))
+upstream_in_flight = registry.gauge("finanalyse_upstream_in_flight", "Appels amont en cours.", ("upstream",))
+phase_duration = registry.histogram("finanalyse_phase_duration_seconds", "Durée des traitements internes coûteux.", ("phase",))
+
+
+def _record_phase(name: str, elapsed: float):
+    phases = _phases.get()
+    if phases is not None:
+        phases.append((name, elapsed))
+
+
+@contextmanager
+def timed(upstream: str, operation: str):
+    """Mesure un appel amont (yfinance, fmp, marketaux, gemini) : durée, erreurs, appels en cours."""
+    upstream_in_flight.inc(upstream=upstream)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        upstream_errors.inc(upstream=upstream, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_in_flight.dec(upstream=upstream)
+        upstream_duration.observe(elapsed, upstream=upstream, operation=operation)
+        _record_phase(f"{upstream}.{operation}", elapsed)
+
+
+@contextmanager
+def phase(name: str):
+    """Mesure un traitement local (calcul pandas/NumPy, sérialisation...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_duration.observe(elapsed, phase=name)
+        _record_phase(name, elapsed)
+
+
+def begin_request() -> list:
+    """Démarre le relevé des phases de la requête courante (contexte asyncio / copie vers les threads)."""
+    phases = []
+    _phases.set(phases)
+    return phases
+
+
+def format_phases(phases: list) -> str:
+    totals = {}
+    for name, elapsed in phases:
+        count, total = totals.get(name, (0, 0.0))
+        totals[name] = (count + 1, total + elapsed)
+    return ", ".join(f"{name}={total * 1000:.0f}ms" + (f" (x{count})" if count > 1 else "")
+                     for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]))
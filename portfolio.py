@@ -0,0 +1,95 @@
+# portfolio.py - RISQUE D'UN PORTEFEUILLE (VOLATILITÉ, VAR/CVAR, BÊTA, FRONTIÈRE EFFICIENTE) EN NUMPY
+from statistics import NormalDist
+
+import numpy as np
+
+TRADING_DAYS = 252
+CONFIDENCE_LEVELS = (0.95, 0.99)
+
+
+def simple_returns(prices: np.ndarray) -> np.ndarray:
+    """Rendements simples d'une matrice de prix (T, N) -> (T-1, N) : ils s'agrègent par les poids."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return prices[1:] / prices[:-1] - 1.0
+
+
+def annualized_moments(returns: np.ndarray):
+    """(rendements moyens annualisés (N,), covariance annualisée (N, N))."""
+    mean = returns.mean(axis=0) * TRADING_DAYS
+    cov = np.atleast_2d(np.cov(returns, rowvar=False, ddof=1)) * TRADING_DAYS
+    return mean, cov
+
+
+def betas(returns: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
+    """Bêta de chaque colonne de `returns` (T, K) face à l'indice (T,) : cov(r, m) / var(m)."""
+    centered = returns - returns.mean(axis=0)
+    market = benchmark - benchmark.mean()
+    variance = market @ market
+    if variance == 0:
+        return np.full(returns.shape[1], np.nan)
+    return (centered.T @ market) / variance
+
+
+def historical_var(returns: np.ndarray, levels=CONFIDENCE_LEVELS) -> dict:
+    """VaR et CVaR historiques sur un jour, en perte positive (fraction de la valeur du portefeuille)."""
+    levels = np.asarray(levels)
+    quantiles = np.quantile(returns, 1.0 - levels)
+    # CVaR : perte moyenne au-delà de la VaR, pour tous les niveaux d'un bloc (T, L)
+    tail = returns[:, None] <= quantiles[None, :]
+    cvar = -(np.where(tail, returns[:, None], 0.0).sum(axis=0) / np.maximum(tail.sum(axis=0), 1))
+    return {"var": -quantiles, "cvar": cvar}
+
+
+def parametric_var(mean: float, std: float, levels=CONFIDENCE_LEVELS) -> dict:
+    """VaR et CVaR gaussiennes sur un jour (moyenne et écart-type journaliers)."""
+    normal = NormalDist()
+    z = np.array([normal.inv_cdf(1.0 - level) for level in levels])
+    density = np.array([normal.pdf(v) for v in z])
+    return {"var": -(mean + z * std), "cvar": -(mean - std * density / (1.0 - np.asarray(levels)))}
+
+
+def sample_weights(n: int, count: int, seed: int = 0) -> np.ndarray:
+    """Poids long-only (count, n) : exponentielles élevées à la puissance 1/c puis normalisées.
+
+    c = 1 donne exactement une loi de Dirichlet(1) (uniforme sur le simplexe), qui regroupe
+    les tirages autour des poids égaux ; c tiré entre 0.02 et 1 produit aussi des portefeuilles
+    concentrés, qui explorent les bords de la frontière. Les portefeuilles mono-actif sont inclus.
+    """
+    rng = np.random.default_rng(seed)
+    power = np.exp(rng.uniform(0.0, np.log(50.0), size=(count, 1)))
+    draws = rng.standard_exponential((count, n)) ** power
+    weights = draws / draws.sum(axis=1, keepdims=True)
+    return np.vstack([np.eye(n), weights])
+
+
+def frontier(mean: np.ndarray, cov: np.ndarray, weights: np.ndarray, risk_free: float = 0.0, buckets: int = 60) -> dict:
+    """Évalue tous les portefeuilles en un bloc et extrait leur enveloppe efficiente.
+
+    Retourne les rendements et volatilités de chaque tirage, les indices des portefeuilles
+    de Sharpe maximal et de volatilité minimale, et l'enveloppe (meilleur rendement par
+    tranche de volatilité, rendue croissante).
+    """
+    returns = weights @ mean
+    volatility = np.sqrt(np.clip(((weights @ cov) * weights).sum(axis=1), 0.0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(volatility > 0, (returns - risk_free) / volatility, -np.inf)
+
+    edges = np.linspace(volatility.min(), volatility.max(), buckets + 1)
+    bucket = np.clip(np.searchsorted(edges, volatility, side="right") - 1, 0, buckets - 1)
+    # Meilleur tirage de chaque tranche de volatilité
+    order = np.lexsort((-returns, bucket))
+    leaders = order[np.r_[True, bucket[order][1:] != bucket[order][:-1]]]
+    # Partie efficiente : à partir du portefeuille de variance minimale, le rendement doit croître
+    min_vol = int(np.argmin(volatility))
+    leaders = np.concatenate([[min_vol], leaders[volatility[leaders] > volatility[min_vol]]])
+    leaders = leaders[np.argsort(volatility[leaders], kind="stable")]
+    envelope = leaders[returns[leaders] >= np.maximum.accumulate(returns[leaders])]
+
+    return {
+        "returns": returns,
+        "volatility": volatility,
+        "sharpe": sharpe,
+        "maxSharpe": int(np.argmax(sharpe)),
+        "minVolatility": min_vol,
+        "envelope": envelope,
+    }
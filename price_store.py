@@ -0,0 +1,164 @@
+# price_store.py - STOCKAGE LOCAL INCRÉMENTAL DES COURS JOURNALIERS (OHLCV)
+import glob
+import os
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# Une ligne par séance : jour (depuis 1970-01-01), ouverture, plus haut, plus bas, clôture, volume
+COLUMNS = ("day", "open", "high", "low", "close", "volume")
+HISTORY_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+
+class PriceSeries:
+    """Vue en lecture seule sur les séances d'un symbole (tranches du fichier mappé en mémoire)."""
+
+    def __init__(self, symbol: str, bars: np.ndarray):
+        self.symbol = symbol
+        self.bars = bars
+
+    def __len__(self):
+        return len(self.bars)
+
+    @property
+    def days(self) -> np.ndarray:
+        return self.bars[:, 0].astype("datetime64[D]")
+
+    def column(self, name: str) -> np.ndarray:
+        return self.bars[:, COLUMNS.index(name)]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.column("close")
+
+    def since(self, start: date) -> "PriceSeries":
+        first = np.searchsorted(self.bars[:, 0], np.datetime64(start, "D").astype(np.int64))
+        return PriceSeries(self.symbol, self.bars[first:])
+
+
+class PriceStore:
+    """Un fichier .npy par symbole ; seule la fin manquante de l'historique est téléchargée.
+
+    Chaque écriture crée une nouvelle version (SYMBOLE.<horodatage>.npy) : les séries déjà
+    servies restent projetées sur l'ancien fichier, que Windows refuse de remplacer tant
+    qu'il est projeté. Les anciennes versions sont supprimées dès qu'elles sont libérées.
+
+    `load_history(symbol, start)` doit retourner un DataFrame au format de
+    `yf.Ticker.history` (index de dates, colonnes Open/High/Low/Close/Volume) ;
+    `start=None` demande l'historique initial complet.
+    """
+
+    def __init__(self, directory: str, load_history, sync_interval: float = 900):
+        self.directory = directory
+        self.load_history = load_history
+        self.sync_interval = sync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._bars = {}
+        self._synced_at = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.full_fetches = 0
+        self.tail_fetches = 0
+        self.sync_errors = 0
+
+    def _versions(self, symbol: str) -> list:
+        """[(version, chemin)] des fichiers du symbole, du plus ancien au plus récent (sans version = 0)."""
+        base = symbol.replace('/', '_')
+        pattern = re.compile(re.escape(base) + r"(?:\.(\d+))?\.npy")
+        found = []
+        for path in glob.glob(os.path.join(glob.escape(self.directory), glob.escape(base) + "*.npy")):
+            match = pattern.fullmatch(os.path.basename(path))
+            if match:
+                found.append((int(match.group(1) or 0), path))
+        return sorted(found)
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _read(self, symbol: str):
+        if symbol not in self._bars:
+            versions = self._versions(symbol)
+            self._bars[symbol] = np.load(versions[-1][1], mmap_mode="r") if versions else None
+        return self._bars[symbol]
+
+    def _write(self, symbol: str, bars: np.ndarray):
+        path = os.path.join(self.directory, f"{symbol.replace('/', '_')}.{time.time_ns()}.npy")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=np.float64))
+        os.replace(tmp, path)  # Nouveau nom : aucun lecteur ne le projette encore
+        self._bars[symbol] = np.load(path, mmap_mode="r")
+        for _, old in self._versions(symbol):
+            if old != path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass  # Encore projeté par un lecteur (Windows) : retiré lors d'une prochaine écriture
+
+    def get(self, symbol: str) -> PriceSeries:
+        """Retourne toutes les séances connues, après synchronisation si nécessaire."""
+        symbol = symbol.upper()
+        with self._lock(symbol):
+            if time.monotonic() - self._synced_at.get(symbol, float("-inf")) > self.sync_interval:
+                try:
+                    self._sync(symbol)
+                    self._synced_at[symbol] = time.monotonic()
+                except Exception as e:
+                    # Les données déjà stockées restent utilisables si l'amont ou le disque fait défaut
+                    self.sync_errors += 1
+                    print(f"Erreur de synchronisation des cours pour {symbol}: {e}")
+            bars = self._read(symbol)
+        return PriceSeries(symbol, bars if bars is not None else np.empty((0, len(COLUMNS))))
+
+    def _sync(self, symbol: str):
+        stored = self._read(symbol)
+        if stored is None or len(stored) == 0:
+            self._write_if_any(symbol, self._fetch(symbol, None))
+            return
+
+        # On repart de l'avant-dernière séance : la dernière a pu être incomplète (séance en cours)
+        # et l'avant-dernière sert de point de contrôle pour détecter un réajustement des cours.
+        anchor = stored[-2] if len(stored) > 1 else stored[-1]
+        tail = self._fetch(symbol, date(1970, 1, 1) + timedelta(days=int(anchor[0])))
+        if len(tail) == 0:
+            return
+        fresh_anchor = tail[tail[:, 0] == anchor[0]]
+        if len(stored) > 1 and len(fresh_anchor) and not np.isclose(fresh_anchor[0, 4], anchor[4], rtol=1e-6, equal_nan=True):
+            # Les cours ajustés ont changé (dividende, split) : on recharge tout
+            self._write_if_any(symbol, self._fetch(symbol, None))
+            return
+        keep = stored[stored[:, 0] < tail[0, 0]]
+        self._write(symbol, np.concatenate([keep, tail]))
+
+    def _write_if_any(self, symbol: str, bars: np.ndarray):
+        if len(bars):
+            self._write(symbol, bars)
+
+    def _fetch(self, symbol: str, start):
+        if start is None:
+            self.full_fetches += 1
+        else:
+            self.tail_fetches += 1
+        return history_to_bars(self.load_history(symbol, start))
+
+    def stats(self) -> dict:
+        return {"symbols": len(self._bars), "fullFetches": self.full_fetches, "tailFetches": self.tail_fetches,
+                "syncErrors": self.sync_errors}
+
+
+def history_to_bars(hist) -> np.ndarray:
+    """Convertit un DataFrame yfinance en tableau (n, 6) trié par jour."""
+    if hist is None or hist.empty:
+        return np.empty((0, len(COLUMNS)))
+    index = hist.index.tz_localize(None) if getattr(hist.index, "tz", None) is not None else hist.index
+    days = index.values.astype("datetime64[D]").astype(np.int64)
+    bars = np.column_stack([days] + [hist[c].to_numpy(dtype=np.float64) if c in hist else np.full(len(hist), np.nan)
+                                     for c in HISTORY_COLUMNS])
+    bars = bars[np.argsort(bars[:, 0], kind="stable")]
+    # Une seule ligne par jour (la dernière reçue)
+    _, last = np.unique(bars[::-1, 0], return_index=True)
+    return bars[len(bars) - 1 - last]
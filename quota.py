@@ -0,0 +1,232 @@
+# quota.py - QUOTAS DES API EXTERNES : UN SEAU À JETONS PAR FOURNISSEUR, AVEC CLASSES DE PRIORITÉ
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+# Classes de priorité, de la plus importante à la moins importante
+INTERACTIVE, BACKGROUND, WARMUP = 0, 1, 2
+PRIORITY_NAMES = ("interactive", "background", "warmup")
+
+# Part du seau qu'une classe doit laisser aux classes plus importantes
+DEFAULT_RESERVES = (0.0, 0.2, 0.5)
+# Attente maximale (secondes) avant de renoncer : un utilisateur n'attend pas, un rafraîchissement peut
+DEFAULT_DEADLINES = (2.0, 30.0, 300.0)
+
+# Délai maximal entre deux relectures de la priorité pendant une attente (promotion en cours d'attente)
+PROMOTION_POLL = 0.1
+
+
+class Ticket:
+    """Classe de priorité d'un appel amont ; un appel partagé prend celle du plus prioritaire de ses appelants."""
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def promote(self, level: int):
+        if level < self.level:
+            self.level = level
+
+
+_ticket = contextvars.ContextVar("upstream_priority", default=None)
+
+
+@contextmanager
+def priority(level: int):
+    """Attribue une classe de priorité aux appels amont faits dans ce bloc (et ses tâches copiées)."""
+    with _scope(Ticket(level)):
+        yield
+
+
+@contextmanager
+def _scope(ticket: Ticket):
+    token = _ticket.set(ticket)
+    try:
+        yield ticket
+    finally:
+        _ticket.reset(token)
+
+
+def current_priority() -> int:
+    ticket = _ticket.get()
+    return INTERACTIVE if ticket is None else ticket.level
+
+
+class FlightPriority:
+    """Relie les appelants regroupés par un `SingleFlight` à la priorité de l'appel partagé.
+
+    L'appel partagé reçoit son propre ticket, créé à la priorité de l'appelant qui le lance ;
+    un appelant plus prioritaire qui le rejoint (utilisateur derrière un préchargement) le
+    promeut, et l'attente de jeton en cours passe aussitôt dans sa classe.
+    """
+
+    def ticket(self) -> Ticket:
+        return Ticket(current_priority())
+
+    def scope(self, ticket: Ticket):
+        return _scope(ticket)
+
+    def join(self, ticket: Ticket):
+        ticket.promote(current_priority())
+
+
+def parse_quota(value: str):
+    """(jetons par seconde, rafale) depuis "300/60" ou "300/60:20" ; vide, "0" ou "off" : pas de limite."""
+    value = (value or "").strip().lower()
+    if value in ("", "0", "off", "none"):
+        return None
+    rate, _, burst = value.partition(":")
+    count, _, window = rate.partition("/")
+    count, window = float(count), float(window or 1)
+    return count / window, float(burst) if burst else count
+
+
+class QuotaExceeded(HTTPException):
+    """Le quota du fournisseur ne permet pas de servir l'appel avant son échéance (réponse 429)."""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=429,
+                         detail=f"Quota de l'API '{provider}' atteint, réessayez dans {self.retry_after} s.",
+                         headers={"Retry-After": str(self.retry_after)})
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons par seconde, au plus `burst` en réserve.
+
+    Une requête interactive réserve son jeton même si le seau est vide (le niveau devient
+    négatif) et attend qu'il soit remboursé : les interactives sont servies dans l'ordre.
+    Les autres classes ne prennent un jeton que si le seau garde sa réserve pour les
+    classes plus importantes, et sinon réessaient : une interactive passe donc devant.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, reserves=DEFAULT_RESERVES):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.reserves = tuple(r * self.burst for r in reserves)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.granted = [0] * len(PRIORITY_NAMES)
+        self.shed = [0] * len(PRIORITY_NAMES)
+        self.waited = [0.0] * len(PRIORITY_NAMES)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def plan(self, level: int, deadline: float):
+        """(attente, jeton réservé) ; lève QuotaExceeded si l'attente dépasse l'échéance (monotonic)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            need = 1 + self.reserves[level]
+            if self.tokens >= need:
+                self.tokens -= 1
+                self.granted[level] += 1
+                return 0.0, True
+            if level == INTERACTIVE:
+                wait = (1 - self.tokens) / self.rate
+            else:
+                wait = (need - self.tokens) / self.rate
+            if now + wait > deadline:
+                # Inutile de faire patienter : on rejette tout de suite avec le délai estimé
+                self.shed[level] += 1
+                raise QuotaExceeded(self.name, wait)
+            if level == INTERACTIVE:
+                self.tokens -= 1
+                self.granted[level] += 1
+                self.waited[level] += wait
+                return wait, True
+            return wait, False
+
+    def record_wait(self, level: int, seconds: float):
+        with self._lock:
+            self.waited[level] += seconds
+
+    def penalize(self, retry_after: float):
+        """L'amont a répondu 429 : plus aucun jeton avant `retry_after` secondes."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -self.rate * retry_after)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "remaining": max(0.0, self.tokens),
+                "burst": self.burst,
+                "ratePerSecond": self.rate,
+                "granted": dict(zip(PRIORITY_NAMES, self.granted)),
+                "shed": dict(zip(PRIORITY_NAMES, self.shed)),
+                "waitedSeconds": dict(zip(PRIORITY_NAMES, self.waited)),
+            }
+
+
+class QuotaScheduler:
+    """Un seau par fournisseur ; un fournisseur sans quota configuré n'est jamais limité."""
+
+    def __init__(self, quotas: dict, deadlines=DEFAULT_DEADLINES, reserves=DEFAULT_RESERVES):
+        self.deadlines = tuple(deadlines)
+        self.buckets = {name: TokenBucket(name, rate, burst, reserves) for name, (rate, burst) in quotas.items()}
+
+    def _start(self, provider: str, level, deadline):
+        bucket = self.buckets.get(provider)
+        ticket = (_ticket.get() or Ticket(INTERACTIVE)) if level is None else Ticket(level)
+        limit = time.monotonic() + (self.deadlines[ticket.level] if deadline is None else deadline)
+        return bucket, ticket, limit
+
+    def _plan(self, bucket: TokenBucket, ticket: Ticket, level: int, limit: float):
+        """(classe courante, échéance, attente plafonnée, jeton réservé) : relit la priorité du ticket."""
+        if ticket.level < level:
+            # Promu par un appelant plus prioritaire : il n'attendra pas plus que sa propre échéance
+            level = ticket.level
+            limit = min(limit, time.monotonic() + self.deadlines[level])
+        wait, reserved = bucket.plan(level, limit)
+        if not reserved:
+            wait = min(wait, PROMOTION_POLL)
+        return level, limit, wait, reserved
+
+    def acquire(self, provider: str, level: int = None, deadline: float = None):
+        """Attend un jeton (appelants synchrones : threads du pool, yfinance, Gemini)."""
+        bucket, ticket, limit = self._start(provider, level, deadline)
+        if bucket is None:
+            return
+        level, started = ticket.level, time.monotonic()
+        while True:
+            level, limit, wait, reserved = self._plan(bucket, ticket, level, limit)
+            if wait:
+                time.sleep(wait)
+            if reserved:
+                break
+        if level != INTERACTIVE:
+            bucket.record_wait(level, time.monotonic() - started)
+
+    async def acquire_async(self, provider: str, level: int = None, deadline: float = None):
+        """Variante asyncio de `acquire()` : l'attente ne bloque pas la boucle d'événements."""
+        bucket, ticket, limit = self._start(provider, level, deadline)
+        if bucket is None:
+            return
+        level, started = ticket.level, time.monotonic()
+        while True:
+            level, limit, wait, reserved = self._plan(bucket, ticket, level, limit)
+            if wait:
+                await asyncio.sleep(wait)
+            if reserved:
+                break
+        if level != INTERACTIVE:
+            bucket.record_wait(level, time.monotonic() - started)
+
+    def penalize(self, provider: str, retry_after: float):
+        bucket = self.buckets.get(provider)
+        if bucket is not None:
+            bucket.penalize(retry_after)
+
+    def stats(self) -> dict:
+        return {name: bucket.stats() for name, bucket in self.buckets.items()}
@@ -0,0 +1,159 @@
+# screener.py - INDEX DES FONDAMENTAUX EN COLONNES POUR LE SCREENER
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Colonne de l'index -> clé du dictionnaire `info` de yfinance
+TEXT_FIELDS = {"name": "longName", "sector": "sector", "industry": "industry", "country": "country"}
+NUMERIC_FIELDS = {
+    "pe": "trailingPE",
+    "forwardPe": "forwardPE",
+    "dividendYield": "dividendYield",
+    "marketCap": "marketCap",
+    "price": "currentPrice",
+    "beta": "beta",
+    "roe": "returnOnEquity",
+    "netMargin": "profitMargins",
+    "revenue": "totalRevenue",
+    "netIncome": "netIncomeToCommon",
+}
+
+
+class FundamentalsIndex:
+    """Table de fondamentaux (une colonne NumPy par champ) rafraîchie en arrière-plan.
+
+    Les requêtes ne touchent jamais le réseau : elles filtrent la dernière table
+    construite avec des masques vectorisés.
+    """
+
+    def __init__(self, load_info, universe, refresh_interval: float = 6 * 3600, workers: int = 8):
+        self.load_info = load_info
+        self.universe = list(dict.fromkeys(s.upper() for s in universe))
+        self.refresh_interval = refresh_interval
+        self.workers = workers
+        self._table = None
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.as_of = None
+        self.last_error = None
+
+    def _safe_info(self, symbol: str):
+        try:
+            info = self.load_info(symbol)
+            return info if info and info.get("longName") else None
+        except Exception:
+            return None
+
+    def refresh(self):
+        """Recharge toute la table ; en cas d'échec, l'ancienne table reste servie."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="screener") as pool:
+            infos = list(pool.map(self._safe_info, self.universe))
+        rows = [(symbol, info) for symbol, info in zip(self.universe, infos) if info]
+        if not rows:
+            self.last_error = "Aucune donnée de fondamentaux récupérée."
+            return
+
+        table = {"symbol": np.array([symbol for symbol, _ in rows], dtype=object)}
+        for column, key in TEXT_FIELDS.items():
+            table[column] = np.array([info.get(key) or "" for _, info in rows], dtype=object)
+        for column, key in NUMERIC_FIELDS.items():
+            table[column] = np.array([_to_float(info.get(key)) for _, info in rows], dtype=np.float64)
+        table["_sector_key"] = np.char.lower(table["sector"].astype(str))
+        table["_country_key"] = np.char.lower(table["country"].astype(str))
+        positions = {symbol: i for i, symbol in enumerate(table["symbol"])}
+
+        with self._lock:
+            self._table = table
+            self._positions = positions
+            self.as_of = datetime.now(timezone.utc)
+            self.last_error = None
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Erreur lors du rafraîchissement du screener: {e}")
+            time.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="screener-refresh", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return self._table is not None
+
+    def market_cap(self, symbol: str):
+        """Capitalisation connue du symbole (None s'il est hors de l'index ou non renseigné)."""
+        with self._lock:
+            table, position = self._table, self._positions.get(symbol.upper())
+        if table is None or position is None:
+            return None
+        return _to_json(table["marketCap"][position])
+
+    def query(self, sector=None, country=None, pe_min=None, pe_max=None, dividend_min=None, dividend_max=None,
+              market_cap_min=None, market_cap_max=None, sort_by="marketCap", descending=True, limit=50, offset=0):
+        """Filtre, trie et pagine la table. Les rendements sont des fractions (0.02 = 2%)."""
+        with self._lock:
+            table = self._table
+        if table is None:
+            return {"results": [], "total": 0}
+
+        mask = np.ones(len(table["symbol"]), dtype=bool)
+        if sector:
+            mask &= table["_sector_key"] == sector.lower()
+        if country:
+            mask &= table["_country_key"] == country.lower()
+        # Les comparaisons avec NaN sont fausses : une valeur manquante exclut la ligne
+        if pe_min is not None:
+            mask &= table["pe"] >= pe_min
+        if pe_max is not None:
+            mask &= table["pe"] <= pe_max
+        dividend = np.nan_to_num(table["dividendYield"], nan=0.0)
+        if dividend_min is not None:
+            mask &= dividend >= dividend_min
+        if dividend_max is not None:
+            mask &= dividend <= dividend_max
+        if market_cap_min is not None:
+            mask &= table["marketCap"] >= market_cap_min
+        if market_cap_max is not None:
+            mask &= table["marketCap"] <= market_cap_max
+
+        indices = np.flatnonzero(mask)
+        column = table[sort_by]
+        if column.dtype == object:
+            order = np.argsort(column[indices].astype(str), kind="stable")
+        else:
+            # Les NaN sont toujours placés en fin de liste, quel que soit le sens
+            values = column[indices]
+            order = np.argsort(-values if descending else values, kind="stable")
+        if descending and column.dtype == object:
+            order = order[::-1]
+        page = indices[order][offset:offset + limit]
+
+        columns = ["symbol", *TEXT_FIELDS, *NUMERIC_FIELDS]
+        results = [
+            {c: _to_json(table[c][i]) for c in columns}
+            for i in page
+        ]
+        return {"results": results, "total": int(indices.size)}
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _to_json(value):
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    return value or None
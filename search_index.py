@@ -0,0 +1,127 @@
+# search_index.py - ANNUAIRE LOCAL DES SYMBOLES POUR L'AUTOCOMPLÉTION (RECHERCHE PAR PRÉFIXE)
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+# Rang d'une correspondance : plus il est petit, mieux le résultat est classé
+EXACT_SYMBOL, SYMBOL_PREFIX, NAME_PREFIX, WORD_PREFIX = range(4)
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text: str) -> str:
+    """Forme de comparaison : sans accents, sans casse (« L'Oréal » -> « l'oreal »)."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+class SymbolDirectory:
+    """Annuaire symbole / nom d'entreprise interrogé entièrement en mémoire.
+
+    Toutes les clés (symbole, nom complet, chaque mot du nom) sont rangées dans
+    une liste triée : une recherche par préfixe est une recherche dichotomique
+    suivie d'un parcours de toutes les clés qui partagent le préfixe.
+    `market_cap(symbole)` (facultatif) départage les résultats de même rang.
+
+    Les préfixes très courants (« a », « inc »...) couvrent des dizaines de
+    milliers de clés : au-delà de `wide_prefix` clés, les `max_limit` meilleurs
+    résultats sont mémorisés pendant `wide_ttl` secondes.
+    """
+
+    def __init__(self, market_cap=None, wide_prefix: int = 2000, max_limit: int = 50, wide_ttl: float = 600):
+        self.market_cap = market_cap
+        self.wide_prefix = wide_prefix
+        self.max_limit = max_limit
+        self.wide_ttl = wide_ttl
+        self._entries = []
+        self._keys = []
+        self._refs = []
+        self._wide = {}
+        self._lock = threading.Lock()
+        self.source = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, rows, source: str = None):
+        """Reconstruit l'index à partir de lignes {symbol, name, exchange, ...}."""
+        entries, seen = [], set()
+        for row in rows:
+            symbol = (row.get("symbol") or "").strip().upper()
+            if not symbol or symbol in seen:
+                continue
+            seen.add(symbol)
+            entries.append({
+                "symbol": symbol,
+                "name": (row.get("name") or "").strip(),
+                "currency": row.get("currency"),
+                "stockExchange": row.get("stockExchange") or row.get("exchange"),
+                "exchangeShortName": row.get("exchangeShortName") or row.get("exchange"),
+            })
+
+        keyed = []
+        for position, entry in enumerate(entries):
+            keyed.append((fold(entry["symbol"]), position, SYMBOL_PREFIX))
+            name = fold(entry["name"])
+            if name:
+                keyed.append((name, position, NAME_PREFIX))
+                for word in set(_WORD_SPLIT.split(name)[1:]):
+                    if word:
+                        keyed.append((word, position, WORD_PREFIX))
+        keyed.sort()
+
+        with self._lock:
+            self._entries = entries
+            self._keys = [key for key, _, _ in keyed]
+            self._refs = [(position, rank) for _, position, rank in keyed]
+            self._wide = {}
+            self.source = source
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Retourne au plus `limit` entrées, au format de la recherche FMP."""
+        prefix = fold(query)
+        if not prefix:
+            return []
+        with self._lock:
+            entries, keys, refs, wide = self._entries, self._keys, self._refs, self._wide
+
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\uffff", start)
+        if end - start > self.wide_prefix and limit <= self.max_limit:
+            cached = wide.get(prefix)
+            if cached is None or time.monotonic() - cached[0] > self.wide_ttl:
+                cached = wide[prefix] = (time.monotonic(), self._rank(entries, keys, refs, prefix, start, end, self.max_limit))
+            ranked = cached[1][:limit]
+        else:
+            ranked = self._rank(entries, keys, refs, prefix, start, end, limit)
+
+        if ranked:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return [dict(entries[position]) for position in ranked]
+
+    def _rank(self, entries, keys, refs, prefix, start, end, limit) -> list:
+        """Classe toutes les entrées des clés [start, end) ; la limite s'applique après le classement."""
+        best = {}
+        for i in range(start, end):
+            position, rank = refs[i]
+            if rank == SYMBOL_PREFIX and keys[i] == prefix:
+                rank = EXACT_SYMBOL
+            if rank < best.get(position, WORD_PREFIX + 1):
+                best[position] = rank
+
+        def sort_key(position):
+            symbol = entries[position]["symbol"]
+            cap = self.market_cap(symbol) if self.market_cap else None
+            return best[position], -(cap or 0.0), len(symbol), symbol
+
+        return heapq.nsmallest(limit, best, key=sort_key)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "keys": len(self._keys), "source": self.source,
+                "widePrefixes": len(self._wide), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,256 @@
+# sessions.py - STOCKAGE BORNÉ DES SESSIONS DE CHAT (TTL D'INACTIVITÉ, LRU, BUDGET PAR SESSION)
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+
+def content_bytes(content) -> int:
+    """Taille (octets UTF-8) du texte d'un message d'historique (dict ou objet Content)."""
+    parts = content.get("parts", []) if isinstance(content, dict) else getattr(content, "parts", [])
+    total = 0
+    for part in parts:
+        text = part if isinstance(part, str) else getattr(part, "text", "")
+        total += len(text.encode("utf-8"))
+    return total
+
+
+def serialize_history(history) -> list:
+    """Historique (dicts ou objets Content) -> liste JSON [{"role", "parts": [texte]}]."""
+    messages = []
+    for content in history:
+        role = content.get("role") if isinstance(content, dict) else getattr(content, "role", None)
+        parts = content.get("parts", []) if isinstance(content, dict) else getattr(content, "parts", [])
+        messages.append({"role": role, "parts": [p if isinstance(p, str) else getattr(p, "text", "") for p in parts]})
+    return messages
+
+
+class _Entry:
+    def __init__(self, chat):
+        self.chat = chat
+        self.lock = threading.Lock()
+        self.last_access = time.monotonic()
+        self.bytes = sum(content_bytes(c) for c in chat.history)
+        self.version = 0  # Version de l'historique dans le stockage partagé
+
+
+async def _acquire_async(lock: threading.Lock):
+    """Prend un verrou de threads sans bloquer la boucle d'événements ni l'interroger en boucle.
+
+    Le même verrou protège `use()` depuis les threads du serveur : l'attente se fait donc
+    dans un thread. Si la tâche est annulée pendant l'attente, le verrou obtenu est aussitôt rendu.
+    """
+    if lock.acquire(blocking=False):
+        return
+    waiter = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+    try:
+        await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        waiter.add_done_callback(lambda _: lock.release())
+        raise
+
+
+class ChatSessionStore:
+    """Sessions de chat avec expiration après inactivité, plafond LRU et budget par session.
+
+    `factory()` crée une nouvelle session (objet exposant une liste `history`).
+    Les `preamble` premiers messages (consigne système) ne sont jamais élagués ;
+    au-delà du budget, les échanges les plus anciens sont retirés par paires.
+
+    Avec `shared`, l'historique sérialisé est recopié après chaque échange et relu
+    avant le suivant : une session survit au passage d'un worker à l'autre.
+    """
+
+    def __init__(self, factory, idle_ttl: float = 1800, max_sessions: int = 1000,
+                 max_turns: int = 20, max_bytes: int = 32 * 1024, preamble: int = 2, shared=None):
+        self.factory = factory
+        self.shared = shared
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.preamble = preamble
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.expired = 0
+        self.evicted = 0
+        self.restored = 0
+
+    def __contains__(self, session_id) -> bool:
+        with self._lock:
+            return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _live(self, session_id):
+        """Entrée non expirée de la session (appelé sous le verrou) ; une entrée expirée est retirée."""
+        entry = self._entries.get(session_id)
+        if entry is not None and time.monotonic() - entry.last_access > self.idle_ttl:
+            del self._entries[session_id]
+            self.expired += 1
+            entry = None
+        return entry
+
+    def _entry(self, session_id) -> _Entry:
+        with self._lock:
+            entry = self._live(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+                entry.last_access = time.monotonic()
+                return entry
+        # Création hors du verrou global : model.start_chat() ne bloque pas les autres sessions
+        created = _Entry(self.factory())
+        with self._lock:
+            entry = self._live(session_id)
+            if entry is None:  # Sinon, une requête concurrente l'a créée entre-temps : on la garde
+                entry = self._entries[session_id] = created
+                while len(self._entries) > self.max_sessions:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+            self._entries.move_to_end(session_id)
+            entry.last_access = time.monotonic()
+            return entry
+
+    @contextmanager
+    def use(self, session_id):
+        """Donne un accès exclusif à la session, puis applique le budget une fois l'échange terminé.
+
+        Si l'échange est interrompu (exception dans le bloc), il est retiré de l'historique.
+        """
+        entry = self._entry(session_id)
+        with entry.lock:
+            self._pull(session_id, entry)
+            before = len(self._settled_history(entry))
+            completed = False
+            try:
+                yield entry.chat
+                completed = True
+            finally:
+                self._enforce_budget(entry, keep=None if completed else before)
+                self._push(session_id, entry)
+                entry.last_access = time.monotonic()
+
+    @asynccontextmanager
+    async def use_async(self, session_id):
+        """Variante asyncio de `use()` : l'attente du verrou ne bloque pas la boucle d'événements.
+
+        Le verrou est toujours rendu, même si le client se déconnecte en plein streaming.
+        """
+        entry = self._entry(session_id)
+        await _acquire_async(entry.lock)
+        try:
+            if self.shared is not None:
+                await asyncio.to_thread(self._pull, session_id, entry)
+            before = len(self._settled_history(entry))
+            completed = False
+            try:
+                yield entry.chat
+                completed = True
+            finally:
+                self._enforce_budget(entry, keep=None if completed else before)
+                if self.shared is not None:
+                    await asyncio.to_thread(self._push, session_id, entry)
+        finally:
+            entry.last_access = time.monotonic()
+            entry.lock.release()
+
+    def _pull(self, session_id, entry: _Entry):
+        """Reprend l'historique du stockage partagé s'il est plus récent que la copie locale."""
+        if self.shared is None:
+            return
+        found, blob, _ = self.shared.get(f"chat:{session_id}")
+        if not found:
+            return
+        try:
+            state = json.loads(blob)
+            if state["version"] > entry.version:
+                entry.chat.history = state["history"]
+                entry.version = state["version"]
+                self.restored += 1
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Erreur lors de la reprise de la session de chat {session_id}: {e}")
+
+    def _push(self, session_id, entry: _Entry):
+        if self.shared is None:
+            return
+        entry.version += 1
+        try:
+            blob = json.dumps({"version": entry.version, "history": serialize_history(entry.chat.history)}).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            print(f"Erreur lors de la sauvegarde de la session de chat {session_id}: {e}")
+            return
+        self.shared.set(f"chat:{session_id}", blob, self.idle_ttl)
+
+    def _settled_history(self, entry: _Entry, keep: int = None) -> list:
+        """Historique de la session, débarrassé d'un échange rompu ou interrompu.
+
+        Après une réponse en streaming rompue, genai lève une erreur à chaque lecture de
+        `history` tant que l'échange n'est pas retiré (`rewind()`) ; sans cela, la session
+        resterait inutilisable jusqu'à son expiration. `keep` (longueur de l'historique
+        avant l'échange) retire aussi un échange abandonné qui n'a pas levé d'erreur.
+        """
+        try:
+            history = list(entry.chat.history)
+        except Exception as e:
+            print(f"Échange de chat incomplet retiré de la session: {e}")
+            try:
+                entry.chat.rewind()
+                history = list(entry.chat.history)
+            except Exception as e:
+                # Historique irrécupérable : la session repart de la consigne système
+                print(f"Session de chat réinitialisée: {e}")
+                entry.chat = self.factory()
+                return list(entry.chat.history)
+        if keep is not None and len(history) > keep:
+            history = history[:keep]
+            entry.chat.history = history
+        return history
+
+    def _enforce_budget(self, entry: _Entry, keep: int = None):
+        history = self._settled_history(entry, keep)
+        head, turns = history[:self.preamble], history[self.preamble:]
+        sizes = [content_bytes(c) for c in turns]
+        total = sum(content_bytes(c) for c in head) + sum(sizes)
+        drop = 0
+        while turns[drop:] and (len(turns) - drop > 2 * self.max_turns or total > self.max_bytes):
+            # On retire un échange complet (question + réponse) pour garder l'alternance des rôles
+            total -= sum(sizes[drop:drop + 2])
+            drop += 2
+        if drop:
+            entry.chat.history = head + turns[drop:]
+        entry.bytes = total
+
+    def sweep(self) -> int:
+        """Supprime les sessions inactives depuis plus de `idle_ttl` secondes."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [sid for sid, entry in self._entries.items() if now - entry.last_access > self.idle_ttl]
+            for sid in stale:
+                del self._entries[sid]
+            self.expired += len(stale)
+        return len(stale)
+
+    def start_sweeper(self, interval: float = 60):
+        def run():
+            while True:
+                time.sleep(interval)
+                self.sweep()
+
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=run, name="chat-session-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": sum(entry.bytes for entry in self._entries.values()),
+                "maxSessions": self.max_sessions,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "restored": self.restored,
+            }
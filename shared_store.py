@@ -0,0 +1,160 @@
+# shared_store.py - STOCKAGE PARTAGÉ ENTRE WORKERS (L2) POUR LES CACHES ET LES SESSIONS DE CHAT
+#
+# Plusieurs workers uvicorn sur une même machine partagent un fichier SQLite (mode WAL) :
+# chaque processus garde son cache L1 en mémoire, ce stockage sert de L2 commun.
+# Les expirations sont des instants absolus (horloge murale) pour être comparables
+# d'un processus à l'autre ; un L1 alimenté depuis le L2 expire au même instant.
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS invalidations (id INTEGER PRIMARY KEY AUTOINCREMENT, prefix TEXT NOT NULL, at REAL NOT NULL);
+"""
+
+
+class SQLiteStore:
+    """Clé -> octets avec expiration, baux d'exclusivité et journal des invalidations.
+
+    Le stockage ne doit jamais faire échouer une requête : toute erreur SQLite est
+    comptée, journalisée, et traitée comme une absence.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 2.0, purge_interval: float = 300):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.purge_interval = purge_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as db:
+            db.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread : sqlite3 interdit le partage entre threads par défaut
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _run(self, operation: str, query, default=None):
+        try:
+            return query(self._connection())
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Erreur du stockage partagé ({operation}): {e}")
+            return default
+
+    def get(self, key: str):
+        """Retourne (trouvé, valeur, expiration absolue)."""
+        row = self._run("get", lambda db: db.execute(
+            "SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone())
+        if row is None:
+            self.misses += 1
+            return False, None, None
+        self.hits += 1
+        return True, row[0], row[1]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._run("set", lambda db: db.execute(
+            "INSERT OR REPLACE INTO entries (key, expires_at, value) VALUES (?, ?, ?)", (key, time.time() + ttl, value)))
+        self.writes += 1
+        self._maybe_purge()
+
+    def delete_prefix(self, prefix: str):
+        """Supprime les entrées dont la clé commence par `prefix` et publie l'invalidation."""
+        def query(db):
+            db.execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            db.execute("INSERT INTO invalidations (prefix, at) VALUES (?, ?)", (prefix, time.time()))
+        self._run("delete", query)
+
+    def invalidations_since(self, last_id: int):
+        """Retourne (dernier identifiant, [préfixes invalidés depuis `last_id`])."""
+        rows = self._run("invalidations", lambda db: db.execute(
+            "SELECT id, prefix FROM invalidations WHERE id > ? ORDER BY id", (last_id,)).fetchall(), default=[])
+        return (rows[-1][0] if rows else last_id), [prefix for _, prefix in rows]
+
+    def last_invalidation(self) -> int:
+        row = self._run("invalidations", lambda db: db.execute("SELECT MAX(id) FROM invalidations").fetchone())
+        return (row[0] if row else None) or 0
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        """Prend le bail de `key` pour `ttl` secondes ; False si un autre processus le détient."""
+        def query(db):
+            now = time.time()
+            db.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            return db.execute("INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                              (key, self.owner, now + ttl)).rowcount == 1
+        # En cas d'erreur, on agit comme sans stockage partagé : l'appel amont a lieu
+        return self._run("acquire", query, default=True)
+
+    def release(self, key: str):
+        self._run("release", lambda db: db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner)))
+
+    def leased(self, key: str) -> bool:
+        row = self._run("leased", lambda db: db.execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone())
+        return row is not None
+
+    def wait(self, key: str, timeout: float, poll: float = 0.05):
+        """Attend qu'un autre processus remplisse `key` ; s'arrête si son bail disparaît."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            found, value, expires_at = self.get(key)
+            if found:
+                return found, value, expires_at
+            if not self.leased(key):
+                break  # Le détenteur a échoué ou abandonné : à nous de charger
+            time.sleep(poll)
+        return self.get(key)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+
+        def query(db):
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            db.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            db.execute("DELETE FROM invalidations WHERE at <= ?", (now - 24 * 3600,))
+        self._run("purge", query)
+
+    def stats(self) -> dict:
+        row = self._run("stats", lambda db: db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries WHERE expires_at > ?", (time.time(),)).fetchone())
+        total = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": row[0] if row else None,
+            "bytes": row[1] if row else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "hitRatio": self.hits / total if total else 0.0,
+        }
+
+
+def open_store(url: str):
+    """Ouvre le stockage décrit par `url` ("sqlite:///chemin.db" ou un simple chemin) ; None si vide."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    elif "://" in url:
+        raise ValueError(f"Stockage partagé non pris en charge : {url}")
+    return SQLiteStore(url)
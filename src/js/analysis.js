@@ -15,6 +15,21 @@ const formatCurrencyBillion = (n) => `$${(n / 1e9).toFixed(1)}B`;
 const formatPercentage = (n) => `${(n * 100).toFixed(1)}%`;
 const formatRatio = (n) => `${Number(n).toFixed(1)}x`;
 
+// --- DÉCODAGE DU FORMAT COMPACT (format=compact) ---
+// Dates : premier jour + écarts en jours ; valeurs : deltas entiers en virgule fixe
+function decodeDays(encoded) {
+    if (!encoded.start) return [];
+    let day = Date.parse(encoded.start) / 86400000;
+    return [encoded.start, ...encoded.steps.map(step => new Date((day += step) * 86400000).toISOString().slice(0, 10))];
+}
+function decodeColumn(encoded) {
+    const scale = 10 ** encoded.decimals;
+    let total = 0;
+    const values = encoded.deltas.map(delta => (total += delta) / scale);
+    (encoded.missing || []).forEach(i => { values[i] = null; });
+    return values;
+}
+
 // --- FONCTIONS DE CALCUL ---
 function calculateFinancialScore(data) {
     let score = 0;
@@ -66,27 +81,48 @@ function updateUICards(finData, advData, score) {
     document.getElementById('company-card').innerHTML = `<h3 class="text-xl font-bold text-gray-800">${finData.name}</h3><p class="text-gray-600 mb-4">${finData.symbol}</p><div class="space-y-2 text-sm"><p><i class="fas fa-industry w-5 text-gray-400 mr-2"></i>${finData.sector}</p><p><i class="fas fa-globe w-5 text-gray-400 mr-2"></i>${finData.country}</p><p><i class="fas fa-dollar-sign w-5 text-gray-400 mr-2"></i><span class="font-semibold">${safe(finData.price, p => `$${p.toFixed(2)}`)}</span></p></div>`;
     const hue = (score / 10) * 120;
     document.getElementById('score-card').innerHTML = `<h3 class="text-lg font-semibold text-gray-800 mb-2 text-center">Score Financier</h3><div class="text-center my-4"><span class="text-5xl font-bold" style="color: hsl(${hue}, 80%, 45%)">${score.toFixed(1)}</span><span class="text-2xl text-gray-500">/10</span></div>`;
-    document.getElementById('analysis-comment').textContent = finData.analysisComment || "Le commentaire de l'IA n'est pas disponible.";
+    document.getElementById('analysis-comment').textContent = finData.analysisComment || (finData.analysisStatus === 'pending' ? "Le commentaire de l'IA est en cours de rédaction..." : "Le commentaire de l'IA n'est pas disponible.");
     document.getElementById('quick-stats-card').innerHTML = `<h3 class="text-lg font-semibold text-gray-800 mb-4">Indicateurs Clés</h3><div class="grid grid-cols-2 gap-2">${createStat("Chiffre d'affaires", safe(finData.revenue, formatCurrencyBillion))}${createStat("Bénéfice net", safe(finData.netIncome, formatCurrencyBillion))}${createStat("PER", safe(finData.peRatio, r => r.toFixed(1)))}${createStat("ROE", safe(finData.roe, formatPercentage))}${createStat("Marge nette", safe(finData.netMargin, formatPercentage))}${createStat("Dividende (Yield)", safe(advData.dividendYield, formatPercentage))}</div>`;
     document.getElementById('advanced-metrics-grid').innerHTML = `${createStat("Ratio liquidité", safe(advData.currentRatio, r => r.toFixed(2)))} ${createStat("Dette/Cap. Propres", safe(advData.debtToEquity, r => r.toFixed(2)))}`;
 }
 
+// --- COMMENTAIRE IA : GÉNÉRÉ EN ARRIÈRE-PLAN PAR LE SERVEUR ---
+async function pollAnalysisComment(ticker, attempts = 15) {
+    for (let i = 0; i < attempts; i++) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        if (!currentCompanyData || currentCompanyData.symbol !== ticker) return; // Autre entreprise affichée
+        try {
+            const res = await fetch(`${API_BASE}/entreprise/${ticker}/comment`);
+            if (!res.ok) return;
+            const data = await res.json();
+            if (data.status === 'pending') continue;
+            document.getElementById('analysis-comment').textContent = data.comment || "Le commentaire de l'IA n'est pas disponible.";
+            return;
+        } catch (e) {
+            return;
+        }
+    }
+}
+
 // --- FONCTION D'ANALYSE ---
 async function analyzeCompany(ticker) {
     const loading = document.getElementById('loading-state'), content = document.getElementById('analysis-content'), error = document.getElementById('error-state');
     loading.classList.remove('hidden'); content.classList.add('hidden'); error.classList.add('hidden');
 
     try {
-        const [finRes, histRes, advRes, divRes] = await Promise.all([
-            fetch(`${API_BASE}/entreprise/${ticker}`), fetch(`${API_BASE}/historique/${ticker}`),
-            fetch(`${API_BASE}/advanced-metrics/${ticker}`), fetch(`${API_BASE}/dividends/${ticker}`),
-        ]);
-        if (!finRes.ok) throw new Error((await finRes.json()).detail || "Données non trouvées.");
+        // Un seul aller-retour : le serveur regroupe entreprise, historique, métriques et dividendes
+        const res = await fetch(`${API_BASE}/analysis/${ticker}?format=compact`);
+        if (!res.ok) throw new Error((await res.json()).detail || "Données non trouvées.");
+        const bundle = await res.json();
+        if (!bundle.entreprise) throw new Error((bundle.errors || {}).entreprise || "Données non trouvées.");
 
-        const finData = await finRes.json(), histData = await histRes.json(), advData = await advRes.json(), divData = await divRes.json();
+        const finData = bundle.entreprise, advData = bundle.advancedMetrics || {};
+        const histData = bundle.historique ? { dates: decodeDays(bundle.historique), prices: decodeColumn(bundle.historique.prices) } : { dates: [], prices: [] };
+        const divData = bundle.dividends || { dividendHistory: { years: [], amounts: [] } };
         currentCompanyData = { ...finData, ...advData };
         const score = calculateFinancialScore(currentCompanyData);
         updateUICards(finData, advData, score);
+        if (finData.analysisStatus === 'pending') pollAnalysisComment(finData.symbol);
         createChart('stock-chart', 'line', { labels: histData.dates, datasets: [{ label: "Prix ($)", data: histData.prices, borderColor: "#3b82f6", fill: true }] }, { responsive: true, maintainAspectRatio: false });
         createChart('dividend-chart', 'bar', { labels: divData.dividendHistory.years, datasets: [{ label: "Dividende Annuel ($)", data: divData.dividendHistory.amounts, backgroundColor: "#10b981" }] }, { responsive: true, maintainAspectRatio: false });
         content.classList.remove('hidden');
@@ -114,10 +150,14 @@ document.addEventListener("DOMContentLoaded", () => {
         container.classList.remove("hidden");
         document.getElementById("comparison-summary").innerHTML = "Chargement...";
         try {
-            const [compFinRes, compAdvRes] = await Promise.all([fetch(`${API_BASE}/entreprise/${compareTicker}`), fetch(`${API_BASE}/advanced-metrics/${compareTicker}`)]);
-            if (!compFinRes.ok) throw new Error((await compFinRes.json()).detail);
-            const compFinData = await compFinRes.json(), compAdvData = await compAdvRes.json();
-            const comparisonData = { ...compFinData, ...compAdvData };
+            // Via `compare=` : le symbole comparé est validé une fois, ses commentaires IA partent par lots
+            const params = new URLSearchParams({ sections: "advancedMetrics", compare: compareTicker });
+            const compRes = await fetch(`${API_BASE}/analysis/${currentCompanyData.symbol}?${params.toString()}`);
+            if (!compRes.ok) throw new Error((await compRes.json()).detail);
+            const compared = ((await compRes.json()).compare || {})[compareTicker];
+            if (!compared || compared.error) throw new Error((compared && compared.error) || "Données non trouvées.");
+            if (!compared.entreprise) throw new Error((compared.errors || {}).entreprise || "Données non trouvées.");
+            const comparisonData = { ...compared.entreprise, ...compared.advancedMetrics };
             let tableHTML = `<table class="min-w-full text-sm text-left"><thead class="bg-gray-50"><tr><th class="px-2 py-2">Métrique</th><th class="px-2 py-2 text-center font-semibold">${currentCompanyData.symbol}</th><th class="px-2 py-2 text-center font-semibold">${comparisonData.symbol}</th></tr></thead><tbody>`;
             tableHTML += createComparisonRow("PER", safe(currentCompanyData.peRatio, r => r.toFixed(1)), safe(comparisonData.peRatio, r => r.toFixed(1)), true);
             tableHTML += createComparisonRow("ROE", safe(currentCompanyData.roe, formatPercentage), safe(comparisonData.roe, formatPercentage));
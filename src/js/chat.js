@@ -53,9 +53,11 @@ document.addEventListener('DOMContentLoaded', () => {
         chatInput.disabled = true;
         sendBtn.disabled = true;
         appendMessage("...", 'ai'); // Indicateur de frappe
+        const typingIndicator = chatBox.lastChild;
 
         try {
-            const response = await fetch(`${API_BASE}/chat`, {
+            // Réponse en streaming (SSE) : le texte s'affiche au fur et à mesure de sa génération
+            const response = await fetch(`${API_BASE}/chat/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -64,27 +66,43 @@ document.addEventListener('DOMContentLoaded', () => {
                 })
             });
 
-            // Supprime l'indicateur de frappe
-            if (chatBox.lastChild) {
-                chatBox.removeChild(chatBox.lastChild);
-            }
-            
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.detail || 'La réponse du serveur n\'est pas OK.');
             }
 
-            const data = await response.json();
-            appendMessage(data.response, 'ai');
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '', answerDiv = null;
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const event = (raw.match(/^event: (.*)$/m) || [])[1] || 'message';
+                    const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+                    if (event === 'error') throw new Error(data.detail);
+                    if (event !== 'message' || !data.text) continue;
+                    if (!answerDiv) {
+                        // Supprime l'indicateur de frappe au premier morceau reçu
+                        typingIndicator.remove();
+                        appendMessage('', 'ai');
+                        answerDiv = chatBox.lastChild;
+                    }
+                    answerDiv.textContent += data.text;
+                    chatBox.scrollTop = chatBox.scrollHeight;
+                }
+            }
 
         } catch (error) {
             console.error("Erreur lors de l'envoi du message:", error);
-            // S'assurer que le dernier message "..." est retiré même en cas d'erreur
-            if (chatBox.lastChild && chatBox.lastChild.querySelector('.typing-indicator')) {
-                chatBox.removeChild(chatBox.lastChild);
-            }
+            typingIndicator.remove();
             appendMessage(`Désolé, une erreur est survenue : ${error.message}`, 'ai');
         } finally {
+            // Flux terminé sans aucun texte (ex: réponse vide) : l'indicateur ne doit pas rester affiché
+            typingIndicator.remove();
             chatInput.disabled = false;
             sendBtn.disabled = false;
             chatInput.focus();
@@ -157,9 +175,11 @@ document.addEventListener('DOMContentLoaded', () => {
         chatInput.disabled = true;
         sendBtn.disabled = true;
         appendMessage("...", 'ai'); // Indicateur de frappe
+        const typingIndicator = chatBox.lastChild;
 
         try {
-            const response = await fetch(`${API_BASE}/chat`, {
+            // Réponse en streaming (SSE) : le texte s'affiche au fur et à mesure de sa génération
+            const response = await fetch(`${API_BASE}/chat/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -168,27 +188,43 @@ document.addEventListener('DOMContentLoaded', () => {
                 })
             });
 
-            // Supprime l'indicateur de frappe
-            if (chatBox.lastChild) {
-                chatBox.removeChild(chatBox.lastChild);
-            }
-            
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.detail || 'La réponse du serveur n\'est pas OK.');
             }
 
-            const data = await response.json();
-            appendMessage(data.response, 'ai');
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '', answerDiv = null;
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const event = (raw.match(/^event: (.*)$/m) || [])[1] || 'message';
+                    const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+                    if (event === 'error') throw new Error(data.detail);
+                    if (event !== 'message' || !data.text) continue;
+                    if (!answerDiv) {
+                        // Supprime l'indicateur de frappe au premier morceau reçu
+                        typingIndicator.remove();
+                        appendMessage('', 'ai');
+                        answerDiv = chatBox.lastChild;
+                    }
+                    answerDiv.textContent += data.text;
+                    chatBox.scrollTop = chatBox.scrollHeight;
+                }
+            }
 
         } catch (error) {
             console.error("Erreur lors de l'envoi du message:", error);
-            // S'assurer que le dernier message "..." est retiré même en cas d'erreur
-            if (chatBox.lastChild && chatBox.lastChild.querySelector('.typing-indicator')) {
-                chatBox.removeChild(chatBox.lastChild);
-            }
+            typingIndicator.remove();
             appendMessage(`Désolé, une erreur est survenue : ${error.message}`, 'ai');
         } finally {
+            // Flux terminé sans aucun texte (ex: réponse vide) : l'indicateur ne doit pas rester affiché
+            typingIndicator.remove();
             chatInput.disabled = false;
             sendBtn.disabled = false;
             chatInput.focus();
@@ -0,0 +1,86 @@
+# startup.py - IMPORTS DIFFÉRÉS DES SDK LOURDS ET RAPPORT DU TEMPS DE DÉMARRAGE
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STARTED_AT = time.perf_counter()
+import_times = {}  # module ou groupe d'imports -> secondes
+ready_at = None
+
+
+@contextmanager
+def timed_import(name: str):
+    """Mesure un import (ou un groupe d'imports) pour le rapport de démarrage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        import_times[name] = import_times.get(name, 0.0) + time.perf_counter() - start
+
+
+def load(name: str):
+    """Importe un module une seule fois, en mesurant la durée du premier import.
+
+    `importlib` sérialise déjà les imports d'un même module : un second thread attend la fin
+    du premier import au lieu de relancer le module.
+    """
+    already_loaded = name in sys.modules  # Ex: pandas, déjà importé par yfinance
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not already_loaded:
+        # Le thread qui a réellement importé termine le premier : les suivants n'écrasent pas sa mesure
+        import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+class LazyModule:
+    """Module importé au premier accès à l'un de ses attributs (ex: `yf.Ticker`)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = load(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+
+def mark_ready():
+    global ready_at
+    ready_at = time.perf_counter()
+
+
+def warm_up(*loaders):
+    """Charge les SDK en arrière-plan pour que la première requête n'attende pas l'import."""
+    def run():
+        for loader in loaders:
+            try:
+                loader()
+            except Exception as e:
+                print(f"Erreur lors du préchargement: {e}")
+        print(f"INFO: préchargement terminé ({format_report()})")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def report() -> dict:
+    return {
+        "readyAfterMs": round((ready_at - STARTED_AT) * 1000, 1) if ready_at else None,
+        "importsMs": {name: round(seconds * 1000, 1) for name, seconds in import_times.items()},
+    }
+
+
+def format_report() -> str:
+    return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in import_times.items())
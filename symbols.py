@@ -0,0 +1,95 @@
+# symbols.py - INDEX DES SYMBOLES CONNUS (VALIDES ET INVALIDES)
+import csv
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Forme acceptée pour un symbole : lettres, chiffres et suffixes de place (ex: MC.PA, BRK-B, ^GSPC)
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9^][A-Z0-9.\-=^]{0,14}$")
+SYMBOLS_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbols.csv")
+
+
+def normalize_symbol(ticker: str) -> str:
+    return ticker.strip().upper()
+
+
+def load_snapshot(path: str = SYMBOLS_SNAPSHOT) -> list:
+    """Lit l'instantané local des symboles (CSV avec au moins une colonne `symbol`)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row for row in csv.DictReader(f) if row.get("symbol")]
+
+
+class SymbolIndex:
+    """Mémorise quels symboles existent, avec un TTL positif et un TTL négatif.
+
+    `lookup()` retourne True (connu et valide), False (connu comme invalide)
+    ou None (inconnu : il faut interroger la source amont).
+    """
+
+    def __init__(self, positive_ttl: float = 24 * 3600, negative_ttl: float = 3600, max_entries: int = 50000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._seeded = set()
+        self._entries = OrderedDict()  # symbole -> (valide, expiration)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.rejections = 0
+        self.misses = 0
+
+    def seed(self, symbols):
+        """Ajoute des symboles considérés comme valides sans expiration."""
+        with self._lock:
+            self._seeded.update(normalize_symbol(s) for s in symbols)
+
+    def lookup(self, ticker: str):
+        symbol = normalize_symbol(ticker)
+        with self._lock:
+            if not SYMBOL_PATTERN.match(symbol):
+                self.rejections += 1
+                return False
+            entry = self._entries.get(symbol)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(symbol)
+                if entry[0]:
+                    self.hits += 1
+                else:
+                    self.rejections += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[symbol]
+            if symbol in self._seeded:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return None
+
+    def mark_valid(self, ticker: str):
+        self._mark(ticker, True, self.positive_ttl)
+
+    def mark_invalid(self, ticker: str):
+        self._mark(ticker, False, self.negative_ttl)
+
+    def _mark(self, ticker: str, valid: bool, ttl: float):
+        symbol = normalize_symbol(ticker)
+        with self._lock:
+            self._entries[symbol] = (valid, time.monotonic() + ttl)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            negatives = sum(1 for valid, _ in self._entries.values() if not valid)
+            return {
+                "seeded": len(self._seeded),
+                "positive": len(self._entries) - negatives,
+                "negative": negatives,
+                "hits": self.hits,
+                "rejections": self.rejections,
+                "misses": self.misses,
+            }
@@ -0,0 +1,19 @@
+# tests/conftest.py - APPLICATION CHARGÉE AVEC LES DOUBLURES DU BANC
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    """Importe main.py comme bench/run.py : clés factices, yfinance et Gemini remplacés, sans latence."""
+    from bench.run import load_app
+
+    return load_app(SimpleNamespace(yfinance_latency=0, gemini_latency=0))
+
+
+@pytest.fixture
+def client(main_module):
+    from fastapi.testclient import TestClient
+
+    return TestClient(main_module.app)
@@ -0,0 +1,70 @@
+# tests/test_analysis.py - ANALYSE GROUPÉE : FILTRE DES SECTIONS, ERREURS PAR SECTION, COMPARAISONS
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def validations(main_module, monkeypatch):
+    """Compte les validations de symbole (get_stock_data) par ticker."""
+    counts, get_stock_data = Counter(), main_module.get_stock_data
+
+    def counting(ticker):
+        counts[ticker.upper()] += 1
+        return get_stock_data(ticker)
+
+    monkeypatch.setattr(main_module, "get_stock_data", counting)
+    return counts
+
+
+def test_sections_filter(client):
+    response = client.get("/api/analysis/AAPL", params={"sections": "entreprise, dividends"})
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"symbol", "entreprise", "dividends"} and body["symbol"] == "AAPL"
+    assert body["entreprise"]["symbol"] == "AAPL" and "dividendHistory" in body["dividends"]
+
+
+def test_unknown_sections_are_rejected(client):
+    response = client.get("/api/analysis/AAPL", params={"sections": "entreprise,bilan,news"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Sections inconnues : bilan, news"
+
+
+def test_failed_section_is_reported_without_failing_the_bundle(client, main_module, monkeypatch):
+    def broken(stock):
+        raise RuntimeError("dividendes indisponibles")
+
+    monkeypatch.setattr(main_module, "build_dividend_data", broken)
+    body = client.get("/api/analysis/MSFT").json()
+    assert body["errors"] == {"dividends": "dividendes indisponibles"}
+    assert {"entreprise", "historique", "advancedMetrics"} <= set(body) and "dividends" not in body
+
+
+def test_compare_with_an_unknown_ticker(client, validations):
+    body = client.get("/api/analysis/AAPL", params={"sections": "entreprise", "compare": "msft, ZZBAD,nvda"}).json()
+    assert set(body["compare"]) == {"MSFT", "ZZBAD", "NVDA"}
+    assert set(body["compare"]["ZZBAD"]) == {"error"}
+    for symbol in ("MSFT", "NVDA"):
+        assert body["compare"][symbol]["entreprise"]["symbol"] == symbol and "advancedMetrics" in body["compare"][symbol]
+    # Une seule validation par ticker, toutes sections confondues
+    assert validations == {"AAPL": 1, "MSFT": 1, "ZZBAD": 1, "NVDA": 1}
+
+
+def test_unknown_main_ticker(client, validations):
+    response = client.get("/api/analysis/ZZNOPE", params={"compare": "MSFT"})
+    assert response.status_code == 404 and validations["ZZNOPE"] == 1
+
+
+def test_entreprise_payload_keeps_missing_metrics_null(main_module):
+    stock = SimpleNamespace(info={"symbol": "NEW", "previousClose": 12.5, "trailingPE": 14.0})
+    assert main_module.build_financial_data(stock, "new") == {
+        "name": "NEW", "symbol": "NEW", "sector": "N/A", "country": "N/A", "price": 12.5, "revenue": None,
+        "netIncome": None, "peRatio": 14.0, "roe": None, "netMargin": None, "dividendYield": None,
+    }
+
+
+def test_dividends_route(client):
+    body = client.get("/api/dividends/AAPL").json()
+    assert set(body) == {"dividendHistory"} and len(body["dividendHistory"]["years"]) == len(body["dividendHistory"]["amounts"])
@@ -0,0 +1,73 @@
+# tests/test_cache.py - CACHE PAR TICKER : EXPIRATION PAR TYPE, ÉVICTION LRU, REGROUPEMENT DES ÉCHECS
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cache import SingleFlight, TTLCache, estimate_size
+
+
+def test_ttl_depends_on_kind_prefix():
+    cache = TTLCache(ttls={"quote": 0.05, "history": 60})
+    cache.set("aapl", "quote", 190.0)
+    cache.set("AAPL", "history:1y", [1, 2, 3])
+    assert cache.get("AAPL", "quote") == (True, 190.0)  # Symboles insensibles à la casse
+    time.sleep(0.1)
+    assert cache.get("AAPL", "quote") == (False, None)
+    assert cache.get("AAPL", "history:1y") == (True, [1, 2, 3])
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_eviction_by_bytes():
+    value = "x" * 1000
+    cache = TTLCache(max_bytes=3 * estimate_size(value))
+    for symbol in ("A", "B", "C"):
+        cache.set(symbol, "info", value)
+    cache.get("A", "info")  # A redevient la plus récente : B est la plus ancienne
+    cache.set("D", "info", value)
+    assert [s for s in "ABCD" if cache.get(s, "info")[0]] == ["A", "C", "D"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] <= stats["maxBytes"]
+
+
+def test_oversized_value_is_not_cached():
+    cache = TTLCache(max_bytes=100)
+    cache.set("A", "info", "x" * 1000)
+    assert cache.get("A", "info") == (False, None) and cache.stats()["bytes"] == 0
+
+
+def test_get_or_fetch_coalesces_concurrent_misses():
+    cache, calls = TTLCache(flight=SingleFlight()), []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"price": 190.0}
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: cache.get_or_fetch("AAPL", "quote", fetch), range(8)))
+    assert results == [{"price": 190.0}] * 8 and len(calls) == 1
+    assert cache.get_or_fetch("AAPL", "quote", lambda: pytest.fail("déjà en cache")) == {"price": 190.0}
+
+
+def test_failed_fetch_is_not_cached():
+    cache = TTLCache()
+
+    def failing():
+        raise ConnectionError("amont indisponible")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_fetch("AAPL", "info", failing)
+    assert cache.get_or_fetch("AAPL", "info", lambda: {"name": "Apple"}) == {"name": "Apple"}
+
+
+def test_invalidate_by_symbol_or_kind():
+    cache = TTLCache()
+    for kind in ("info", "quote"):
+        cache.set("AAPL", kind, kind)
+    cache.set("MSFT", "info", "info")
+    cache.invalidate("aapl", "quote")
+    assert cache.get("AAPL", "quote")[0] is False and cache.get("AAPL", "info")[0] is True
+    cache.invalidate("AAPL")
+    assert cache.get("AAPL", "info")[0] is False and cache.get("MSFT", "info")[0] is True
+    assert cache.stats()["bytes"] == estimate_size("info")
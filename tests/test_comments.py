@@ -0,0 +1,109 @@
+# tests/test_comments.py - COMMENTAIRES IA : EMPREINTE, GÉNÉRATION EN ARRIÈRE-PLAN, LOTS, ÉCHECS
+import threading
+import time
+
+import pytest
+
+from comments import CommentService, metrics_fingerprint, parse_batch_comments
+
+APPLE = {"symbol": "AAPL", "price": 190.0, "revenue": 383e9, "netIncome": 97e9, "peRatio": 30.1, "roe": 1.5, "netMargin": 0.25}
+MICROSOFT = {"symbol": "MSFT", "price": 400.0, "revenue": 211e9, "netIncome": 72e9, "peRatio": 35.0}
+
+
+def settled(service: CommentService, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while service.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_fingerprint_ignores_small_price_moves():
+    assert metrics_fingerprint(APPLE) == metrics_fingerprint({**APPLE, "price": 191.0})
+    assert metrics_fingerprint(APPLE) != metrics_fingerprint({**APPLE, "price": 215.0})
+    assert metrics_fingerprint(APPLE) != metrics_fingerprint({**APPLE, "peRatio": 31.0})
+    assert metrics_fingerprint({}) == "0:0.0:0.0:0:0:0"
+
+
+def test_parse_batch_comments():
+    text = '```json\n[{"symbol": "aapl", "comment": " Solide. "}, {"symbol": "MSFT", "comment": ""}, "bruit"]\n```'
+    assert parse_batch_comments(text) == {"AAPL": "Solide."}
+    assert parse_batch_comments('{"MSFT": "Cher."}') == {"MSFT": "Cher."}
+    with pytest.raises(ValueError):
+        parse_batch_comments('"texte libre"')
+
+
+def test_lookup_never_waits_and_generates_once():
+    release, calls = threading.Event(), []
+
+    def generate(data):
+        calls.append(data["symbol"])
+        release.wait(2)
+        return f"Commentaire {data['symbol']}"
+
+    service = CommentService(generate)
+    assert service.lookup("AAPL", APPLE) == ("pending", None)
+    assert service.lookup("aapl", APPLE) == ("pending", None)  # Déjà planifié : pas de second appel
+    release.set()
+    settled(service)
+    assert service.lookup("AAPL", {**APPLE, "price": 191.0}) == ("ready", "Commentaire AAPL")
+    assert calls == ["AAPL"]
+
+
+def test_failures_are_remembered_briefly():
+    attempts = []
+
+    def generate(data):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("quota du modèle atteint")
+        return "Commentaire"
+
+    service = CommentService(generate, failure_ttl=0.1)
+    service.lookup("AAPL", APPLE)
+    settled(service)
+    assert service.lookup("AAPL", APPLE) == ("unavailable", None)
+    time.sleep(0.15)
+    assert service.lookup("AAPL", APPLE) == ("pending", None)
+    settled(service)
+    assert service.lookup("AAPL", APPLE) == ("ready", "Commentaire") and service.stats()["failures"] == 1
+
+
+def test_batches_fall_back_to_single_calls_for_missing_symbols():
+    singles = []
+
+    def generate_batch(datas):
+        return {"AAPL": "Lot AAPL"}  # Le modèle a oublié MSFT
+
+    def generate(data):
+        singles.append(data["symbol"])
+        return f"Seul {data['symbol']}"
+
+    service = CommentService(generate, generate_batch=generate_batch, workers=1)
+    assert service.lookup_many([("AAPL", APPLE), ("MSFT", MICROSOFT)]) == {"AAPL": ("pending", None), "MSFT": ("pending", None)}
+    settled(service)
+    assert service.lookup_many([("AAPL", APPLE), ("MSFT", MICROSOFT)]) == {"AAPL": ("ready", "Lot AAPL"), "MSFT": ("ready", "Seul MSFT")}
+    assert singles == ["MSFT"] and service.stats()["batches"] == 1
+
+
+def test_failed_batch_falls_back_to_single_calls():
+    def generate_batch(datas):
+        raise ValueError("JSON invalide")
+
+    service = CommentService(lambda data: "Seul", generate_batch=generate_batch, workers=1)
+    service.lookup_many([("AAPL", APPLE), ("MSFT", MICROSOFT)])
+    settled(service)
+    stats = service.stats()
+    assert stats["batchFailures"] == 1 and stats["generated"] == 2
+
+
+def test_lookup_many_makes_one_call_per_batch():
+    sizes = []
+
+    def generate_batch(datas):
+        sizes.append(len(datas))
+        return {data["symbol"]: f"Lot {data['symbol']}" for data in datas}
+
+    companies = [(f"S{i}", {**APPLE, "symbol": f"S{i}"}) for i in range(12)]
+    service = CommentService(lambda data: "Seul", generate_batch=generate_batch, batch_size=5, workers=1)
+    service.lookup_many(companies)
+    settled(service)
+    assert sizes == [5, 5, 2] and service.stats()["generated"] == 12
@@ -0,0 +1,79 @@
+# tests/test_comments_api.py - COMMENTAIRES IA DANS LES RÉPONSES : LOTS PAR REQUÊTE, REPLI, /api/comments
+import itertools
+import math
+import time
+
+import pytest
+
+from bench import fakes
+
+_prefixes = itertools.count()
+
+
+def fresh_symbols(n: int) -> list:
+    """Symboles jamais commentés dans cette session (le cache des commentaires est partagé par les tests)."""
+    prefix = f"C{next(_prefixes)}X"
+    return [f"{prefix}{i}" for i in range(n)]
+
+
+def settled(main_module, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while main_module.ai_comments.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def gemini_calls():
+    before = fakes.calls["gemini.generate"]
+    return lambda: fakes.calls["gemini.generate"] - before
+
+
+def test_batch_route_makes_one_gemini_call_per_batch(client, main_module, gemini_calls):
+    symbols = fresh_symbols(7)
+    body = client.get("/api/entreprise", params={"tickers": ",".join(symbols)}).json()
+    assert {row["analysisStatus"] for row in body["results"]} == {"pending"}
+    settled(main_module)
+    assert gemini_calls() == math.ceil(len(symbols) / main_module.ai_comments.batch_size)
+    body = client.get("/api/entreprise", params={"tickers": ",".join(symbols)}).json()
+    assert {row["analysisStatus"] for row in body["results"]} == {"ready"}
+
+
+def test_comparison_makes_one_gemini_call_per_batch(client, main_module, gemini_calls):
+    symbols = fresh_symbols(6)
+    body = client.get("/api/analysis/AAPL", params={"sections": "historique", "compare": ",".join(symbols)}).json()
+    assert all(body["compare"][s]["entreprise"]["analysisStatus"] == "pending" for s in symbols)
+    settled(main_module)
+    assert gemini_calls() == math.ceil(len(symbols) / main_module.ai_comments.batch_size)
+
+
+def test_unparsable_batch_falls_back_to_single_calls(client, main_module, monkeypatch, gemini_calls):
+    class ProseModel(fakes.FakeGenerativeModel):
+        def generate_content(self, prompt, **kwargs):
+            response = super().generate_content(prompt, **kwargs)
+            if kwargs.get("generation_config"):
+                response.text = "Voici les analyses demandées, sans JSON."
+            return response
+
+    monkeypatch.setattr(main_module, "model", ProseModel())
+    failures = main_module.ai_comments.stats()["batchFailures"]
+    symbols = fresh_symbols(3)
+    client.get("/api/entreprise", params={"tickers": ",".join(symbols)})
+    settled(main_module)
+    # Un lot illisible, puis un appel unitaire par entreprise
+    assert gemini_calls() == 1 + len(symbols)
+    assert main_module.ai_comments.stats()["batchFailures"] == failures + 1
+    results = client.get("/api/entreprise", params={"tickers": ",".join(symbols)}).json()["results"]
+    assert {row["analysisStatus"] for row in results} == {"ready"}
+
+
+def test_comments_route(client, main_module):
+    first, second = fresh_symbols(2)
+    tickers = f"{first}, {second},{first.lower()},ZZBAD"
+    comments = client.get("/api/comments", params={"tickers": tickers}).json()["comments"]
+    assert list(comments) == [first, second, "ZZBAD"]
+    assert comments[first] == {"status": "pending", "comment": None}
+    assert comments["ZZBAD"]["status"] == "error" and "ZZBAD" in comments["ZZBAD"]["detail"]
+    settled(main_module)
+    comments = client.get("/api/comments", params={"tickers": tickers}).json()["comments"]
+    assert comments[first]["status"] == "ready" and comments[first]["comment"] == f"Analyse simulée de {first}."
+    assert client.get("/api/comments", params={"tickers": ""}).status_code == 422
@@ -0,0 +1,47 @@
+# tests/test_correlation.py - CORRÉLATIONS VECTORISÉES : MATRICE, FENÊTRES GLISSANTES, REGROUPEMENT
+import numpy as np
+
+from correlation import cluster_order, correlation_matrix, log_returns, rolling_correlation
+
+
+def returns(seed: int = 4, days: int = 300) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    base = rng.normal(0, 0.01, (days, 2))
+    noise = rng.normal(0, 0.003, (days, 4))
+    # Deux groupes : (0, 2, 4) suivent le premier facteur, (1, 3) le second
+    return np.column_stack([base[:, 0], base[:, 1], base[:, 0] + noise[:, 0], base[:, 1] + noise[:, 1],
+                            base[:, 0] + noise[:, 2]])
+
+
+def test_matrix_matches_numpy():
+    r = returns()
+    np.testing.assert_allclose(correlation_matrix(r), np.corrcoef(r, rowvar=False), atol=1e-12)
+    assert np.isnan(correlation_matrix(r[:1])).all()
+
+
+def test_log_returns():
+    prices = np.array([[100.0, 50.0], [110.0, 50.0]])
+    np.testing.assert_allclose(log_returns(prices), [[np.log(1.1), 0.0]])
+
+
+def test_rolling_windows_match_direct_computation():
+    r = returns(days=120)
+    ends, pairs, values = rolling_correlation(r, window=30, step=7)
+    assert ends[-1] == 119 and np.all(np.diff(ends) == 7)
+    assert len(pairs) == 10 and values.shape == (len(ends), 10)
+    for k, end in enumerate(ends):
+        window = r[end - 29:end + 1]
+        for p, (i, j) in enumerate(pairs):
+            assert abs(values[k, p] - np.corrcoef(window[:, i], window[:, j])[0, 1]) < 1e-9
+
+
+def test_rolling_with_too_few_points():
+    ends, pairs, values = rolling_correlation(returns(days=10), window=30)
+    assert ends.size == 0 and values.shape == (0, 10)
+
+
+def test_cluster_order_groups_correlated_assets():
+    order = cluster_order(correlation_matrix(returns())).tolist()
+    assert sorted(order) == [0, 1, 2, 3, 4]
+    first, second = {0, 2, 4}, {1, 3}
+    assert set(order[:3]) == first or set(order[:2]) == second
@@ -0,0 +1,59 @@
+# tests/test_downsample.py - SOUS-ÉCHANTILLONNAGE : LTTB, MIN/MAX, DERNIÈRE SÉANCE PAR PÉRIODE
+import numpy as np
+
+from downsample import _buckets, downsample, last_per_period, lttb, minmax
+
+
+def reference_lttb(x, y, threshold):
+    """LTTB point par point, tel que publié : sert d'oracle pour la version vectorisée."""
+    n = len(y)
+    bounds = _buckets(n, threshold - 2)
+    selected, a = [0], 0
+    for i in range(len(bounds) - 1):
+        lo, hi = bounds[i], bounds[i + 1]
+        if i + 2 < len(bounds):
+            cx, cy = x[hi:bounds[i + 2]].mean(), y[hi:bounds[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        areas = [abs(x[a] * (y[j] - cy) + x[j] * (cy - y[a]) + cx * (y[a] - y[j])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(areas))
+        selected.append(a)
+    return np.array(selected + [n - 1])
+
+
+def test_lttb_matches_the_reference_algorithm():
+    rng = np.random.default_rng(7)
+    y = np.cumsum(rng.normal(size=5000))
+    x = np.arange(5000, dtype=float)
+    for threshold in (3, 10, 250, 1001):
+        assert np.array_equal(lttb(x, y, threshold), reference_lttb(x, y, threshold))
+
+
+def test_lttb_keeps_ends_and_spikes():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    kept = lttb(np.arange(1000), y, 20)
+    assert len(kept) == 20 and kept[0] == 0 and kept[-1] == 999 and 437 in kept
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_short_series_are_returned_unchanged():
+    y = np.arange(10.0)
+    assert np.array_equal(downsample(np.arange(10), y, 50), np.arange(10))
+    assert np.array_equal(downsample(np.arange(10), y, 50, method="minmax"), np.arange(10))
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(3)
+    y = rng.normal(size=1000)
+    kept = minmax(y, 100)
+    assert len(kept) <= 100 and np.all(np.diff(kept) > 0)
+    assert y.argmin() in kept and y.argmax() in kept
+
+
+def test_last_session_per_week_and_month():
+    days = np.array(["2024-01-29", "2024-01-31", "2024-02-02", "2024-02-05", "2024-02-09", "2024-03-01"],
+                    dtype="datetime64[D]")
+    assert last_per_period(days, "1wk").tolist() == [2, 4, 5]
+    assert last_per_period(days, "1mo").tolist() == [1, 4, 5]
+    assert last_per_period(np.array([], dtype="datetime64[D]"), "1wk").tolist() == []
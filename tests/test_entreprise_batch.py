@@ -0,0 +1,37 @@
+# tests/test_entreprise_batch.py - LOT DE TICKERS : SUCCÈS PARTIEL, LIMITE DE TAILLE, DÉLAI PAR SYMBOLE
+import time
+
+
+def test_partial_success_reports_errors_per_symbol(client):
+    response = client.get("/api/entreprise", params={"tickers": "aapl, ZZBAD,MSFT,AAPL", "comments": "false"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [row["symbol"] for row in body["results"]] == ["AAPL", "MSFT"]
+    assert list(body["errors"]) == ["ZZBAD"] and "ZZBAD" in body["errors"]["ZZBAD"]
+    assert body["results"][0]["price"] is not None and "changePercent" in body["results"][0]
+
+
+def test_batch_size_is_limited(client, main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "ENTREPRISE_BATCH_MAX", 2)
+    response = client.get("/api/entreprise", params={"tickers": "AAPL,MSFT,NVDA"})
+    assert response.status_code == 400 and response.json()["detail"] == "Au plus 2 tickers par requête."
+    assert client.get("/api/entreprise", params={"tickers": " , "}).status_code == 400
+
+
+def test_slow_symbol_times_out_without_failing_the_batch(client, main_module, monkeypatch):
+    params = {"tickers": "TSLA,JPM", "comments": "false"}
+    client.get("/api/entreprise", params=params)  # Caches chauds : seul le ralentissement ci-dessous compte
+    build = main_module._build_batch_entry
+
+    def slow_for_tsla(symbol, quote):
+        if symbol == "TSLA":
+            time.sleep(1.5)
+        return build(symbol, quote)
+
+    monkeypatch.setattr(main_module, "_build_batch_entry", slow_for_tsla)
+    monkeypatch.setattr(main_module, "ENTREPRISE_BATCH_TIMEOUT", 0.2)
+    start = time.monotonic()
+    body = client.get("/api/entreprise", params=params).json()
+    assert time.monotonic() - start < 1.2  # Le lot n'attend pas la fin de la recherche lente
+    assert [row["symbol"] for row in body["results"]] == ["JPM"]
+    assert body["errors"] == {"TSLA": "Délai dépassé pour ce symbole."}
@@ -0,0 +1,93 @@
+# tests/test_feeds.py - FLUX EN ARRIÈRE-PLAN : INSTANTANÉ PARTAGÉ, DONNÉES PÉRIMÉES, ÉCHECS AMONT
+import asyncio
+
+import pytest
+
+from feeds import Feed, FeedScheduler
+from shared_store import SQLiteStore
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.error is not None:
+            raise self.error
+        return [f"article {self.calls}"]
+
+
+def test_concurrent_first_reads_share_one_fetch():
+    upstream = Upstream()
+    feed = Feed("news", upstream.fetch, interval=60)
+
+    async def scenario():
+        return await asyncio.gather(*(feed.get() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert {tuple(data) for data, _, _ in results} == {("article 1",)} and upstream.calls == 1
+    assert not any(stale for _, _, stale in results)
+
+
+def test_stale_snapshot_is_served_while_refreshing():
+    upstream = Upstream()
+    feed = Feed("news", upstream.fetch, interval=0.05)
+
+    async def scenario():
+        await feed.get()
+        await asyncio.sleep(0.1)
+        data, _, stale = await feed.get()  # Servi tout de suite, rafraîchi en arrière-plan
+        assert data == ["article 1"] and stale
+        await asyncio.sleep(0.05)
+        return await feed.get()
+
+    data, _, _ = asyncio.run(scenario())
+    assert data == ["article 2"]
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    upstream = Upstream()
+    feed = Feed("news", upstream.fetch, interval=60)
+
+    async def scenario():
+        await feed.get()
+        upstream.error = ConnectionError("amont indisponible")
+        with pytest.raises(ConnectionError):
+            await feed.refresh()
+        return await feed.get()
+
+    data, _, stale = asyncio.run(scenario())
+    assert data == ["article 1"] and stale and feed.last_error == "amont indisponible"
+
+
+def test_other_worker_adopts_the_published_snapshot(tmp_path):
+    path = str(tmp_path / "shared.db")
+    upstream = Upstream()
+    first, second = Feed("news", upstream.fetch, 60, shared=SQLiteStore(path)), Feed("news", upstream.fetch, 60, shared=SQLiteStore(path))
+
+    async def scenario():
+        await first.get()
+        return await second.get()
+
+    data, as_of, stale = asyncio.run(scenario())
+    assert data == ["article 1"] and as_of == first.as_of and not stale and upstream.calls == 1
+
+
+def test_scheduler_refreshes_and_stops():
+    upstream = Upstream()
+    scheduler = FeedScheduler()
+    feed = scheduler.register("news", upstream.fetch, interval=0.01)
+
+    async def scenario():
+        scheduler.start()
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        calls = upstream.calls
+        await asyncio.sleep(0.05)
+        return calls
+
+    calls = asyncio.run(scenario())
+    assert calls >= 2 and upstream.calls == calls and feed.data is not None
@@ -0,0 +1,82 @@
+# tests/test_http_client.py - CLIENT HTTP PARTAGÉ : RETRIES, RETRY-AFTER, LIMITE PAR HÔTE
+import asyncio
+
+import httpx
+import pytest
+
+from http_client import UpstreamClient
+
+
+def client_for(handler, **kwargs) -> UpstreamClient:
+    return UpstreamClient(transport=httpx.MockTransport(handler), backoff=0.01, **kwargs)
+
+
+def test_retries_transient_statuses():
+    statuses = iter([503, 502, 200])
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params.get("symbol"))
+        return httpx.Response(next(statuses), json={"ok": True})
+
+    client = client_for(handler)
+    assert asyncio.run(client.get_json("https://fmp.test/quote", params={"symbol": "AAPL"})) == {"ok": True}
+    assert calls == ["AAPL"] * 3
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client_for(handler).get("https://fmp.test/quote"))
+    assert len(calls) == 1
+
+
+def test_transport_errors_are_retried_then_raised():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        raise httpx.ConnectError("connexion refusée")
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(client_for(handler, retries=2).get("https://fmp.test/quote"))
+    assert len(calls) == 3
+
+
+def test_retry_after_is_honoured_and_capped():
+    client = UpstreamClient()
+    assert client._delay(0, httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+    assert client._delay(0, httpx.Response(429, headers={"Retry-After": "3600"})) == 10.0
+    assert client._delay(2, httpx.Response(503)) == pytest.approx(1.2)
+
+
+def test_concurrency_is_limited_per_host():
+    active, peak = {"fmp.test": 0, "news.test": 0}, {"fmp.test": 0, "news.test": 0}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.02)
+        active[host] -= 1
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        client = client_for(handler, max_per_host=2)
+        await asyncio.gather(*(client.get(f"https://{host}/x") for host in ("fmp.test", "news.test") for _ in range(6)))
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert peak == {"fmp.test": 2, "news.test": 2}
+
+
+def test_a_new_event_loop_gets_a_new_client():
+    client = client_for(lambda request: httpx.Response(200, json=[]))
+    asyncio.run(client.get_json("https://fmp.test/a"))
+    first = client._client
+    assert asyncio.run(client.get_json("https://fmp.test/a")) == [] and client._client is not first
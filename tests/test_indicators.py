@@ -0,0 +1,87 @@
+# tests/test_indicators.py - INDICATEURS : SPÉCIFICATIONS, VALEURS DE RÉFÉRENCE, MISES À JOUR INCRÉMENTALES
+import numpy as np
+import pytest
+
+from indicators import IndicatorSeries, compute, parse_specs, spec_key
+
+
+def make_bars(n: int, seed: int = 11) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high, low = close * 1.01, close * 0.99
+    return np.column_stack([19000 + np.arange(n), close, high, low, close, np.full(n, 1e6)])
+
+
+def test_parse_specs_defaults_and_errors():
+    assert parse_specs("SMA:50, rsi,rsi:14") == [("sma", (50,)), ("rsi", (14,))]
+    assert parse_specs("bb:20:2.5") == [("bb", (20, 2.5))]
+    assert spec_key(parse_specs("macd")) == "macd:12:26:9"
+    for bad in ("foo", "sma:1", "sma:a", "macd:26:12", "sma:20:5", ","):
+        with pytest.raises(ValueError):
+            parse_specs(bad)
+
+
+def test_values_match_naive_definitions():
+    bars = make_bars(60)
+    close = bars[:, 4]
+    results, _ = compute(bars, parse_specs("sma:10,ema:10,bb:10:2,drawdown"))
+    assert np.isnan(results["sma:10"]["value"][:9]).all()
+    assert results["sma:10"]["value"][-1] == pytest.approx(close[-10:].mean())
+    assert results["bb:10:2"]["upper"][-1] == pytest.approx(close[-10:].mean() + 2 * close[-10:].std())
+    ema = close[:10].mean()
+    for price in close[10:]:
+        ema += 2 / 11 * (price - ema)
+    assert results["ema:10"]["value"][-1] == pytest.approx(ema)
+    assert results["drawdown"]["value"][-1] == pytest.approx(close[-1] / close.max() - 1)
+
+
+def test_rsi_of_a_rising_series_is_100():
+    bars = make_bars(30)
+    bars[:, 4] = np.arange(30) + 100.0
+    results, _ = compute(bars, parse_specs("rsi:14"))
+    assert np.isnan(results["rsi:14"]["value"][:14]).all() and results["rsi:14"]["value"][-1] == 100.0
+
+
+def test_incremental_updates_match_a_full_compute():
+    specs = parse_specs(None)
+    bars = make_bars(400)
+    series = IndicatorSeries(specs).update(bars[:300])
+    for end in range(301, 401, 7):
+        live = bars[:end].copy()
+        series.update(live)
+    series.update(bars)
+    assert series.full_computes == 1 and series.incremental_updates > 1
+    full = IndicatorSeries(specs).update(bars)
+    for key, columns in full.columns.items():
+        for column, values in columns.items():
+            np.testing.assert_allclose(series.columns[key][column], values, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_intraday_bar_is_recomputed_not_stored():
+    specs = parse_specs("ema:5")
+    bars = make_bars(50)
+    series = IndicatorSeries(specs).update(bars)
+    bars[-1, 4] *= 1.05  # La séance en cours bouge
+    series.update(bars)
+    assert series.incremental_updates == 1 and series.confirmed == 49
+    expected = IndicatorSeries(specs).update(bars).columns["ema:5"]["value"]
+    assert series.columns["ema:5"]["value"][-1] == pytest.approx(expected[-1])
+
+
+def test_adjusted_history_triggers_full_recompute():
+    specs = parse_specs("sma:5")
+    bars = make_bars(50)
+    series = IndicatorSeries(specs).update(bars)
+    series.update(bars * np.array([1, 0.5, 0.5, 0.5, 0.5, 1]))  # Split : tous les cours divisés par 2
+    assert series.full_computes == 2
+
+
+def test_short_history_grows_into_seeded_averages():
+    specs = parse_specs("ema:20,macd")
+    bars = make_bars(80)
+    series = IndicatorSeries(specs).update(bars[:5])
+    for end in range(6, 81):
+        series.update(bars[:end])
+    full = IndicatorSeries(specs).update(bars)
+    np.testing.assert_allclose(series.columns["macd:12:26:9"]["signal"], full.columns["macd:12:26:9"]["signal"],
+                               rtol=1e-9, equal_nan=True)
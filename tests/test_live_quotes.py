@@ -0,0 +1,174 @@
+# tests/test_live_quotes.py - COTATIONS EN DIRECT : SONDEUR PARTAGÉ, DELTAS, FUSION, ARRÊT DES SONDEURS
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from live_quotes import QuoteHub, Subscriber, market_open
+
+
+class Upstream:
+    """Cotations amont scriptées : le prix monte d'un cran tous les `step` appels."""
+
+    def __init__(self, step: int = 2):
+        self.step = step
+        self.calls = {}
+
+    def load(self, symbol: str):
+        if symbol == "ZZFOO":
+            return None
+        n = self.calls[symbol] = self.calls.get(symbol, 0) + 1
+        return {"price": 100.0 + n // self.step, "currency": "USD"}
+
+
+def hub_for(upstream, **kwargs) -> QuoteHub:
+    return QuoteHub(upstream.load, fast_interval=0.01, slow_interval=0.05, is_open=lambda s: True, **kwargs)
+
+
+async def receive(subscriber: Subscriber) -> list:
+    return await asyncio.wait_for(subscriber.next(), 1)
+
+
+def test_market_hours_per_exchange():
+    monday_15h_utc = datetime(2024, 3, 4, 15, 0, tzinfo=timezone.utc)
+    assert market_open("MC.PA", monday_15h_utc) and market_open("AAPL", monday_15h_utc)
+    assert not market_open("7203.T", monday_15h_utc)
+    assert not market_open("AAPL", datetime(2024, 3, 4, 14, 0, tzinfo=timezone.utc))  # 9 h à New York
+    assert not market_open("MC.PA", datetime(2024, 3, 9, 12, 0, tzinfo=timezone.utc))  # Samedi
+
+
+def test_one_poller_fans_out_snapshot_then_deltas():
+    upstream = Upstream()
+
+    async def scenario():
+        hub = hub_for(upstream)
+        a, b = hub.connect(), hub.connect()
+        hub.subscribe(a, ["AAPL"])
+        hub.subscribe(b, ["AAPL"])
+        first_a, first_b = await receive(a), await receive(b)
+        assert first_a == first_b == [{"type": "quote", "symbol": "AAPL", "snapshot": True,
+                                       "quote": {"price": 100.0, "currency": "USD"}}]
+        delta = await receive(a)
+        assert delta[0]["snapshot"] is False and delta[0]["quote"] == {"price": 101.0}  # Champs modifiés seulement
+        assert hub.stats()["symbols"] == 1 and hub.stats()["subscriptions"] == 2
+        await hub.close()
+
+    asyncio.run(scenario())
+    assert list(upstream.calls) == ["AAPL"]
+
+
+def test_late_subscriber_gets_the_last_state_immediately():
+    upstream = Upstream(step=1000)
+
+    async def scenario():
+        hub = hub_for(upstream)
+        early, late = hub.connect(), hub.connect()
+        hub.subscribe(early, ["AAPL"])
+        await receive(early)
+        hub.subscribe(late, ["AAPL"])
+        messages = late._quotes
+        await hub.close()
+        return messages
+
+    assert asyncio.run(scenario())["AAPL"] == {"snapshot": True, "quote": {"price": 100.0, "currency": "USD"}}
+
+
+def test_slow_subscriber_receives_merged_messages():
+    subscriber = Subscriber()
+    subscriber.push_quote("AAPL", {"price": 100.0, "currency": "USD"}, snapshot=True)
+    subscriber.push_quote("AAPL", {"price": 101.0})
+    subscriber.push_quote("MSFT", {"price": 400.0})
+    subscriber.notify({"type": "error", "symbol": "ZZFOO", "detail": "?"})
+    messages = asyncio.run(receive(subscriber))
+    assert messages == [
+        {"type": "error", "symbol": "ZZFOO", "detail": "?"},
+        {"type": "quote", "symbol": "AAPL", "snapshot": True, "quote": {"price": 101.0, "currency": "USD"}},
+        {"type": "quote", "symbol": "MSFT", "snapshot": False, "quote": {"price": 400.0}},
+    ]
+
+
+def test_poller_stops_when_last_subscriber_leaves():
+    upstream = Upstream()
+
+    async def scenario():
+        hub = hub_for(upstream)
+        a, b = hub.connect(), hub.connect()
+        hub.subscribe(a, ["AAPL"])
+        hub.subscribe(b, ["AAPL"])
+        task = hub._symbols["AAPL"].task
+        await receive(a)
+        hub.disconnect(a)
+        assert not task.done()
+        hub.unsubscribe(b, ["AAPL"])
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        calls = upstream.calls["AAPL"]
+        await asyncio.sleep(0.05)
+        assert upstream.calls["AAPL"] == calls
+        return hub.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["symbols"] == 0 and stats["connections"] == 1
+
+
+def test_unknown_symbol_is_dropped_with_an_error():
+    async def scenario():
+        hub = hub_for(Upstream())
+        subscriber = hub.connect()
+        hub.subscribe(subscriber, ["ZZFOO"])
+        messages = await receive(subscriber)
+        return messages, subscriber.symbols, hub.stats()
+
+    messages, symbols, stats = asyncio.run(scenario())
+    assert messages[0]["type"] == "error" and messages[0]["symbol"] == "ZZFOO"
+    assert symbols == set() and stats["symbols"] == 0
+
+
+def test_subscriptions_are_capped_per_connection():
+    async def scenario():
+        hub = hub_for(Upstream(), max_symbols=2)
+        subscriber = hub.connect()
+        refused = hub.subscribe(subscriber, ["AAPL", "MSFT", "AAPL", "NVDA"])
+        await hub.close()
+        return refused
+
+    assert asyncio.run(scenario()) == ["NVDA"]
+
+
+def test_distinct_symbols_are_capped_across_connections():
+    async def scenario():
+        hub = hub_for(Upstream(), max_total_symbols=2)
+        first, second = hub.connect(), hub.connect()
+        refused = hub.subscribe(first, ["AAPL", "MSFT"]), hub.subscribe(second, ["MSFT", "NVDA", "AAPL"])
+        hub.unsubscribe(first, ["AAPL", "MSFT"])
+        hub.unsubscribe(second, ["AAPL"])
+        refused += (hub.subscribe(second, ["NVDA"]),)  # Une place s'est libérée
+        stats = hub.stats()
+        await hub.close()
+        return refused, second.symbols, stats
+
+    refused, symbols, stats = asyncio.run(scenario())
+    # Les symboles déjà sondés restent accessibles : seul un nouveau sondeur est refusé
+    assert refused == ([], ["NVDA"], []) and symbols == {"MSFT", "NVDA"} and stats["symbols"] == 2
+
+
+def test_failures_back_off_and_recover():
+    attempts = []
+
+    def flaky(symbol):
+        attempts.append(symbol)
+        if len(attempts) <= 2:
+            raise ConnectionError("amont indisponible")
+        return {"price": 1.0}
+
+    async def scenario():
+        hub = QuoteHub(flaky, fast_interval=0.005, slow_interval=0.05, is_open=lambda s: True)
+        subscriber = hub.connect()
+        hub.subscribe(subscriber, ["AAPL"])
+        messages = await receive(subscriber)
+        await hub.close()
+        return messages, hub.stats()
+
+    messages, stats = asyncio.run(scenario())
+    assert messages[0]["quote"] == {"price": 1.0}
+    assert stats["failures"] == 2 and stats["fetches"] == 3
@@ -0,0 +1,79 @@
+# tests/test_metrics.py - MÉTRIQUES PROMETHEUS : FORMAT TEXTE, HISTOGRAMMES, COLLECTEURS, PHASES
+import pytest
+
+import metrics
+from metrics import Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    requests = registry.counter("app_requests_total", "Requêtes.", ("route", "status"))
+    in_flight = registry.gauge("app_in_flight", "En cours.")
+    requests.inc(route="/api/search", status=200)
+    requests.inc(2, route="/api/search", status=200)
+    requests.inc(route='/a"b\\c', status=500)
+    in_flight.inc()
+    in_flight.dec()
+    assert registry.render().splitlines() == [
+        "# HELP app_requests_total Requêtes.",
+        "# TYPE app_requests_total counter",
+        'app_requests_total{route="/a\\"b\\\\c",status="500"} 1',
+        'app_requests_total{route="/api/search",status="200"} 3',
+        "# HELP app_in_flight En cours.",
+        "# TYPE app_in_flight gauge",
+        "app_in_flight 0",
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    duration = registry.histogram("app_seconds", "Durée.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        duration.observe(value, route="/x")
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        'app_seconds_bucket{route="/x",le="0.1"} 1',
+        'app_seconds_bucket{route="/x",le="1"} 3',
+        'app_seconds_bucket{route="/x",le="+Inf"} 4',
+        'app_seconds_sum{route="/x"} 4.05',
+        'app_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_collectors_merge_families_and_survive_errors():
+    registry = Registry()
+    registry.collector(lambda: [("app_cache_entries", "gauge", "Entrées.", [({"cache": "ticker"}, 12)])])
+    registry.collector(lambda: [("app_cache_entries", "gauge", "Entrées.", [({"cache": "comments"}, 3), ({"cache": "off"}, None)])])
+
+    def broken():
+        raise RuntimeError("cache fermé")
+
+    registry.collector(broken)
+    assert registry.render().splitlines() == [
+        "# HELP app_cache_entries Entrées.",
+        "# TYPE app_cache_entries gauge",
+        'app_cache_entries{cache="ticker"} 12',
+        'app_cache_entries{cache="comments"} 3',
+    ]
+
+
+def test_timed_counts_errors_and_restores_in_flight():
+    key = ("test-upstream", "quote")
+    before = metrics.upstream_errors._values.get(key, 0)
+    with pytest.raises(ConnectionError):
+        with metrics.timed(*key):
+            assert metrics.upstream_in_flight._values[("test-upstream",)] == 1
+            raise ConnectionError("amont indisponible")
+    assert metrics.upstream_errors._values[key] == before + 1
+    assert metrics.upstream_in_flight._values[("test-upstream",)] == 0
+
+
+def test_phases_of_the_current_request():
+    phases = metrics.begin_request()
+    with metrics.timed("yfinance", "history"):
+        pass
+    for _ in range(2):
+        with metrics.phase("json"):
+            pass
+    assert [name for name, _ in phases] == ["yfinance.history", "json", "json"]
+    assert metrics.format_phases([("a", 0.2), ("b", 0.01), ("b", 0.02)]) == "a=200ms, b=30ms (x2)"
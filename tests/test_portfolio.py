@@ -0,0 +1,59 @@
+# tests/test_portfolio.py - RISQUE DE PORTEFEUILLE : BÊTA, VAR/CVAR, FRONTIÈRE EFFICIENTE
+import numpy as np
+import pytest
+
+import portfolio
+
+
+def market(seed: int = 5, days: int = 500) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0.0005, 0.01, days)
+
+
+def test_simple_returns():
+    prices = np.array([[100.0, 10.0], [110.0, 9.0], [99.0, 9.9]])
+    np.testing.assert_allclose(portfolio.simple_returns(prices), [[0.1, -0.1], [-0.1, 0.1]])
+
+
+def test_betas():
+    m = market()
+    noise = np.random.default_rng(1).normal(0, 0.002, len(m))
+    b = portfolio.betas(np.column_stack([2 * m, -m + noise, np.zeros_like(m)]), m)
+    assert b[0] == pytest.approx(2.0) and b[1] == pytest.approx(-1.0, abs=0.05) and b[2] == 0.0
+    assert np.isnan(portfolio.betas(np.column_stack([m]), np.zeros_like(m))).all()
+
+
+def test_historical_var_and_cvar():
+    returns = np.linspace(-0.10, 0.09, 20)  # Pertes : 10 %, 9 %, ... ; 1 seul jour sous le quantile 5 %
+    result = portfolio.historical_var(returns, levels=(0.95,))
+    assert result["var"][0] == pytest.approx(-np.quantile(returns, 0.05))
+    assert result["cvar"][0] == pytest.approx(0.10)
+    assert result["cvar"][0] >= result["var"][0]
+
+
+def test_parametric_var_matches_normal_quantiles():
+    result = portfolio.parametric_var(0.0, 0.01)
+    np.testing.assert_allclose(result["var"], [0.016449, 0.023263], rtol=1e-4)
+    np.testing.assert_allclose(result["cvar"], [0.020627, 0.026652], rtol=1e-4)
+
+
+def test_sample_weights_are_long_only_and_normalized():
+    weights = portfolio.sample_weights(4, 1000, seed=3)
+    assert weights.shape == (1004, 4)
+    assert (weights >= 0).all() and np.allclose(weights.sum(axis=1), 1.0)
+    np.testing.assert_array_equal(weights[:4], np.eye(4))
+    np.testing.assert_array_equal(weights, portfolio.sample_weights(4, 1000, seed=3))
+
+
+def test_frontier_envelope_is_efficient():
+    rng = np.random.default_rng(9)
+    returns = rng.normal([0.0002, 0.0006, 0.001], [0.005, 0.012, 0.02], size=(750, 3))
+    mean, cov = portfolio.annualized_moments(returns)
+    weights = portfolio.sample_weights(3, 5000)
+    result = portfolio.frontier(mean, cov, weights, risk_free=0.02)
+    envelope = result["envelope"]
+    assert envelope[0] == result["minVolatility"]
+    assert np.all(np.diff(result["volatility"][envelope]) > 0)
+    assert np.all(np.diff(result["returns"][envelope]) >= 0)
+    assert result["volatility"][result["minVolatility"]] <= np.sqrt(np.diag(cov)).min()
+    sharpe = (weights @ mean - 0.02) / np.sqrt(np.einsum("ij,jk,ik->i", weights, cov, weights))
+    assert result["maxSharpe"] == int(np.argmax(sharpe))
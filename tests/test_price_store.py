@@ -0,0 +1,107 @@
+# tests/test_price_store.py - STOCKAGE LOCAL DES COURS : SYNCHRONISATION INCRÉMENTALE, VERSIONS, ERREURS
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_store
+from price_store import PriceStore
+
+
+class Upstream:
+    """Historique amont modifiable ; chaque appel est enregistré avec sa date de début."""
+
+    def __init__(self, days: int = 30):
+        self.frame = self.make(pd.bdate_range("2024-01-01", periods=days), 100.0)
+        self.calls = []
+        self.error = None
+
+    @staticmethod
+    def make(index, start: float) -> pd.DataFrame:
+        close = start + np.arange(len(index), dtype=float)
+        return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1000.0}, index=index)
+
+    def load(self, symbol: str, start):
+        self.calls.append(start)
+        time.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return self.frame if start is None else self.frame[self.frame.index >= pd.Timestamp(start)]
+
+
+@pytest.fixture
+def upstream():
+    return Upstream()
+
+
+def open_store(tmp_path, upstream) -> PriceStore:
+    return PriceStore(str(tmp_path), upstream.load, sync_interval=0)
+
+
+def test_only_the_missing_tail_is_fetched(tmp_path, upstream):
+    store = open_store(tmp_path, upstream)
+    assert len(store.get("AAPL")) == 30
+    upstream.frame = pd.concat([upstream.frame, Upstream.make(pd.bdate_range("2024-02-12", periods=3), 130.0)])
+    series = store.get("AAPL")
+    assert len(series) == 33 and series.close[-1] == 132.0
+    assert upstream.calls[0] is None and upstream.calls[1] == date(2024, 2, 8)  # Avant-dernière séance stockée
+    assert store.stats()["fullFetches"] == 1 and store.stats()["tailFetches"] == 1
+
+
+def test_adjusted_prices_trigger_a_full_reload(tmp_path, upstream):
+    store = open_store(tmp_path, upstream)
+    store.get("AAPL")
+    upstream.frame = upstream.frame * 0.5  # Split : tout l'historique est réajusté
+    assert store.get("AAPL").close[0] == 50.0
+    assert store.stats()["fullFetches"] == 2
+
+
+def test_concurrent_readers_share_one_initial_fetch(tmp_path, upstream):
+    store = PriceStore(str(tmp_path), upstream.load, sync_interval=60)
+    with ThreadPoolExecutor(8) as pool:
+        sizes = list(pool.map(lambda _: len(store.get("AAPL")), range(8)))
+    assert sizes == [30] * 8 and upstream.calls == [None]
+
+
+def test_rewrite_keeps_served_series_readable_and_prunes_old_versions(tmp_path, upstream):
+    store = open_store(tmp_path, upstream)
+    before = store.get("AAPL")
+    upstream.frame = pd.concat([upstream.frame, Upstream.make(pd.bdate_range("2024-02-12", periods=1), 130.0)])
+    after = store.get("AAPL")
+    assert len(before) == 30 and before.close[-1] == 129.0  # Toujours lisible après la nouvelle écriture
+    assert len(after) == 31
+    assert [name for name in os.listdir(tmp_path) if name.startswith("AAPL.")] == [os.path.basename(store._versions("AAPL")[-1][1])]
+
+
+def test_reopened_store_reads_latest_and_legacy_files(tmp_path, upstream):
+    np.save(tmp_path / "MC.PA.npy", np.array([[19723, 1, 1, 1, 7.0, 1]]))  # Ancien format sans version
+    np.save(tmp_path / "MC.npy", np.array([[19723, 1, 1, 1, 3.0, 1]]))
+    store = PriceStore(str(tmp_path), upstream.load, sync_interval=60)
+    store._synced_at["MC.PA"] = store._synced_at["MC"] = time.monotonic()
+    assert store.get("MC.PA").close.tolist() == [7.0]
+    assert store.get("MC").close.tolist() == [3.0]  # "MC.PA.npy" n'est pas une version de "MC"
+
+
+def test_upstream_failure_keeps_stored_bars_and_is_counted(tmp_path, upstream):
+    store = open_store(tmp_path, upstream)
+    store.get("AAPL")
+    upstream.error = ConnectionError("amont indisponible")
+    assert len(store.get("AAPL")) == 30
+    assert store.stats()["syncErrors"] == 1
+
+
+def test_write_failure_is_counted(tmp_path, upstream, monkeypatch):
+    store = open_store(tmp_path, upstream)
+    store.get("AAPL")
+    upstream.frame = pd.concat([upstream.frame, Upstream.make(pd.bdate_range("2024-02-12", periods=1), 130.0)])
+
+    def locked(*args):
+        raise PermissionError("fichier projeté par un autre processus")
+
+    monkeypatch.setattr(price_store.os, "replace", locked)
+    assert len(store.get("AAPL")) == 30
+    assert store.stats()["syncErrors"] == 1
@@ -0,0 +1,136 @@
+# tests/test_quota.py - QUOTAS AMONT : SEAU À JETONS, RÉSERVES, REJETS 429, PROMOTION DES APPELS PARTAGÉS
+import asyncio
+import threading
+import time
+
+import pytest
+
+import quota
+from cache import SingleFlight
+from quota import BACKGROUND, INTERACTIVE, WARMUP, QuotaExceeded, QuotaScheduler, TokenBucket
+
+
+def drained(rate: float, burst: float) -> QuotaScheduler:
+    scheduler = QuotaScheduler({"fmp": (rate, burst)})
+    scheduler.buckets["fmp"].tokens = 0.0
+    return scheduler
+
+
+def test_parse_quota():
+    assert quota.parse_quota("300/60") == (5.0, 300.0)
+    assert quota.parse_quota("300/60:20") == (5.0, 20.0)
+    assert quota.parse_quota("off") is None and quota.parse_quota("") is None
+
+
+def test_unconfigured_provider_is_never_limited():
+    scheduler = QuotaScheduler({})
+    for _ in range(1000):
+        scheduler.acquire("yfinance")
+
+
+def test_lower_classes_leave_the_reserve_to_interactive():
+    bucket = TokenBucket("fmp", rate=1.0, burst=10)
+    bucket.tokens = 4.0
+    assert bucket.plan(WARMUP, time.monotonic() + 60) == (pytest.approx(2.0, abs=0.01), False)  # Réserve de 5 jetons
+    assert bucket.plan(BACKGROUND, time.monotonic() + 60) == (0.0, True)  # Réserve de 2 jetons
+    assert bucket.plan(INTERACTIVE, time.monotonic() + 60) == (0.0, True)
+    assert bucket.stats()["granted"] == {"interactive": 1, "background": 1, "warmup": 0}
+
+
+def test_interactive_queues_on_an_empty_bucket():
+    scheduler = drained(rate=20.0, burst=1)
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.acquire("fmp")
+    assert 0.1 <= time.monotonic() - started < 0.5  # 3 jetons à 20/s, servis dans l'ordre
+
+
+def test_shedding_answers_429_with_retry_after():
+    scheduler = drained(rate=1.0, burst=10)
+    with pytest.raises(QuotaExceeded) as excinfo:
+        scheduler.acquire("fmp", WARMUP, deadline=1.0)
+    assert excinfo.value.status_code == 429 and excinfo.value.headers == {"Retry-After": "6"}
+    assert scheduler.stats()["fmp"]["shed"]["warmup"] == 1
+
+
+def test_upstream_429_penalizes_the_bucket():
+    scheduler = QuotaScheduler({"fmp": (10.0, 10)})
+    scheduler.penalize("fmp", 30)
+    with pytest.raises(QuotaExceeded) as excinfo:
+        scheduler.acquire("fmp")
+    assert excinfo.value.retry_after >= 30
+
+
+def test_priority_context_applies_to_nested_calls():
+    scheduler = drained(rate=1.0, burst=10)
+    with quota.priority(WARMUP):
+        assert quota.current_priority() == WARMUP
+        with pytest.raises(QuotaExceeded):
+            scheduler.acquire("fmp", deadline=0.5)
+    assert quota.current_priority() == INTERACTIVE
+
+
+def test_interactive_caller_promotes_a_coalesced_warmup_fetch():
+    # Préchargement : 6 jetons de réserve à 10/s, soit 0,6 s ; un utilisateur : 0,1 s
+    scheduler, flight = drained(rate=10.0, burst=10), SingleFlight(priorities=quota.FlightPriority())
+
+    async def fetch():
+        await scheduler.acquire_async("fmp")
+        return "cotations"
+
+    async def warmup():
+        with quota.priority(WARMUP):
+            return await flight.do_async("k", fetch)
+
+    async def scenario():
+        background = asyncio.ensure_future(warmup())
+        await asyncio.sleep(0.02)
+        started = time.monotonic()
+        result = await flight.do_async("k", fetch)
+        return result, time.monotonic() - started, await background
+
+    result, waited, shared = asyncio.run(scenario())
+    assert result == shared == "cotations"
+    assert waited < 0.4
+    assert scheduler.stats()["fmp"]["granted"] == {"interactive": 1, "background": 0, "warmup": 0}
+
+
+def test_interactive_thread_promotes_a_coalesced_warmup_fetch():
+    scheduler, flight = drained(rate=10.0, burst=10), SingleFlight(priorities=quota.FlightPriority())
+    leading = threading.Event()
+
+    def fetch():
+        leading.set()
+        scheduler.acquire("fmp")
+        return "profil"
+
+    def warmup():
+        with quota.priority(WARMUP):
+            flight.do("k", fetch)
+
+    background = threading.Thread(target=warmup)
+    background.start()
+    assert leading.wait(1)
+    started = time.monotonic()
+    assert flight.do("k", fetch) == "profil"
+    assert time.monotonic() - started < 0.4
+    background.join(2)
+    assert scheduler.stats()["fmp"]["granted"]["interactive"] == 1
+
+
+def test_coalesced_background_callers_do_not_demote():
+    scheduler, flight = drained(rate=10.0, burst=10), SingleFlight(priorities=quota.FlightPriority())
+
+    async def fetch():
+        await scheduler.acquire_async("fmp")
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do_async("k", fetch))
+        await asyncio.sleep(0.02)
+        with quota.priority(WARMUP):
+            await flight.do_async("k", fetch)
+        await leader
+
+    asyncio.run(scenario())
+    assert scheduler.stats()["fmp"]["granted"]["interactive"] == 1
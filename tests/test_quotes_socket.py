@@ -0,0 +1,15 @@
+# tests/test_quotes_socket.py - WEBSOCKET /ws/quotes : ABONNEMENTS, PLAFONDS, FERMETURE PROPRE
+def test_subscribe_receive_and_close(client, main_module, monkeypatch):
+    monkeypatch.setattr(main_module.quote_hub, "max_total_symbols", 1)
+    with client.websocket_connect("/ws/quotes") as socket:
+        socket.send_json({"action": "subscribe", "symbols": ["aapl", "MSFT"]})
+        messages = [socket.receive_json() for _ in range(3)]
+        refused = next(m for m in messages if m["type"] == "error")
+        assert refused["symbols"] == ["MSFT"] and "1 sur le serveur" in refused["detail"]
+        assert {"type": "subscriptions", "symbols": ["AAPL"]} in messages
+        quote = next(m for m in messages if m["type"] == "quote")
+        assert quote["symbol"] == "AAPL" and quote["snapshot"] and quote["quote"]["price"] > 0
+        socket.send_text("pas du JSON")
+        assert socket.receive_json() == {"type": "error", "detail": "Message invalide (JSON attendu)."}
+    # Connexion fermée : abonnements et sondeurs sont libérés
+    assert main_module.quote_hub.stats()["connections"] == 0 and main_module.quote_hub.stats()["symbols"] == 0
@@ -0,0 +1,64 @@
+# tests/test_screener.py - INDEX DES FONDAMENTAUX : FILTRES VECTORISÉS, TRI, RAFRAÎCHISSEMENT
+from screener import FundamentalsIndex
+
+INFOS = {
+    "AAPL": {"longName": "Apple Inc.", "sector": "Technology", "country": "United States",
+             "trailingPE": 30.0, "dividendYield": 0.005, "marketCap": 3e12},
+    "MSFT": {"longName": "Microsoft", "sector": "Technology", "country": "United States",
+             "trailingPE": 35.0, "dividendYield": 0.008, "marketCap": 2.8e12},
+    "MC.PA": {"longName": "LVMH", "sector": "Consumer Cyclical", "country": "France",
+              "trailingPE": 22.0, "dividendYield": 0.017, "marketCap": 4e11},
+    "RIVN": {"longName": "Rivian", "sector": "Consumer Cyclical", "country": "United States",
+             "trailingPE": None, "marketCap": "n/a"},
+}
+
+
+def loaded(infos=INFOS) -> FundamentalsIndex:
+    def load_info(symbol):
+        if symbol == "BOOM":
+            raise ConnectionError("amont indisponible")
+        return infos.get(symbol)
+
+    index = FundamentalsIndex(load_info, [*infos, "aapl", "BOOM", "ZZFOO"], workers=2)
+    index.refresh()
+    return index
+
+
+def symbols(result) -> list:
+    return [row["symbol"] for row in result["results"]]
+
+
+def test_failed_and_unknown_symbols_are_skipped():
+    index = loaded()
+    assert index.ready and index.query()["total"] == 4
+    assert index.market_cap("aapl") == 3e12 and index.market_cap("RIVN") is None and index.market_cap("ZZFOO") is None
+
+
+def test_filters_exclude_missing_values():
+    index = loaded()
+    assert symbols(index.query(sector="technology")) == ["AAPL", "MSFT"]
+    assert symbols(index.query(country="United States", pe_max=32)) == ["AAPL"]  # RIVN sans PER est exclu
+    assert symbols(index.query(dividend_min=0.01)) == ["MC.PA"]
+    assert symbols(index.query(dividend_max=0.006)) == ["AAPL", "RIVN"]  # Sans dividende : rendement nul
+
+
+def test_sorting_keeps_missing_values_last():
+    index = loaded()
+    assert symbols(index.query(sort_by="marketCap")) == ["AAPL", "MSFT", "MC.PA", "RIVN"]
+    assert symbols(index.query(sort_by="pe", descending=False)) == ["MC.PA", "AAPL", "MSFT", "RIVN"]
+    assert symbols(index.query(sort_by="name", descending=False)) == ["AAPL", "MC.PA", "MSFT", "RIVN"]
+    page = index.query(limit=2, offset=1)
+    assert symbols(page) == ["MSFT", "MC.PA"] and page["total"] == 4
+    assert page["results"][0]["revenue"] is None
+
+
+def test_failed_refresh_keeps_the_previous_table():
+    index = loaded()
+    index.load_info = lambda symbol: None
+    index.refresh()
+    assert index.last_error and index.query()["total"] == 4
+
+
+def test_empty_index_answers_without_network():
+    index = FundamentalsIndex(lambda s: None, ["AAPL"])
+    assert not index.ready and index.query() == {"results": [], "total": 0}
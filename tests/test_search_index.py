@@ -0,0 +1,53 @@
+# tests/test_search_index.py - AUTOCOMPLÉTION : CLASSEMENT, ACCENTS, PRÉFIXES TRÈS COURANTS
+from search_index import SymbolDirectory
+
+ROWS = [
+    {"symbol": "AAPL", "name": "Apple Inc.", "exchange": "NASDAQ"},
+    {"symbol": "APP", "name": "AppLovin Corp", "exchange": "NASDAQ"},
+    {"symbol": "OR.PA", "name": "L'Oréal S.A.", "exchange": "EURONEXT"},
+    {"symbol": "MC.PA", "name": "LVMH Moët Hennessy", "exchange": "EURONEXT"},
+]
+
+
+def test_exact_symbol_ranks_first():
+    directory = SymbolDirectory()
+    directory.load(ROWS)
+    assert [r["symbol"] for r in directory.search("app")] == ["APP", "AAPL"]
+
+
+def test_accents_and_words_are_folded():
+    directory = SymbolDirectory()
+    directory.load(ROWS)
+    assert directory.search("oreal")[0]["symbol"] == "OR.PA"
+    assert directory.search("MOET")[0]["symbol"] == "MC.PA"
+    assert directory.search("zzz") == [] and directory.stats()["misses"] == 1
+
+
+def test_market_cap_breaks_ties():
+    caps = {"BBB": 2e9, "BBC": 5e9}
+    directory = SymbolDirectory(market_cap=caps.get)
+    directory.load([{"symbol": "BBB", "name": "Petite"}, {"symbol": "BBC", "name": "Grande"}])
+    assert [r["symbol"] for r in directory.search("bb")] == ["BBC", "BBB"]
+
+
+def test_names_after_thousands_of_prefix_matches_are_found():
+    # 3 000 noms « ap 0000 ... » précèdent « apple inc. » dans l'ordre trié des clés
+    rows = [{"symbol": f"Z{i:04d}", "name": f"Ap {i:04d} Fund"} for i in range(3000)] + ROWS[:1]
+    caps = {"AAPL": 3e12}
+    directory = SymbolDirectory(market_cap=caps.get, wide_prefix=100)
+    directory.load(rows)
+    assert directory.search("ap", limit=3)[0]["symbol"] == "AAPL"
+    assert directory.search("ap", limit=1)[0]["symbol"] == "AAPL"  # Servi par la mémoire des préfixes courants
+    assert directory.stats()["widePrefixes"] == 1
+    directory.load(rows)
+    assert directory.stats()["widePrefixes"] == 0
+
+
+def test_wide_prefix_ranking_is_refreshed():
+    caps = {"AP0001": 1e9}
+    rows = [{"symbol": f"AP{i:04d}", "name": ""} for i in range(50)]
+    directory = SymbolDirectory(market_cap=caps.get, wide_prefix=10, wide_ttl=0)
+    directory.load(rows)
+    assert directory.search("ap", limit=1)[0]["symbol"] == "AP0001"
+    caps["AP0042"] = 2e9  # Nouvelles capitalisations publiées par le screener
+    assert directory.search("ap", limit=1)[0]["symbol"] == "AP0042"
@@ -0,0 +1,216 @@
+# tests/test_sessions.py - SESSIONS DE CHAT : VERROU, ÉCHANGES INTERROMPUS, BUDGET
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sessions import ChatSessionStore
+
+PREAMBLE = [{"role": "user", "parts": ["consigne"]}, {"role": "model", "parts": ["bonjour"]}]
+
+
+class BrokenResponseError(Exception):
+    pass
+
+
+class FakeChat:
+    """Imite genai.ChatSession : la dernière réponse n'entre dans `history` qu'à la lecture suivante."""
+
+    def __init__(self):
+        self._history = list(PREAMBLE)
+        self._pending = None
+
+    @property
+    def history(self):
+        if self._pending is not None:
+            sent, received, broken = self._pending
+            if broken:
+                raise BrokenResponseError("réponse en streaming rompue")
+            self._history += [sent, received]
+            self._pending = None
+        return self._history
+
+    @history.setter
+    def history(self, value):
+        self._history = list(value)
+        self._pending = None
+
+    def rewind(self):
+        if self._pending is None:
+            return self._history.pop(-2), self._history.pop()
+        sent, received, _ = self._pending
+        self._pending = None
+        return sent, received
+
+    def send_message(self, text: str, broken: bool = False):
+        self.history  # genai relit l'historique avant chaque envoi
+        self._pending = ({"role": "user", "parts": [text]}, {"role": "model", "parts": [f"réponse à {text}"]}, broken)
+
+
+def texts(chat) -> list:
+    return [m["parts"][0] for m in chat.history]
+
+
+def test_abandoned_stream_releases_the_session():
+    store = ChatSessionStore(FakeChat)
+
+    async def scenario():
+        with pytest.raises(ConnectionError):
+            async with store.use_async("s") as chat:
+                chat.send_message("question 1", broken=True)
+                raise ConnectionError("client déconnecté en plein streaming")
+        # Sans libération du verrou, ce second message attendrait indéfiniment
+        async with asyncio.timeout(2):
+            async with store.use_async("s") as chat:
+                chat.send_message("question 2")
+        return chat
+
+    chat = asyncio.run(scenario())
+    assert texts(chat) == ["consigne", "bonjour", "question 2", "réponse à question 2"]
+
+
+def test_cancelled_stream_removes_the_partial_turn():
+    store = ChatSessionStore(FakeChat)
+
+    async def scenario():
+        async def stream():
+            async with store.use_async("s") as chat:
+                chat.send_message("question 1")
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(stream())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        async with asyncio.timeout(2):
+            async with store.use_async("s") as chat:
+                return texts(chat)
+
+    assert asyncio.run(scenario()) == ["consigne", "bonjour"]
+
+
+def test_concurrent_messages_wait_for_the_session():
+    store = ChatSessionStore(FakeChat)
+    order = []
+
+    async def message(text: str):
+        async with store.use_async("s") as chat:
+            order.append(f"début {text}")
+            chat.send_message(text)
+            await asyncio.sleep(0.05)
+            order.append(f"fin {text}")
+
+    async def scenario():
+        heartbeats = 0
+
+        async def heartbeat():
+            nonlocal heartbeats
+            while True:
+                await asyncio.sleep(0.005)
+                heartbeats += 1
+
+        beat = asyncio.ensure_future(heartbeat())
+        await asyncio.gather(message("question 1"), message("question 2"))
+        beat.cancel()
+        return heartbeats
+
+    # La boucle continue de tourner pendant l'attente du verrou, et les échanges ne se chevauchent pas
+    assert asyncio.run(scenario()) >= 5
+    assert order == ["début question 1", "fin question 1", "début question 2", "fin question 2"]
+
+
+def test_cancelled_wait_does_not_keep_the_lock():
+    store = ChatSessionStore(FakeChat)
+
+    async def message():
+        async with store.use_async("s") as chat:
+            chat.send_message("jamais envoyée")
+
+    async def scenario():
+        entry = store._entry("s")
+        entry.lock.acquire()  # Un échange synchrone (`use()`) est en cours dans un autre thread
+        waiting = asyncio.ensure_future(message())
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        entry.lock.release()
+        async with asyncio.timeout(2):
+            async with store.use_async("s") as chat:
+                return texts(chat)
+
+    assert asyncio.run(scenario()) == ["consigne", "bonjour"]
+
+
+def test_broken_response_does_not_poison_the_session():
+    store = ChatSessionStore(FakeChat)
+    with store.use("s") as chat:
+        chat.send_message("question 1", broken=True)
+    with store.use("s") as chat:
+        chat.send_message("question 2")
+    assert texts(chat) == ["consigne", "bonjour", "question 2", "réponse à question 2"]
+
+
+def test_unrecoverable_history_resets_the_session():
+    class Unrecoverable(FakeChat):
+        def rewind(self):
+            raise BrokenResponseError("rien à retirer")
+
+    store = ChatSessionStore(Unrecoverable)
+    with store.use("s") as chat:
+        chat.send_message("question 1", broken=True)
+    with store.use("s") as chat:
+        assert texts(chat) == ["consigne", "bonjour"]
+
+
+def test_session_creation_does_not_block_other_lookups():
+    started, release = threading.Event(), threading.Event()
+
+    def slow_factory():
+        started.set()
+        release.wait(5)
+        return FakeChat()
+
+    store = ChatSessionStore(slow_factory)
+    creator = threading.Thread(target=lambda: store.use("a").__enter__())
+    creator.start()
+    assert started.wait(2)
+    looked_up = threading.Event()
+    threading.Thread(target=lambda: (store.stats(), "b" in store, looked_up.set())).start()
+    try:
+        assert looked_up.wait(1), "la création d'une session bloque tout le stockage"
+    finally:
+        release.set()
+        creator.join(2)
+
+
+def test_budget_drops_oldest_turns_and_keeps_preamble():
+    store = ChatSessionStore(FakeChat, max_turns=2)
+    for i in range(4):
+        with store.use("s") as chat:
+            chat.send_message(f"q{i}")
+    assert texts(chat) == ["consigne", "bonjour", "q2", "réponse à q2", "q3", "réponse à q3"]
+
+
+def test_byte_budget_and_lru_eviction():
+    store = ChatSessionStore(FakeChat, max_sessions=2, max_bytes=60)
+    with store.use("a") as chat:
+        chat.send_message("x" * 40)
+    assert texts(chat) == ["consigne", "bonjour"]
+    for sid in ("b", "c"):
+        with store.use(sid):
+            pass
+    assert "a" not in store and "b" in store and "c" in store
+    assert store.stats()["evicted"] == 1
+
+
+def test_idle_sessions_expire():
+    store = ChatSessionStore(FakeChat, idle_ttl=0.05)
+    with store.use("a") as chat:
+        chat.send_message("q")
+    time.sleep(0.1)
+    assert store.sweep() == 1
+    with store.use("a") as chat:
+        assert texts(chat) == ["consigne", "bonjour"]
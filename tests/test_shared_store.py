@@ -0,0 +1,107 @@
+# tests/test_shared_store.py - STOCKAGE PARTAGÉ ENTRE WORKERS : L2, BAUX, INVALIDATIONS, SESSIONS
+import threading
+import time
+
+import pytest
+
+from cache import SingleFlight, TTLCache
+from sessions import ChatSessionStore
+from shared_store import SQLiteStore, open_store
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Deux « workers » : deux connexions indépendantes au même fichier SQLite."""
+    path = str(tmp_path / "shared.db")
+    return SQLiteStore(path), SQLiteStore(path)
+
+
+def test_entries_expire(workers):
+    a, b = workers
+    a.set("k", b"valeur", ttl=0.1)
+    found, value, expires_at = b.get("k")
+    assert found and value == b"valeur" and expires_at > time.time()
+    time.sleep(0.15)
+    assert b.get("k") == (False, None, None)
+    assert b.stats()["hits"] == 1 and b.stats()["misses"] == 1
+
+
+def test_leases_are_exclusive_until_released_or_expired(workers):
+    a, b = workers
+    assert a.acquire("lease", ttl=0.2) and not b.acquire("lease", ttl=0.2)
+    a.release("lease")
+    assert b.acquire("lease", ttl=0.1)
+    time.sleep(0.15)
+    assert a.acquire("lease", ttl=1)  # Bail abandonné par un worker arrêté
+
+
+def test_l2_fills_the_other_workers_l1(workers):
+    a, b = workers
+    cache_a, cache_b = TTLCache(shared=a), TTLCache(shared=b)
+    cache_a.set("AAPL", "info", {"name": "Apple"}, ttl=60)
+    assert cache_b.get("AAPL", "info") == (True, {"name": "Apple"})
+    assert cache_b.stats()["sharedHits"] == 1
+    cache_b.get("AAPL", "info")
+    assert cache_b.stats()["sharedHits"] == 1  # Servi par le L1 ensuite
+
+
+def test_only_one_worker_calls_upstream(workers):
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"price": 190.0}
+
+    caches = [TTLCache(shared=store, flight=SingleFlight()) for store in workers]
+    threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_fetch("AAPL", "quote", fetch)))
+               for c in caches for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == [{"price": 190.0}] * 6 and len(calls) == 1
+
+
+def test_invalidation_reaches_the_other_workers_l1(workers):
+    a, b = workers
+    cache_a, cache_b = TTLCache(shared=a, sync_interval=0), TTLCache(shared=b, sync_interval=0)
+    cache_a.set("AAPL", "info", "ancien", ttl=60)
+    assert cache_b.get("AAPL", "info") == (True, "ancien")
+    cache_a.invalidate("AAPL")
+    assert cache_b.get("AAPL", "info") == (False, None)
+
+
+class Chat:
+    def __init__(self):
+        self.history = [{"role": "user", "parts": ["consigne"]}, {"role": "model", "parts": ["bonjour"]}]
+
+    def send_message(self, text: str):
+        self.history += [{"role": "user", "parts": [text]}, {"role": "model", "parts": ["ok"]}]
+
+
+def test_chat_session_moves_between_workers(workers):
+    a, b = workers
+    store_a, store_b = ChatSessionStore(Chat, shared=a), ChatSessionStore(Chat, shared=b)
+    with store_a.use("s") as chat:
+        chat.send_message("question 1")
+    with store_b.use("s") as chat:
+        chat.send_message("question 2")
+    with store_a.use("s") as chat:
+        assert [m["parts"][0] for m in chat.history][2::2] == ["question 1", "question 2"]
+
+
+def test_storage_errors_count_as_misses(workers):
+    a, _ = workers
+    a._connection().execute("DROP TABLE entries")
+    assert a.get("k") == (False, None, None)
+    a.set("k", b"v", ttl=60)
+    stats = a.stats()
+    assert stats["entries"] is None and stats["errors"] == 4  # get, set, purge et stats
+
+
+def test_open_store_urls(tmp_path):
+    assert open_store("") is None
+    assert isinstance(open_store(f"sqlite:///{tmp_path}/a.db"), SQLiteStore)
+    with pytest.raises(ValueError):
+        open_store("redis://localhost")
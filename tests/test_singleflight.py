@@ -0,0 +1,83 @@
+# tests/test_singleflight.py - REGROUPEMENT DES APPELS AMONT CONCURRENTS (SYNCHRONE ET ASYNCIO)
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cache import SingleFlight
+
+
+def test_concurrent_calls_share_one_fetch():
+    flight, calls = SingleFlight(), []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "valeur"
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: flight.do("k", fetch), range(8)))
+    assert results == ["valeur"] * 8 and len(calls) == 1
+    assert flight.stats() == {"calls": 8, "coalesced": 7, "inFlight": 0}
+
+
+def test_error_is_shared_then_forgotten():
+    flight, started = SingleFlight(), threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("amont indisponible")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "k", failing)
+        started.wait(1)
+        follower = pool.submit(flight.do, "k", lambda: "jamais appelé")
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+    assert flight.do("k", lambda: "nouvel appel") == "nouvel appel"
+
+
+def test_async_followers_survive_leader_cancellation():
+    flight, calls = SingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "valeur"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do_async("k", fetch))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.do_async("k", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()  # Le client du premier appelant se déconnecte
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "valeur"
+    assert len(calls) == 1
+    assert flight.stats()["inFlight"] == 0
+
+
+def test_async_entry_cleared_when_fetch_completes():
+    flight = SingleFlight()
+
+    async def failing():
+        raise ValueError("amont indisponible")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await flight.do_async("k", failing)
+        await asyncio.sleep(0)  # Laisse passer le rappel de fin de tâche
+        assert flight.stats()["inFlight"] == 0
+
+        async def ok():
+            return "nouvel appel"
+        return await flight.do_async("k", ok)
+
+    assert asyncio.run(scenario()) == "nouvel appel"
@@ -0,0 +1,40 @@
+# tests/test_startup.py - IMPORTS DIFFÉRÉS ET POINT D'ACCÈS /api/health
+import sys
+import threading
+
+import startup
+
+
+def test_lazy_module_imports_on_first_attribute(tmp_path, monkeypatch):
+    (tmp_path / "heavy_sdk.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    lazy = startup.LazyModule("heavy_sdk")
+    assert not lazy.loaded and "heavy_sdk" not in sys.modules
+    assert lazy.VALUE == 42
+    assert lazy.loaded and "heavy_sdk" in startup.import_times
+    monkeypatch.delitem(sys.modules, "heavy_sdk")
+
+
+def test_slow_module_loaded_from_two_threads(tmp_path, monkeypatch):
+    runs = tmp_path / "runs.txt"
+    (tmp_path / "slow_sdk.py").write_text(f"import time\nopen({str(runs)!r}, 'a').write('x')\ntime.sleep(0.3)\nVALUE = 7\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    lazies, values = [startup.LazyModule("slow_sdk"), startup.LazyModule("slow_sdk")], []
+    threads = [threading.Thread(target=lambda lazy=lazy: values.append(lazy.VALUE)) for lazy in lazies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Le module n'est exécuté qu'une fois et le second thread reçoit le module complet
+    assert values == [7, 7] and runs.read_text() == "x"
+    assert 0.3 <= startup.import_times["slow_sdk"] < 1
+    startup.load("slow_sdk")
+    assert startup.import_times["slow_sdk"] >= 0.3  # Un module déjà chargé ne remplace pas la mesure
+    monkeypatch.delitem(sys.modules, "slow_sdk")
+
+
+def test_health_with_replaced_sdk(client):
+    # Comme bench/run.py : la doublure remplace le LazyModule et n'a pas d'attribut `loaded`
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    assert response.json()["loaded"]["yfinance"] is True
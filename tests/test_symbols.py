@@ -0,0 +1,45 @@
+# tests/test_symbols.py - INDEX DES SYMBOLES : FORME, TTL POSITIF/NÉGATIF, PLAFOND LRU
+import time
+
+from symbols import SymbolIndex, load_snapshot
+
+
+def test_malformed_symbols_are_rejected_without_upstream_call():
+    index = SymbolIndex()
+    for ticker in ("", "AAPL; DROP", "../etc", "A" * 20):
+        assert index.lookup(ticker) is False
+    assert index.lookup(" mc.pa ") is None and index.lookup("^GSPC") is None and index.lookup("BRK-B") is None
+    assert index.stats()["rejections"] == 4 and index.stats()["misses"] == 3
+
+
+def test_seeded_and_marked_symbols():
+    index = SymbolIndex()
+    index.seed(["aapl"])
+    index.mark_valid("msft")
+    index.mark_invalid("ZZFOO")
+    assert index.lookup("AAPL") is True and index.lookup("MSFT") is True and index.lookup("zzfoo") is False
+    assert index.stats() == {"seeded": 1, "positive": 1, "negative": 1, "hits": 2, "rejections": 1, "misses": 0}
+
+
+def test_negative_entries_expire():
+    index = SymbolIndex(negative_ttl=0.05)
+    index.mark_invalid("NEWIPO")
+    assert index.lookup("NEWIPO") is False
+    time.sleep(0.1)
+    assert index.lookup("NEWIPO") is None  # Introduit en bourse entre-temps : on redemande à l'amont
+
+
+def test_least_recently_used_entries_are_dropped():
+    index = SymbolIndex(max_entries=2)
+    index.mark_valid("A")
+    index.mark_valid("B")
+    index.lookup("A")
+    index.mark_valid("C")
+    assert index.lookup("B") is None and index.lookup("A") is True and index.lookup("C") is True
+
+
+def test_snapshot(tmp_path):
+    path = tmp_path / "symbols.csv"
+    path.write_text("symbol,name\nAAPL,Apple Inc.\n,sans symbole\nMC.PA,LVMH\n", encoding="utf-8")
+    assert [row["symbol"] for row in load_snapshot(str(path))] == ["AAPL", "MC.PA"]
+    assert load_snapshot(str(tmp_path / "absent.csv")) == []
@@ -0,0 +1,66 @@
+# tests/test_wire.py - FORMATS COMPACTS : NÉGOCIATION ET ALLER-RETOUR DES ENCODAGES
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import wire
+
+
+def decode_column(encoded: dict) -> list:
+    values = np.cumsum(encoded["deltas"]) / 10 ** encoded["decimals"]
+    missing = set(encoded.get("missing", []))
+    return [None if i in missing else float(v) for i, v in enumerate(values)]
+
+
+def test_negotiation_prefers_explicit_format_then_accept():
+    assert wire.negotiate() == "json"
+    assert wire.negotiate(accept=wire.COMPACT_MEDIA_TYPE) == "compact"
+    assert wire.negotiate("json", accept=wire.COMPACT_MEDIA_TYPE) == "json"
+    assert wire.negotiate(accept=wire.ARROW_MEDIA_TYPE, allowed=("json", "compact")) == "json"
+    with pytest.raises(HTTPException) as excinfo:
+        wire.negotiate("xml")
+    assert excinfo.value.status_code == 400
+
+
+def test_column_round_trip_with_gaps():
+    values = np.array([101.25, 101.5, np.nan, 99.75, np.nan, 100.0])
+    encoded = wire.encode_column(values)
+    assert encoded["decimals"] == 2 and encoded["missing"] == [2, 4]
+    assert decode_column(encoded) == [101.25, 101.5, None, 99.75, None, 100.0]
+
+
+def test_penny_stocks_keep_four_decimals():
+    encoded = wire.encode_column(np.array([0.1234, 0.1301]))
+    assert encoded["decimals"] == 4 and decode_column(encoded) == [0.1234, 0.1301]
+
+
+def test_leading_gap_decodes_as_missing():
+    encoded = wire.encode_column(np.array([np.nan, 10.0, 11.0]))
+    assert decode_column(encoded) == [None, 10.0, 11.0]
+
+
+def test_day_axis_steps():
+    days = np.array(["2024-01-04", "2024-01-05", "2024-01-08"], dtype="datetime64[D]")
+    assert wire.encode_days(days) == {"start": "2024-01-04", "steps": [1, 3]}
+    assert wire.encode_days(np.array([], dtype="datetime64[D]")) == {"start": None, "steps": []}
+    times = np.array(["2024-01-04T09:30", "2024-01-04T09:35"], dtype="datetime64[m]")
+    assert wire.encode_times(times) == {"start": "2024-01-04T09:30", "unit": "m", "steps": [5]}
+
+
+def test_json_response_headers():
+    response = wire.json_response({"close": np.array([1.5, 2.0])}, encoding="compact", headers={"X-Points": "2"})
+    assert response.media_type == wire.COMPACT_MEDIA_TYPE
+    assert response.headers["Vary"] == "Accept" and response.headers["X-Points"] == "2"
+    assert json.loads(response.body) == {"close": [1.5, 2.0]}
+
+
+@pytest.mark.parametrize("serializer", ["orjson", "json"])
+def test_non_finite_floats_become_null(serializer, monkeypatch):
+    if serializer == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(wire, "orjson", None)
+    content = {"pe": float("nan"), "growth": [1.5, float("inf"), -float("inf")], "nested": {"yield": np.float64("nan")}}
+    assert json.loads(wire.dumps(content)) == {"pe": None, "growth": [1.5, None, None], "nested": {"yield": None}}
@@ -0,0 +1,117 @@
+# wire.py - FORMATS DE RÉPONSE COMPACTS POUR LES SÉRIES TEMPORELLES (NÉGOCIATION, DELTA, ARROW)
+import importlib.util
+import json
+import math
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Sérialiseur standard si orjson n'est pas installé
+    orjson = None
+
+
+COMPACT_MEDIA_TYPE = "application/vnd.finanalyse.compact+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FORMATS = ("json", "compact", "arrow")
+
+
+def negotiate(requested: str = None, accept: str = None, allowed=FORMATS) -> str:
+    """Choisit l'encodage : paramètre `format` explicite, sinon en-tête Accept, sinon JSON."""
+    if requested:
+        if requested not in allowed:
+            raise HTTPException(status_code=400, detail=f"Format inconnu '{requested}' (attendu : {', '.join(allowed)}).")
+        encoding = requested
+    elif accept and ARROW_MEDIA_TYPE in accept and "arrow" in allowed:
+        encoding = "arrow"
+    elif accept and COMPACT_MEDIA_TYPE in accept:
+        encoding = "compact"
+    else:
+        encoding = "json"
+    # pyarrow n'est importé qu'au premier export Arrow ; s'il est absent, le format est refusé
+    if encoding == "arrow" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=406, detail="Le format Arrow n'est pas disponible sur ce serveur.")
+    return encoding
+
+
+def _finite(value):
+    """NaN et infinis deviennent null, comme avec orjson."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_finite(jsonable_encoder(content)), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(content, encoding: str = "json", headers: dict = None) -> Response:
+    """Réponse déjà sérialisée : évite le passage par `jsonable_encoder` sur de longues listes."""
+    media_type = COMPACT_MEDIA_TYPE if encoding == "compact" else "application/json"
+    return Response(content=dumps(content), media_type=media_type, headers={"Vary": "Accept", **(headers or {})})
+
+
+def encode_days(days: np.ndarray) -> dict:
+    """Axe des dates : premier jour + écarts en jours calendaires (1 en semaine, 3 après un week-end)."""
+    days = np.asarray(days, dtype="datetime64[D]")
+    if days.size == 0:
+        return {"start": None, "steps": []}
+    return {"start": str(days[0]), "steps": np.diff(days.astype(np.int64)).tolist()}
+
+
+def encode_times(times: np.ndarray) -> dict:
+    """Axe intrajournalier : premier instant + écarts en minutes (`unit` distingue cet axe de celui des jours)."""
+    times = np.asarray(times, dtype="datetime64[m]")
+    if times.size == 0:
+        return {"start": None, "unit": "m", "steps": []}
+    return {"start": str(times[0]), "unit": "m", "steps": np.diff(times.astype(np.int64)).tolist()}
+
+
+def price_decimals(values: np.ndarray) -> int:
+    """2 décimales pour des prix usuels, 4 pour les titres cotés sous 1."""
+    finite = values[np.isfinite(values)]
+    return 4 if finite.size and np.abs(finite).min() < 1 else 2
+
+
+def encode_column(values: np.ndarray, decimals: int = None) -> dict:
+    """Valeurs en virgule fixe, codées par différences successives.
+
+    Décodage : cumul des `deltas` divisé par 10**decimals ; les positions
+    `missing` sont absentes (null).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if decimals is None:
+        decimals = price_decimals(values)
+    missing = ~np.isfinite(values)
+    scaled = np.round(values * 10 ** decimals)
+    if missing.any():
+        # Les trous reprennent la valeur précédente pour garder des deltas nuls
+        filled = np.where(missing, np.nan, scaled)
+        index = np.where(~missing, np.arange(len(filled)), 0)
+        np.maximum.accumulate(index, out=index)
+        scaled = np.nan_to_num(filled[index], nan=0.0)
+    encoded = {"decimals": decimals, "deltas": np.diff(scaled.astype(np.int64), prepend=0).tolist()}
+    if missing.any():
+        encoded["missing"] = np.flatnonzero(missing).tolist()
+    return encoded
+
+
+def arrow_response(columns: dict, headers: dict = None) -> Response:
+    """Table colonne par colonne au format Arrow IPC (flux)."""
+    import pyarrow as pa
+
+    table = pa.table({name: pa.array(values) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_MEDIA_TYPE,
+                    headers={"Vary": "Accept", **(headers or {})})